@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Account
+from .models import Account, IdentifierSequence
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
@@ -22,3 +22,12 @@ class AccountAdmin(admin.ModelAdmin):
             'fields': ('opened_date', 'updated_at')
         }),
     )
+
+
+@admin.register(IdentifierSequence)
+class IdentifierSequenceAdmin(admin.ModelAdmin):
+    """
+    Admin interface for IdentifierSequence model
+    """
+    list_display = ('name', 'next_value')
+    readonly_fields = ('name',)
@@ -1,7 +1,69 @@
 from django import forms
 from .models import Account
+from datetime import date
 import re
 
+# PAN format: 5 letters, 4 digits, 1 letter
+PAN_PATTERN = re.compile(r'^[A-Z]{5}[0-9]{4}[A-Z]{1}$')
+
+
+def validate_phone_number(phone_number):
+    """Check a mobile number is 10 digits; returns it unchanged"""
+    if not phone_number:
+        raise forms.ValidationError('Phone number is required.')
+    
+    # Check if phone number is numeric and 10 digits
+    if not phone_number.isdigit():
+        raise forms.ValidationError('Phone number must contain only digits.')
+    
+    if len(phone_number) != 10:
+        raise forms.ValidationError('Phone number must be exactly 10 digits.')
+    
+    return phone_number
+
+
+def validate_pan_number(pan_number):
+    """Check a PAN number's format; returns it upper-cased"""
+    if not pan_number:
+        raise forms.ValidationError('PAN number is required.')
+    
+    pan_number = pan_number.upper()
+    if not PAN_PATTERN.match(pan_number):
+        raise forms.ValidationError('Invalid PAN format. It should be like ABCDE1234F.')
+    
+    return pan_number
+
+
+def validate_aadhar_number(aadhar_number):
+    """Check an Aadhar number is 12 digits; returns it unchanged"""
+    if not aadhar_number:
+        raise forms.ValidationError('Aadhar number is required.')
+    
+    # Check if aadhar is numeric and 12 digits
+    if not aadhar_number.isdigit():
+        raise forms.ValidationError('Aadhar number must contain only digits.')
+    
+    if len(aadhar_number) != 12:
+        raise forms.ValidationError('Aadhar number must be exactly 12 digits.')
+    
+    return aadhar_number
+
+
+def validate_date_of_birth(dob):
+    """Check the account holder is an adult with a plausible age; returns dob unchanged"""
+    if dob:
+        today = date.today()
+        age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+        
+        if age < 18:
+            raise forms.ValidationError('You must be at least 18 years old to open an account.')
+        
+        if age > 120:
+            raise forms.ValidationError('Please enter a valid date of birth.')
+    
+    return dob
+
+
 class AccountCreationForm(forms.ModelForm):
     """
     Form for creating a new bank account
@@ -68,17 +130,7 @@ class AccountCreationForm(forms.ModelForm):
         }
     
     def clean_phone_number(self):
-        phone_number = self.cleaned_data.get('phone_number')
-        
-        if not phone_number:
-            raise forms.ValidationError('Phone number is required.')
-        
-        # Check if phone number is numeric and 10 digits
-        if not phone_number.isdigit():
-            raise forms.ValidationError('Phone number must contain only digits.')
-        
-        if len(phone_number) != 10:
-            raise forms.ValidationError('Phone number must be exactly 10 digits.')
+        phone_number = validate_phone_number(self.cleaned_data.get('phone_number'))
         
         # Check for duplicate
         if Account.objects.filter(phone_number=phone_number).exists():
@@ -87,18 +139,7 @@ class AccountCreationForm(forms.ModelForm):
         return phone_number
     
     def clean_pan_number(self):
-        pan_number = self.cleaned_data.get('pan_number')
-        
-        if not pan_number:
-            raise forms.ValidationError('PAN number is required.')
-        
-        pan_number = pan_number.upper()
-        
-        # PAN format: 5 letters, 4 digits, 1 letter
-        pan_pattern = re.compile(r'^[A-Z]{5}[0-9]{4}[A-Z]{1}$')
-        
-        if not pan_pattern.match(pan_number):
-            raise forms.ValidationError('Invalid PAN format. It should be like ABCDE1234F.')
+        pan_number = validate_pan_number(self.cleaned_data.get('pan_number'))
         
         # Check for duplicate
         if Account.objects.filter(pan_number=pan_number).exists():
@@ -107,17 +148,7 @@ class AccountCreationForm(forms.ModelForm):
         return pan_number
     
     def clean_aadhar_number(self):
-        aadhar_number = self.cleaned_data.get('aadhar_number')
-        
-        if not aadhar_number:
-            raise forms.ValidationError('Aadhar number is required.')
-        
-        # Check if aadhar is numeric and 12 digits
-        if not aadhar_number.isdigit():
-            raise forms.ValidationError('Aadhar number must contain only digits.')
-        
-        if len(aadhar_number) != 12:
-            raise forms.ValidationError('Aadhar number must be exactly 12 digits.')
+        aadhar_number = validate_aadhar_number(self.cleaned_data.get('aadhar_number'))
         
         # Check for duplicate
         if Account.objects.filter(aadhar_number=aadhar_number).exists():
@@ -126,20 +157,7 @@ class AccountCreationForm(forms.ModelForm):
         return aadhar_number
     
     def clean_date_of_birth(self):
-        from datetime import date
-        dob = self.cleaned_data.get('date_of_birth')
-        
-        if dob:
-            today = date.today()
-            age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-            
-            if age < 18:
-                raise forms.ValidationError('You must be at least 18 years old to open an account.')
-            
-            if age > 120:
-                raise forms.ValidationError('Please enter a valid date of birth.')
-        
-        return dob
+        return validate_date_of_birth(self.cleaned_data.get('date_of_birth'))
 
 
 class ProfileUpdateForm(forms.ModelForm):
@@ -179,17 +197,7 @@ class ProfileUpdateForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
     
     def clean_phone_number(self):
-        phone_number = self.cleaned_data.get('phone_number')
-        
-        if not phone_number:
-            raise forms.ValidationError('Phone number is required.')
-        
-        # Check if phone number is numeric and 10 digits
-        if not phone_number.isdigit():
-            raise forms.ValidationError('Phone number must contain only digits.')
-        
-        if len(phone_number) != 10:
-            raise forms.ValidationError('Phone number must be exactly 10 digits.')
+        phone_number = validate_phone_number(self.cleaned_data.get('phone_number'))
         
         # Check for duplicate (exclude current account)
         existing = Account.objects.filter(phone_number=phone_number).exclude(pk=self.instance.pk)
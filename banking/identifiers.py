@@ -0,0 +1,151 @@
+import threading
+
+from django.db import IntegrityError, connection, connections, transaction as db_transaction
+from django.db.models import F
+
+# Identifiers reserved from the database per round trip and handed out from memory
+ID_BLOCK_SIZE = 100
+
+# First sequence values. New customer IDs have 6+ digits, so they never meet the
+# legacy random 5-digit ones; account numbers are a 9-digit sequence number plus
+# a check digit, keeping the 10-digit format.
+CUSTOMER_ID_START = 100000
+ACCOUNT_NUMBER_START = 100000000
+
+# Account rows whose identifiers are checked against each reserved block per query
+TAKEN_CHECK_CHUNK_SIZE = 1000
+
+_lock = threading.Lock()
+_reserved = {}
+
+
+def luhn_check_digit(digits):
+    """Luhn (mod 10) check digit of a string of digits"""
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_luhn_valid(number):
+    """True if the last digit of `number` is the Luhn check digit of the rest"""
+    return number.isdigit() and len(number) > 1 and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def with_check_digit(value):
+    digits = str(value)
+    return digits + luhn_check_digit(digits)
+
+
+# Identifier name (also the Account field storing it): (first sequence value, formatter)
+IDENTIFIERS = {
+    'customer_id': (CUSTOMER_ID_START, str),
+    'account_number': (ACCOUNT_NUMBER_START, with_check_digit),
+}
+
+
+def _advance_independently(name, size):
+    """
+    Move the sequence forward by `size` on a connection of its own, in autocommit
+    mode, and return the first reserved value. The row is locked only for the one
+    UPDATE, however long the caller's transaction goes on.
+    """
+    from .models import IdentifierSequence
+
+    start, formatter = IDENTIFIERS[name]
+    table = connection.ops.quote_name(IdentifierSequence._meta.db_table)
+    own = connections.create_connection(connection.alias)
+    try:
+        with own.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    f'UPDATE {table} SET next_value = next_value + %s WHERE name = %s RETURNING next_value',
+                    [size, name],
+                )
+                row = cursor.fetchone()
+                if row:
+                    return row[0] - size
+                try:
+                    cursor.execute(f'INSERT INTO {table} (name, next_value) VALUES (%s, %s)', [name, start])
+                except IntegrityError:
+                    # Created concurrently; take the block with the UPDATE
+                    pass
+    finally:
+        own.close()
+
+
+def _advance(name, size):
+    """
+    Move the identifier's sequence forward by `size` and return (first reserved
+    value, whether the reservation is already committed).
+    Inside a caller's transaction the sequence is moved on a separate connection,
+    so its row lock is not held until the caller commits. SQLite, which locks the
+    whole database for writing, moves it in the caller's transaction instead.
+    """
+    from .models import IdentifierSequence
+
+    if connection.in_atomic_block and connection.features.has_select_for_update:
+        return _advance_independently(name, size), True
+
+    start, formatter = IDENTIFIERS[name]
+    with db_transaction.atomic():
+        sequence, _ = IdentifierSequence.objects.select_for_update().get_or_create(
+            name=name, defaults={'next_value': start}
+        )
+        IdentifierSequence.objects.filter(pk=sequence.pk).update(next_value=F('next_value') + size)
+    return sequence.next_value, not connection.in_atomic_block
+
+
+def _reserve(name, size):
+    """
+    Reserve a block of `size` sequence values and return (its identifiers minus
+    any already held by an account (legacy random identifiers), checked in bulk
+    rather than one by one, whether the reservation is already committed).
+    """
+    from .models import Account
+
+    start, formatter = IDENTIFIERS[name]
+    first, committed = _advance(name, size)
+
+    identifiers = [formatter(value) for value in range(first, first + size)]
+    taken = set()
+    for i in range(0, len(identifiers), TAKEN_CHECK_CHUNK_SIZE):
+        chunk = identifiers[i:i + TAKEN_CHECK_CHUNK_SIZE]
+        taken.update(Account.objects.filter(**{f'{name}__in': chunk}).values_list(name, flat=True))
+    return [identifier for identifier in identifiers if identifier not in taken], committed
+
+
+def _keep(name, identifiers):
+    with _lock:
+        _reserved.setdefault(name, []).extend(identifiers)
+
+
+def allocate(name, count=1):
+    """
+    Return `count` new, unused identifiers of kind `name` ('customer_id' or
+    'account_number'). Identifiers come from this process's reserved block; the
+    database is only hit to reserve a new block of ID_BLOCK_SIZE (or `count`).
+    A block reserved inside the caller's transaction (SQLite) has its unused rest
+    kept only once that transaction commits, so a rolled-back reservation is
+    never handed out twice.
+    """
+    with _lock:
+        reserved = _reserved.setdefault(name, [])
+        identifiers = reserved[:count]
+        del reserved[:count]
+
+    while len(identifiers) < count:
+        block, committed = _reserve(name, max(count - len(identifiers), ID_BLOCK_SIZE))
+        missing = count - len(identifiers)
+        identifiers.extend(block[:missing])
+        spare = block[missing:]
+        if spare and committed:
+            _keep(name, spare)
+        elif spare:
+            db_transaction.on_commit(lambda spare=spare: _keep(name, spare))
+    return identifiers
@@ -0,0 +1,40 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking.onboarding import import_accounts, AccountImportError, IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Open accounts in bulk from a CSV file of customers (user, account and opening balance)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with one customer per row')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Customers inserted per transaction')
+        parser.add_argument('--rejects', help='Write rejected rows (line, reason) to this CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as f:
+                run = import_accounts(f, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        except AccountImportError as e:
+            raise CommandError(str(e))
+
+        if options['rejects']:
+            with open(options['rejects'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'reason'])
+                writer.writerows(run.rejected)
+        else:
+            for line, reason in run.rejected[:20]:
+                self.stdout.write(self.style.WARNING(f'Line {line}: {reason}'))
+            if len(run.rejected) > 20:
+                self.stdout.write(self.style.WARNING(f'... and {len(run.rejected) - 20} more (use --rejects)'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {run.read} row(s): opened {run.created} account(s) with {run.deposited} opening deposit(s), '
+            f'rejected {len(run.rejected)} in {run.elapsed:.2f}s ({run.rate:.0f} accounts/sec)'
+        ))
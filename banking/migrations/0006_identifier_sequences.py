@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:03
+
+import banking.models
+from django.db import migrations, models
+
+
+# First value of each sequence as of this migration; later changes to
+# banking.identifiers must not alter what this migration creates
+SEQUENCE_STARTS = {
+    'customer_id': 100000,
+    'account_number': 100000000,
+}
+
+
+def create_sequences(apps, schema_editor):
+    """Start both identifier sequences; legacy random identifiers are skipped at allocation"""
+    IdentifierSequence = apps.get_model('banking', 'IdentifierSequence')
+    for name, start in SEQUENCE_STARTS.items():
+        IdentifierSequence.objects.get_or_create(name=name, defaults={'next_value': start})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_remove_account_email_verification_token_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Identifier the sequence generates (customer_id or account_number)', max_length=30, unique=True)),
+                ('next_value', models.BigIntegerField(help_text='First sequence value not yet reserved')),
+            ],
+            options={
+                'verbose_name': 'Identifier Sequence',
+                'verbose_name_plural': 'Identifier Sequences',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='customer_id',
+            field=models.CharField(default=banking.models.generate_customer_id, help_text='Unique customer ID (5 digits for legacy customers, 6 or more for new ones)', max_length=12, unique=True),
+        ),
+        migrations.RunPython(create_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0006_identifier_sequences'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='account',
+            name='account_number',
+            field=models.CharField(help_text='10-digit unique account number', max_length=10, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='customer_id',
+            field=models.CharField(help_text='Unique customer ID (5 digits for legacy customers, 6 or more for new ones)', max_length=12, unique=True),
+        ),
+    ]
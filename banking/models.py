@@ -1,22 +1,17 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-import random
 
 User = get_user_model()
 
 def generate_customer_id():
-    """Generate a unique 5-digit customer ID"""
-    while True:
-        customer_id = str(random.randint(10000, 99999))
-        if not Account.objects.filter(customer_id=customer_id).exists():
-            return customer_id
+    """Allocate a unique customer ID"""
+    from .identifiers import allocate
+    return allocate('customer_id')[0]
 
 def generate_account_number():
-    """Generate a unique 10-digit account number"""
-    while True:
-        account_number = str(random.randint(1000000000, 9999999999))
-        if not Account.objects.filter(account_number=account_number).exists():
-            return account_number
+    """Allocate a unique 10-digit account number ending in a Luhn check digit"""
+    from .identifiers import allocate
+    return allocate('account_number')[0]
 
 class Account(models.Model):
     """
@@ -41,15 +36,13 @@ class Account(models.Model):
         related_name='account'
     )
     customer_id = models.CharField(
-        max_length=5,
+        max_length=12,
         unique=True,
-        default=generate_customer_id,
-        help_text="5-digit unique customer ID"
+        help_text="Unique customer ID (5 digits for legacy customers, 6 or more for new ones)"
     )
     account_number = models.CharField(
         max_length=10,
         unique=True,
-        default=generate_account_number,
         help_text="10-digit unique account number"
     )
     ifsc_code = models.CharField(
@@ -138,7 +131,38 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.account_holder_name} - {self.account_number}"
     
+    def save(self, *args, **kwargs):
+        """Override save to allocate identifiers, only when the account is first stored"""
+        if not self.customer_id:
+            self.customer_id = generate_customer_id()
+        if not self.account_number:
+            self.account_number = generate_account_number()
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = 'Bank Account'
         verbose_name_plural = 'Bank Accounts'
         ordering = ['-opened_date']
+
+
+class IdentifierSequence(models.Model):
+    """
+    Next value of a customer ID or account number sequence; identifiers are
+    reserved from it in blocks
+    """
+    name = models.CharField(
+        max_length=30,
+        unique=True,
+        help_text="Identifier the sequence generates (customer_id or account_number)"
+    )
+    next_value = models.BigIntegerField(
+        help_text="First sequence value not yet reserved"
+    )
+    
+    def __str__(self):
+        return f"{self.name} - {self.next_value}"
+    
+    class Meta:
+        verbose_name = 'Identifier Sequence'
+        verbose_name_plural = 'Identifier Sequences'
+        ordering = ['name']
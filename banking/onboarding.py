@@ -0,0 +1,205 @@
+import csv
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django import forms
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction as db_transaction
+
+from transactions.ledger import deposit_opening_balances
+from .forms import validate_aadhar_number, validate_date_of_birth, validate_pan_number, validate_phone_number
+from .identifiers import allocate
+from .models import Account
+
+User = get_user_model()
+
+# Customers validated and inserted per database transaction
+IMPORT_BATCH_SIZE = 1000
+
+REQUIRED_COLUMNS = {'username', 'account_holder_name', 'phone_number', 'pan_number', 'aadhar_number'}
+
+# Fields that must be unique, with the label used in duplicate messages
+UNIQUE_FIELDS = (
+    ('username', 'username'),
+    ('phone_number', 'phone number'),
+    ('pan_number', 'PAN number'),
+    ('aadhar_number', 'Aadhar number'),
+)
+
+
+class AccountImportError(Exception):
+    """Raised when an import file cannot be read at all"""
+
+
+class ImportRun:
+    """
+    Running totals of an account import
+    """
+    def __init__(self):
+        self.read = 0
+        self.created = 0
+        self.deposited = 0
+        self.rejected = []
+        self.started = time.monotonic()
+
+    def reject(self, line, message):
+        self.rejected.append((line, message))
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Accounts created per second"""
+        elapsed = self.elapsed
+        return self.created / elapsed if elapsed else 0.0
+
+
+def clean_row(row):
+    """
+    Validate one CSV row with the account opening form's rules and return the
+    cleaned values. Raises forms.ValidationError for the first problem found.
+    """
+    row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+    if not row.get('username'):
+        raise forms.ValidationError('Username is required.')
+    if not row.get('account_holder_name'):
+        raise forms.ValidationError('Account holder name is required.')
+
+    dob = None
+    if row.get('date_of_birth'):
+        try:
+            dob = date.fromisoformat(row['date_of_birth'])
+        except ValueError:
+            raise forms.ValidationError('Invalid date of birth; use YYYY-MM-DD.')
+
+    gender = row.get('gender') or None
+    if gender and gender not in dict(Account.GENDER_CHOICES):
+        raise forms.ValidationError(f'Invalid gender: {gender}.')
+
+    try:
+        opening_balance = Decimal(row.get('opening_balance') or '0').quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise forms.ValidationError('Invalid opening balance.')
+    if opening_balance < 0:
+        raise forms.ValidationError('Opening balance cannot be negative.')
+
+    return {
+        'username': row['username'],
+        'email': row.get('email', ''),
+        'account_holder_name': row['account_holder_name'],
+        'phone_number': validate_phone_number(row.get('phone_number')),
+        'pan_number': validate_pan_number(row.get('pan_number')),
+        'aadhar_number': validate_aadhar_number(row.get('aadhar_number')),
+        'date_of_birth': validate_date_of_birth(dob),
+        'gender': gender,
+        'address': row.get('address') or None,
+        'opening_balance': opening_balance,
+    }
+
+
+def _taken_values(batch):
+    """Values of each unique field in `batch` already stored, one query per field"""
+    taken = {}
+    for field, label in UNIQUE_FIELDS:
+        values = [row[field] for line, row in batch]
+        model = User if field == 'username' else Account
+        taken[field] = set(model.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+    return taken
+
+
+def import_batch(batch, run):
+    """
+    Create the users, accounts and opening deposits of one batch of cleaned rows,
+    `batch` being a list of (line number, row). Rows clashing with stored customers
+    or with an earlier row of the batch are rejected; earlier batches are already
+    in the database. Returns the number of accounts created.
+    """
+    taken = _taken_values(batch)
+    seen = {field: set() for field, label in UNIQUE_FIELDS}
+    rows = []
+    for line, row in batch:
+        duplicate = next(
+            (label for field, label in UNIQUE_FIELDS if row[field] in taken[field] or row[field] in seen[field]),
+            None,
+        )
+        if duplicate:
+            run.reject(line, f'An account with this {duplicate} already exists.')
+            continue
+        for field, label in UNIQUE_FIELDS:
+            seen[field].add(row[field])
+        rows.append(row)
+    if not rows:
+        return 0
+
+    # Reserved before the transaction so the sequences are not locked while the batch is written
+    customer_ids = allocate('customer_id', len(rows))
+    account_numbers = allocate('account_number', len(rows))
+    with db_transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=row['username'],
+                email=row['email'],
+                # Imported customers set their password through password reset
+                password=make_password(None),
+                is_account_created=True,
+            )
+            for row in rows
+        ])
+        accounts = Account.objects.bulk_create([
+            Account(
+                user=user,
+                customer_id=customer_id,
+                account_number=account_number,
+                account_holder_name=row['account_holder_name'],
+                phone_number=row['phone_number'],
+                pan_number=row['pan_number'],
+                aadhar_number=row['aadhar_number'],
+                date_of_birth=row['date_of_birth'],
+                gender=row['gender'],
+                address=row['address'],
+            )
+            for user, customer_id, account_number, row in zip(users, customer_ids, account_numbers, rows)
+        ])
+        deposits = deposit_opening_balances([
+            (account, row['opening_balance'], 'Opening balance')
+            for account, row in zip(accounts, rows)
+            if row['opening_balance'] > 0
+        ])
+
+    run.created += len(accounts)
+    run.deposited += len(deposits)
+    return len(accounts)
+
+
+def import_accounts(f, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Stream customers from a CSV file (username, account_holder_name, phone_number,
+    pan_number, aadhar_number and optionally email, date_of_birth, gender, address,
+    opening_balance) and open their accounts `batch_size` rows per transaction.
+    Invalid rows are skipped and reported on the returned ImportRun.
+    """
+    reader = csv.DictReader(f)
+    columns = {name.strip().lower() for name in reader.fieldnames or []}
+    missing = REQUIRED_COLUMNS - columns
+    if missing:
+        raise AccountImportError(f"Missing column(s): {', '.join(sorted(missing))}")
+
+    run = ImportRun()
+    batch = []
+    for line, row in enumerate(reader, start=2):
+        run.read += 1
+        try:
+            batch.append((line, clean_row(row)))
+        except forms.ValidationError as e:
+            run.reject(line, e.messages[0])
+            continue
+        if len(batch) >= batch_size:
+            import_batch(batch, run)
+            batch = []
+    if batch:
+        import_batch(batch, run)
+    return run
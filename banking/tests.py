@@ -1,3 +1,110 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from transactions.models import Transaction
+
+from .identifiers import allocate, is_luhn_valid, luhn_check_digit, ID_BLOCK_SIZE
+from .models import Account, IdentifierSequence
+from .onboarding import import_accounts, AccountImportError
+
+User = get_user_model()
+
+
+class IdentifierTests(TestCase):
+    """
+    Customer IDs and account numbers come from reserved blocks and are only
+    allocated when an account is saved
+    """
+    def test_luhn_check_digit(self):
+        self.assertEqual(luhn_check_digit('7992739871'), '3')
+        self.assertTrue(is_luhn_valid('79927398713'))
+        self.assertFalse(is_luhn_valid('79927398710'))
+        self.assertFalse(is_luhn_valid('7'))
+
+    def test_unsaved_account_allocates_nothing(self):
+        before = list(IdentifierSequence.objects.values_list('name', 'next_value'))
+
+        account = Account(account_holder_name='Alice', phone_number='9000000001')
+
+        self.assertEqual((account.customer_id, account.account_number), ('', ''))
+        self.assertEqual(list(IdentifierSequence.objects.values_list('name', 'next_value')), before)
+
+    def test_saved_accounts_get_distinct_valid_identifiers(self):
+        accounts = [
+            Account.objects.create(
+                user=User.objects.create_user(username=f'user{i}', password='pass12345'),
+                account_holder_name=f'User {i}', phone_number=f'900000000{i}',
+            )
+            for i in range(3)
+        ]
+
+        account_numbers = [account.account_number for account in accounts]
+        self.assertEqual(len(set(account_numbers)), 3)
+        self.assertEqual(len({account.customer_id for account in accounts}), 3)
+        for account_number in account_numbers:
+            self.assertEqual(len(account_number), 10)
+            self.assertTrue(is_luhn_valid(account_number))
+
+    def test_allocation_skips_identifiers_already_taken(self):
+        sequence = IdentifierSequence.objects.get(name='customer_id')
+        user = User.objects.create_user(username='legacy', password='pass12345')
+        Account.objects.create(
+            user=user, customer_id=str(sequence.next_value), account_number='1234567897',
+            account_holder_name='Legacy', phone_number='9000000009',
+        )
+
+        customer_ids = allocate('customer_id', ID_BLOCK_SIZE)
+
+        self.assertNotIn(str(sequence.next_value), customer_ids)
+        self.assertEqual(len(set(customer_ids)), ID_BLOCK_SIZE)
+
+
+IMPORT_HEADER = 'username,account_holder_name,phone_number,pan_number,aadhar_number,opening_balance\n'
+
+
+class AccountImportTests(TestCase):
+    """
+    Bulk import opens valid accounts in batches and reports every rejected row
+    """
+    def test_import_creates_accounts_and_opening_deposits(self):
+        csv_file = StringIO(
+            IMPORT_HEADER
+            + 'alice,Alice,9000000001,ABCDE1234F,123456789012,500.00\n'
+            + 'bob,Bob,9000000002,ABCDE1235F,123456789013,\n'
+            + 'carol,Carol,9000000003,abcde1236f,123456789014,25\n'
+        )
+
+        run = import_accounts(csv_file, batch_size=2)
+
+        self.assertEqual((run.read, run.created, run.deposited, run.rejected), (3, 3, 2, []))
+        alice = Account.objects.get(user__username='alice')
+        self.assertEqual(alice.balance, Decimal('500.00'))
+        self.assertTrue(is_luhn_valid(alice.account_number))
+        self.assertEqual(Account.objects.get(user__username='carol').pan_number, 'ABCDE1236F')
+        self.assertEqual(Transaction.objects.filter(account=alice).get().balance_after, Decimal('500.00'))
+
+    def test_invalid_and_duplicate_rows_are_rejected(self):
+        import_accounts(StringIO(IMPORT_HEADER + 'alice,Alice,9000000001,ABCDE1234F,123456789012,\n'))
+        csv_file = StringIO(
+            IMPORT_HEADER
+            + 'alice2,Alice,9000000001,ABCDE1237F,123456789015,\n'
+            + 'dave,Dave,12345,ABCDE1238F,123456789016,\n'
+            + 'erin,Erin,9000000005,ABCDE1239F,123456789017,\n'
+            + 'erin,Erin,9000000006,ABCDE1240F,123456789018,\n'
+        )
+
+        run = import_accounts(csv_file)
+
+        self.assertEqual(run.created, 1)
+        rejected = dict(run.rejected)
+        self.assertEqual(sorted(rejected), [2, 3, 5])
+        self.assertIn('phone number', rejected[2])
+        self.assertIn('username', rejected[5])
+        self.assertEqual(Account.objects.count(), 2)
+
+    def test_missing_columns_are_reported(self):
+        with self.assertRaises(AccountImportError):
+            import_accounts(StringIO('username,phone_number\nalice,9000000001\n'))
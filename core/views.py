@@ -13,34 +13,27 @@ def dashboard(request):
     # If user has an account, get account details and statistics
     if hasattr(request.user, 'account'):
         from transactions.models import Transaction
+        from transactions.ledger import ledger_summary
         from loans.models import Loan
         from investments.models import Investment
-        from django.db.models import Sum, Count
         
         account = request.user.account
         context['account'] = account
         
         # Dashboard statistics
-        context['total_transactions'] = Transaction.objects.filter(account=account).count()
-        context['active_loans'] = Loan.objects.filter(
-            account=account, 
-            loan_status='Disbursed'
-        ).count()
+        context['ledger_summary'] = ledger_summary(account)
+        context['total_transactions'] = context['ledger_summary']['transaction_count']
+        context['loan_summary'] = Loan.objects.filter(account=account).status_summary()
+        context['active_loans'] = context['loan_summary']['active']
         
         # Investment portfolio value
-        investment_data = Investment.objects.filter(
-            account=account,
-            investment_status='Active'
-        ).aggregate(
-            total_value=Sum('current_value'),
-            count=Count('id')
-        )
-        context['investment_value'] = investment_data['total_value'] or 0
-        context['investment_count'] = investment_data['count'] or 0
+        context['investment_summary'] = Investment.objects.filter(account=account).portfolio_summary()
+        context['investment_value'] = context['investment_summary']['active_value']
+        context['investment_count'] = context['investment_summary']['active']
         
         # Recent transactions (last 5)
-        context['recent_transactions'] = Transaction.objects.filter(
-            account=account
+        context['recent_transactions'] = Transaction.objects.for_ledger(
+            account
         ).order_by('-timestamp')[:5]
     
     return render(request, 'core/dashboard.html', context)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Investment, InvestmentTransaction
+from .models import Investment, InvestmentTransaction, PriceHistory
 
 @admin.register(Investment)
 class InvestmentAdmin(admin.ModelAdmin):
@@ -10,7 +10,7 @@ class InvestmentAdmin(admin.ModelAdmin):
                     'current_value', 'profit_loss_display', 'investment_status', 'start_date')
     list_filter = ('investment_type', 'investment_status', 'risk_level', 'start_date')
     search_fields = ('investment_name', 'account__account_holder_name')
-    readonly_fields = ('start_date', 'profit_loss', 'return_percentage')
+    readonly_fields = ('start_date', 'profit_loss', 'return_percentage', 'units_held', 'average_cost')
     date_hierarchy = 'start_date'
     
     fieldsets = (
@@ -21,6 +21,12 @@ class InvestmentAdmin(admin.ModelAdmin):
             'fields': ('principal_amount', 'current_value', 'expected_return_rate', 
                       'profit_loss', 'return_percentage')
         }),
+        ('Holding', {
+            'fields': ('units_held', 'average_cost')
+        }),
+        ('SIP', {
+            'fields': ('sip_amount', 'next_sip_date')
+        }),
         ('Dates', {
             'fields': ('start_date', 'maturity_date')
         }),
@@ -40,9 +46,20 @@ class InvestmentTransactionAdmin(admin.ModelAdmin):
     """
     Admin interface for Investment Transaction model
     """
-    list_display = ('id', 'investment', 'transaction_type', 'amount', 
+    list_display = ('id', 'investment', 'transaction_type', 'amount', 'units', 'price_per_unit',
                     'reference_number', 'transaction_date')
     list_filter = ('transaction_type', 'transaction_date')
     search_fields = ('reference_number', 'investment__investment_name')
     readonly_fields = ('transaction_date',)
     date_hierarchy = 'transaction_date'
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    """
+    Admin interface for imported instrument prices
+    """
+    list_display = ('instrument', 'date', 'price')
+    list_filter = ('date',)
+    search_fields = ('instrument',)
+    date_hierarchy = 'date'
@@ -8,7 +8,7 @@ class InvestmentForm(forms.ModelForm):
     class Meta:
         model = Investment
         fields = ['investment_type', 'investment_name', 'principal_amount', 
-                  'expected_return_rate', 'maturity_date', 'risk_level', 'notes']
+                  'expected_return_rate', 'maturity_date', 'sip_amount', 'risk_level', 'notes']
         widgets = {
             'investment_type': forms.Select(attrs={
                 'class': 'w-full px-4 py-3 bg-white/5 border border-white/10 rounded-xl text-white focus:outline-none focus:border-teal-500/50 focus:bg-white/8'
@@ -31,6 +31,11 @@ class InvestmentForm(forms.ModelForm):
                 'class': 'w-full px-4 py-3 bg-white/5 border border-white/10 rounded-xl text-white focus:outline-none focus:border-teal-500/50 focus:bg-white/8',
                 'type': 'date'
             }),
+            'sip_amount': forms.NumberInput(attrs={
+                'class': 'w-full px-4 py-3 bg-white/5 border border-white/10 rounded-xl text-white focus:outline-none focus:border-teal-500/50 focus:bg-white/8',
+                'placeholder': 'Monthly instalment (SIP only)',
+                'step': '0.01'
+            }),
             'risk_level': forms.Select(attrs={
                 'class': 'w-full px-4 py-3 bg-white/5 border border-white/10 rounded-xl text-white focus:outline-none focus:border-teal-500/50 focus:bg-white/8'
             }),
@@ -46,9 +51,20 @@ class InvestmentForm(forms.ModelForm):
             'principal_amount': 'Investment Amount (₹)',
             'expected_return_rate': 'Expected Return Rate (% per annum)',
             'maturity_date': 'Maturity Date',
+            'sip_amount': 'Monthly SIP Instalment (₹)',
             'risk_level': 'Risk Level',
             'notes': 'Notes'
         }
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('investment_type') == 'SIP':
+            sip_amount = cleaned_data.get('sip_amount')
+            if not sip_amount or sip_amount <= 0:
+                self.add_error('sip_amount', 'Enter the monthly instalment for a SIP.')
+        else:
+            cleaned_data['sip_amount'] = None
+        return cleaned_data
 
 
 class WithdrawInvestmentForm(forms.Form):
@@ -0,0 +1,143 @@
+from decimal import Decimal
+
+from django.db.models import F
+
+from .models import Investment, InvestmentTransaction, PriceHistory
+
+UNIT_QUANTUM = Decimal('0.0001')
+PRICE_QUANTUM = Decimal('0.01')
+
+def market_price(instrument, as_of=None):
+    """Latest imported price of an instrument on or before `as_of`, or None"""
+    prices = PriceHistory.objects.filter(instrument=instrument)
+    if as_of:
+        prices = prices.filter(date__lte=as_of)
+    return prices.order_by('-date').values_list('price', flat=True).first()
+
+
+def add_units(units_held, average_cost, units, amount):
+    """Holding after buying `units` for `amount`, as (units held, average cost)"""
+    total_units = units_held + units
+    if total_units > 0:
+        return total_units, ((average_cost * units_held + amount) / total_units).quantize(UNIT_QUANTUM)
+    return total_units, Decimal('0')
+
+
+def purchase_price(units_held, current_value, price, has_history):
+    """
+    Unit price of a purchase into a holding, or None if the purchase must not be
+    recorded in units. A holding tracks units only while every rupee in it was
+    bought at a real price: a unit holding with no market price buys at its carried
+    value per unit, and a holding that already carries money without units (bought
+    before its instrument had a price) stays unitless, so revaluation never
+    multiplies made-up units by a real price.
+    """
+    if units_held > 0:
+        return Decimal(price or current_value / units_held).quantize(PRICE_QUANTUM)
+    if has_history or not price:
+        return None
+    return Decimal(price).quantize(PRICE_QUANTUM)
+
+
+def _lock(investment):
+    return Investment.objects.select_for_update().only(
+        'id', 'units_held', 'average_cost', 'current_value'
+    ).get(pk=investment.pk)
+
+
+def buy_units(investment, amount, reference_number, transaction_type='Buy', price=None):
+    """
+    Record a purchase of `amount` and add its units to the holding.
+    Units are priced at `price`, else the latest market price (see purchase_price);
+    with no price the purchase is recorded without units.
+    The holding row is locked and its average cost updated incrementally.
+    Must be called inside a transaction. Returns the InvestmentTransaction.
+    """
+    holding = _lock(investment)
+    has_history = (
+        holding.units_held == 0
+        and InvestmentTransaction.objects.filter(investment=investment).exists()
+    )
+    price = purchase_price(
+        holding.units_held, holding.current_value,
+        price or market_price(investment.investment_name), has_history,
+    )
+    units = None
+    if price:
+        units = (amount / price).quantize(UNIT_QUANTUM)
+        total_units, average_cost = add_units(holding.units_held, holding.average_cost, units, amount)
+        Investment.objects.filter(pk=investment.pk).update(units_held=total_units, average_cost=average_cost)
+        investment.units_held = total_units
+        investment.average_cost = average_cost
+
+    return InvestmentTransaction.objects.create(
+        investment=investment,
+        transaction_type=transaction_type,
+        amount=amount,
+        units=units,
+        price_per_unit=price,
+        reference_number=reference_number,
+    )
+
+
+def sell_units(investment, amount, reference_number):
+    """
+    Record a sale of `amount` and take the matching units off the holding.
+    Units are priced at the holding's carried value per unit (current value / units),
+    so a sale of the full current value empties the holding. Average cost is unchanged.
+    Must be called inside a transaction, before current_value is reduced.
+    """
+    holding = _lock(investment)
+    units = price = None
+    if holding.units_held > 0 and holding.current_value > 0:
+        price = holding.current_value / holding.units_held
+        units = min((amount / price).quantize(UNIT_QUANTUM), holding.units_held)
+        Investment.objects.filter(pk=investment.pk).update(units_held=F('units_held') - units)
+        investment.units_held = holding.units_held - units
+        price = price.quantize(PRICE_QUANTUM)
+
+    return InvestmentTransaction.objects.create(
+        investment=investment,
+        transaction_type='Sell',
+        amount=amount,
+        units=units,
+        price_per_unit=price,
+        reference_number=reference_number,
+    )
+
+
+def rebuild_holdings(investments):
+    """
+    Recompute units_held and average_cost of `investments` by replaying their unit
+    transactions; investments with a purchase recorded without units get none. A repair tool; day-to-day valuation reads the cached columns.
+    Returns the number of investments updated.
+    """
+    holdings = {}
+    # Holdings with money bought without units do not track units at all
+    unitless = set(
+        InvestmentTransaction.objects.filter(
+            investment__in=investments, transaction_type='Buy', units__isnull=True,
+        ).values_list('investment_id', flat=True)
+    )
+    rows = InvestmentTransaction.objects.filter(
+        investment__in=investments,
+        units__isnull=False,
+    ).order_by('investment_id', 'transaction_date', 'id').values_list(
+        'investment_id', 'transaction_type', 'amount', 'units'
+    )
+    for investment_id, transaction_type, amount, units in rows.iterator(chunk_size=2000):
+        if investment_id in unitless:
+            continue
+        held, cost = holdings.get(investment_id, (Decimal('0'), Decimal('0')))
+        if transaction_type == 'Sell':
+            held -= units
+        else:
+            held, cost = add_units(held, cost, units, amount)
+        holdings[investment_id] = (held, cost)
+
+    updated = []
+    for investment in investments.only('id', 'units_held', 'average_cost'):
+        investment.units_held, investment.average_cost = holdings.get(investment.id, (Decimal('0'), Decimal('0')))
+        updated.append(investment)
+    Investment.objects.bulk_update(updated, ['units_held', 'average_cost'], batch_size=1000)
+    return len(updated)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.valuation import import_prices, PriceFileError, PRICE_IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Load instrument prices from a CSV file (instrument, date, price or nav)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV price file')
+        parser.add_argument('--batch-size', type=int, default=PRICE_IMPORT_BATCH_SIZE,
+                            help='Price rows written per INSERT')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['path'], newline='') as f:
+                count = import_prices(f, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(f'Cannot read price file: {e}')
+        except PriceFileError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Imported {count} price(s) in {elapsed:.2f}s'))
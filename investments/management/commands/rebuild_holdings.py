@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from investments.holdings import rebuild_holdings
+from investments.models import Investment
+
+
+class Command(BaseCommand):
+    help = 'Recompute cached units held and average cost from investment transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investment', type=int, action='append',
+                            help='Only repair this investment id (may be repeated)')
+
+    def handle(self, *args, **options):
+        investments = Investment.objects.all()
+        if options['investment']:
+            investments = investments.filter(pk__in=options['investment'])
+        updated = rebuild_holdings(investments)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt holdings for {updated} investment(s)'))
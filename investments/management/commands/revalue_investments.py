@@ -0,0 +1,31 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.valuation import revalue_investments, REVALUATION_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Mark active investments to market from the latest imported prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Value with prices on or before this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--batch-size', type=int, default=REVALUATION_BATCH_SIZE,
+                            help='Investments revalued per UPDATE statement')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        started = time.monotonic()
+        updated = revalue_investments(as_of=as_of, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        rate = updated / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f'Revalued {updated} investment(s) in {elapsed:.2f}s ({rate:.0f} holdings/sec)'
+        ))
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.maturity import run_maturity, MATURITY_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Mature fixed deposits, accrue FD interest and execute due SIP instalments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Process everything due on or before this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--batch-size', type=int, default=MATURITY_BATCH_SIZE,
+                            help='Investments processed per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Roll every batch back and only report what would change')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        run = run_maturity(as_of=as_of, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        prefix = 'Dry run: would touch' if run.dry_run else 'Touched'
+        self.stdout.write(
+            f'{prefix} {run.rows} row(s): {run.matured} FD(s) matured (₹{run.credited} credited), '
+            f'{run.accrued} FD(s) accrued, {run.sip_executed} SIP instalment(s) executed '
+            f'(₹{run.sip_invested}), {run.sip_failed} bounced'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Finished in {run.elapsed:.2f}s'))
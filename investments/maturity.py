@@ -0,0 +1,249 @@
+import time
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from transactions.ledger import deposit_many, lock_accounts, withdraw, LedgerError
+from .holdings import PRICE_QUANTUM, UNIT_QUANTUM, add_units, purchase_price
+from .models import Investment, InvestmentTransaction
+from .valuation import latest_price
+
+# Investments processed per database transaction
+MATURITY_BATCH_SIZE = 1000
+
+PAISA = Decimal('0.01')
+DAYS_IN_YEAR = Decimal('365')
+
+
+class MaturityRun:
+    """
+    Running totals of a maturity run. In a dry run every batch is rolled back,
+    so the totals are what a real run would have done, except that SIP debits do
+    not see the credits of FDs that matured in the same run.
+    """
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.accrued = 0
+        self.matured = 0
+        self.credited = 0
+        self.sip_executed = 0
+        self.sip_failed = 0
+        self.sip_invested = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows(self):
+        """Investments (FDs) and instalments (SIPs) touched"""
+        return self.accrued + self.matured + self.sip_executed + self.sip_failed
+
+
+def active_fds():
+    return Investment.objects.filter(investment_type='Fixed_Deposit', investment_status='Active')
+
+
+def due_sips(as_of):
+    """Active SIPs with an instalment due on or before `as_of`"""
+    return Investment.objects.filter(
+        investment_type='SIP',
+        investment_status='Active',
+        sip_amount__gt=0,
+        next_sip_date__lte=as_of,
+    )
+
+
+def accrued_interest(fd, end_date):
+    """
+    Simple interest earned by an FD from its last accrual (or its start date) up to
+    `end_date`. Withdrawals are taken out of interest before principal, so the
+    principal still earning interest is the smaller of the original principal and
+    the current value.
+    """
+    accrued_from = fd.accrued_through or timezone.localdate(fd.start_date)
+    days = max((end_date - accrued_from).days, 0)
+    principal = min(fd.principal_amount, fd.current_value)
+    if days == 0 or principal <= 0:
+        return Decimal('0')
+    return (principal * Decimal(fd.expected_return_rate) / 100 * days / DAYS_IN_YEAR).quantize(PAISA)
+
+
+def _accrue(fd, end_date):
+    """Add the interest earned up to `end_date` to the FD's value; never lowers it"""
+    fd.current_value += accrued_interest(fd, end_date)
+    fd.accrued_through = max(end_date, fd.accrued_through or end_date)
+
+
+def _lock_batch(queryset, after_id, batch_size):
+    """
+    Lock the accounts of the next `batch_size` investments of `queryset` after
+    `after_id`, then the investments themselves, the account-first order every
+    ledger path uses. Must be called inside a transaction.
+    Returns (last id looked at or None when nothing is left, locked investments
+    still matching `queryset`, with their locked accounts attached).
+    """
+    rows = list(queryset.filter(pk__gt=after_id).order_by('pk').values_list('pk', 'account_id')[:batch_size])
+    if not rows:
+        return None, []
+    accounts = lock_accounts({account_id for pk, account_id in rows})
+    investments = list(
+        queryset.filter(pk__in=[pk for pk, account_id in rows])
+        .select_for_update(of=('self',))
+        .order_by('pk')
+    )
+    for investment in investments:
+        investment.account = accounts[investment.account_id]
+    return rows[-1][0], investments
+
+
+def _finish_batch(run):
+    if run.dry_run:
+        db_transaction.set_rollback(True)
+
+
+def accrue_fd_batch(as_of, run, after_id=0, batch_size=MATURITY_BATCH_SIZE):
+    """
+    Add the interest the next batch of unmatured FDs earned since their last accrual
+    up to `as_of`, with one UPDATE.
+    Returns the last FD id looked at, or None when nothing is left.
+    """
+    with db_transaction.atomic():
+        fds = list(
+            active_fds().filter(
+                Q(maturity_date__isnull=True) | Q(maturity_date__gt=as_of),
+                Q(accrued_through__isnull=True) | Q(accrued_through__lt=as_of),
+                pk__gt=after_id,
+            )
+            .select_for_update()
+            .only('id', 'principal_amount', 'expected_return_rate', 'start_date', 'current_value', 'accrued_through')
+            .order_by('pk')[:batch_size]
+        )
+        if not fds:
+            return None
+
+        changed = []
+        for fd in fds:
+            value = fd.current_value
+            _accrue(fd, as_of)
+            if fd.current_value != value:
+                changed.append(fd)
+        Investment.objects.bulk_update(fds, ['current_value', 'accrued_through'])
+        run.accrued += len(changed)
+        _finish_batch(run)
+    return fds[-1].id
+
+
+def mature_fd_batch(as_of, run, after_id=0, batch_size=MATURITY_BATCH_SIZE):
+    """
+    Pay out the next batch of FDs that matured on or before `as_of`: all accounts are
+    credited with one ledger posting, the FDs flipped to Matured with one UPDATE and
+    their payout transactions written with one INSERT.
+    Returns the last FD id looked at, or None when nothing is left.
+    """
+    with db_transaction.atomic():
+        last_id, fds = _lock_batch(active_fds().filter(maturity_date__lte=as_of), after_id, batch_size)
+        if not fds:
+            return last_id
+
+        payouts = []
+        for fd in fds:
+            _accrue(fd, fd.maturity_date)
+            value = fd.current_value
+            payouts.append(InvestmentTransaction(
+                investment=fd,
+                transaction_type='Sell',
+                amount=value,
+                units=fd.units_held or None,
+                price_per_unit=(value / fd.units_held).quantize(PRICE_QUANTUM) if fd.units_held else None,
+                reference_number=f'MAT-{fd.id}-{fd.maturity_date:%Y%m%d}',
+            ))
+            fd.investment_status = 'Matured'
+            fd.units_held = 0
+
+        deposit_many([
+            (fd.account, fd.current_value, f'Fixed deposit matured - {fd.investment_name}')
+            for fd in fds
+        ])
+        Investment.objects.bulk_update(fds, ['current_value', 'accrued_through', 'investment_status', 'units_held'])
+        InvestmentTransaction.objects.bulk_create(payouts)
+        run.matured += len(fds)
+        run.credited += sum(fd.current_value for fd in fds)
+        _finish_batch(run)
+    return last_id
+
+
+def execute_sip_batch(as_of, run, after_id=0, batch_size=MATURITY_BATCH_SIZE):
+    """
+    Execute every instalment due by `as_of` for the next batch of SIPs. Each
+    instalment is debited on its own so one short account does not fail the batch;
+    a bounced instalment is skipped, as a bank would. Holdings are written back with
+    one UPDATE and the purchases with one INSERT.
+    Returns the last SIP id looked at, or None when nothing is left.
+    """
+    with db_transaction.atomic():
+        last_id, sips = _lock_batch(
+            due_sips(as_of).annotate(market_price=latest_price(as_of)), after_id, batch_size
+        )
+        if not sips:
+            return last_id
+
+        # SIPs already holding money bought without units keep buying without units
+        unitless = set(
+            InvestmentTransaction.objects.filter(investment__in=[sip for sip in sips if sip.units_held == 0])
+            .values_list('investment_id', flat=True).distinct()
+        )
+        purchases = []
+        for sip in sips:
+            price = purchase_price(sip.units_held, sip.current_value, sip.market_price, sip.id in unitless)
+            while sip.next_sip_date <= as_of:
+                amount = sip.sip_amount
+                try:
+                    with db_transaction.atomic():
+                        withdraw(sip.account, amount, f'SIP instalment - {sip.investment_name}')
+                except LedgerError:
+                    run.sip_failed += 1
+                else:
+                    units = None
+                    if price:
+                        units = (amount / price).quantize(UNIT_QUANTUM)
+                        sip.units_held, sip.average_cost = add_units(sip.units_held, sip.average_cost, units, amount)
+                    sip.principal_amount += amount
+                    sip.current_value += amount
+                    purchases.append(InvestmentTransaction(
+                        investment=sip,
+                        transaction_type='Buy',
+                        amount=amount,
+                        units=units,
+                        price_per_unit=price,
+                        reference_number=f'SIP-{sip.id}-{sip.next_sip_date:%Y%m%d}',
+                    ))
+                    run.sip_executed += 1
+                    run.sip_invested += amount
+                sip.next_sip_date += relativedelta(months=1)
+
+        Investment.objects.bulk_update(sips, [
+            'units_held', 'average_cost', 'principal_amount', 'current_value', 'next_sip_date'
+        ])
+        InvestmentTransaction.objects.bulk_create(purchases)
+        _finish_batch(run)
+    return last_id
+
+
+def run_maturity(as_of=None, batch_size=MATURITY_BATCH_SIZE, dry_run=False):
+    """
+    Mature due FDs, accrue interest on the rest and execute due SIP instalments,
+    `batch_size` investments per transaction. With `dry_run` every batch is rolled
+    back and the returned MaturityRun reports what would have been done.
+    """
+    as_of = as_of or timezone.localdate()
+    run = MaturityRun(dry_run=dry_run)
+    for step in (mature_fd_batch, accrue_fd_batch, execute_sip_batch):
+        after_id = 0
+        while after_id is not None:
+            after_id = step(as_of, run, after_id, batch_size)
+    return run
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument', models.CharField(help_text='Instrument name, matching Investment.investment_name', max_length=200)),
+                ('date', models.DateField(help_text='Price date')),
+                ('price', models.DecimalField(decimal_places=4, help_text='Price or NAV per unit', max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Price History',
+                'verbose_name_plural': 'Price History',
+                'ordering': ['instrument', '-date'],
+                'constraints': [models.UniqueConstraint(fields=('instrument', 'date'), name='unique_instrument_price_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0002_pricehistory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Average purchase cost per unit held', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='investment',
+            name='units_held',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Units currently held, kept in step with buy/sell transactions', max_digits=16),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_remove_account_email_verification_token_and_more'),
+        ('investments', '0003_investment_holdings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='next_sip_date',
+            field=models.DateField(blank=True, help_text='Date the next SIP instalment is due', null=True),
+        ),
+        migrations.AddField(
+            model_name='investment',
+            name='sip_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Monthly instalment of a SIP', max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['investment_type', 'investment_status'], name='investment_type_status_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:14
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def mark_accrued_fds(apps, schema_editor):
+    """FDs whose value already includes interest were accrued up to the last daily run"""
+    Investment = apps.get_model('investments', 'Investment')
+    Investment.objects.filter(
+        investment_type='Fixed_Deposit',
+        investment_status='Active',
+        current_value__gt=F('principal_amount'),
+    ).update(accrued_through=timezone.localdate())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0004_investment_sip_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='accrued_through',
+            field=models.DateField(blank=True, help_text='Date up to which fixed deposit interest has been added to the current value', null=True),
+        ),
+        migrations.RunPython(mark_accrued_fds, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,58 @@
 from django.db import models
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
 from banking.models import Account
 from django.utils import timezone
 
+
+class InvestmentQuerySet(models.QuerySet):
+    def with_returns(self):
+        """Annotate each investment with its gain (current - principal) and gain percentage"""
+        gain = ExpressionWrapper(
+            F('current_value') - F('principal_amount'),
+            output_field=DecimalField(max_digits=13, decimal_places=2)
+        )
+        return self.annotate(gain=gain).annotate(
+            gain_percentage=Case(
+                When(principal_amount__gt=0, then=F('gain') * Value(100) / F('principal_amount')),
+                default=Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+    
+    def portfolio_summary(self):
+        """
+        Invested amount, current value, profit/loss and investment counts by type,
+        status and risk level, computed with one grouped query
+        """
+        active = Q(investment_status='Active')
+        rows = self.order_by().values('investment_type', 'investment_status', 'risk_level').annotate(
+            count=Count('id'),
+            invested=Sum('principal_amount'),
+            current=Sum('current_value'),
+            active_count=Count('id', filter=active),
+            active_value=Sum('current_value', filter=active, default=0),
+        )
+        
+        summary = {
+            'count': 0, 'active': 0, 'invested': 0, 'current': 0, 'active_value': 0,
+            'by_type': {}, 'by_status': {}, 'by_risk': {},
+        }
+        for row in rows:
+            summary['count'] += row['count']
+            summary['active'] += row['active_count']
+            summary['invested'] += row['invested']
+            summary['current'] += row['current']
+            summary['active_value'] += row['active_value']
+            for key, field in (('by_type', 'investment_type'), ('by_status', 'investment_status'), ('by_risk', 'risk_level')):
+                summary[key][row[field]] = summary[key].get(row[field], 0) + row['count']
+        
+        summary['profit_loss'] = summary['current'] - summary['invested']
+        summary['return_percentage'] = (
+            summary['profit_loss'] * 100 / summary['invested'] if summary['invested'] else 0
+        )
+        return summary
+
+
 class Investment(models.Model):
     """
     Investment model for tracking user investments
@@ -76,6 +127,37 @@ class Investment(models.Model):
         blank=True,
         help_text="Additional notes"
     )
+    units_held = models.DecimalField(
+        max_digits=16,
+        decimal_places=4,
+        default=0,
+        help_text="Units currently held, kept in step with buy/sell transactions"
+    )
+    average_cost = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        default=0,
+        help_text="Average purchase cost per unit held"
+    )
+    accrued_through = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Date up to which fixed deposit interest has been added to the current value"
+    )
+    sip_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Monthly instalment of a SIP"
+    )
+    next_sip_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Date the next SIP instalment is due"
+    )
+    
+    objects = InvestmentQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.investment_name} - ₹{self.principal_amount}"
@@ -101,6 +183,10 @@ class Investment(models.Model):
         verbose_name = 'Investment'
         verbose_name_plural = 'Investments'
         ordering = ['-start_date']
+        indexes = [
+            # FD maturity and SIP scans by the maturity scheduler
+            models.Index(fields=['investment_type', 'investment_status'], name='investment_type_status_idx'),
+        ]
 
 
 class InvestmentTransaction(models.Model):
@@ -160,3 +246,36 @@ class InvestmentTransaction(models.Model):
         verbose_name = 'Investment Transaction'
         verbose_name_plural = 'Investment Transactions'
         ordering = ['-transaction_date']
+
+
+class PriceHistory(models.Model):
+    """
+    Daily market price (or NAV) of an instrument, used to value investments.
+    Instruments are matched to investments by investment_name.
+    """
+    instrument = models.CharField(
+        max_length=200,
+        help_text="Instrument name, matching Investment.investment_name"
+    )
+    date = models.DateField(
+        help_text="Price date"
+    )
+    price = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        help_text="Price or NAV per unit"
+    )
+    
+    def __str__(self):
+        return f"{self.instrument} - {self.date} - ₹{self.price}"
+    
+    class Meta:
+        verbose_name = 'Price History'
+        verbose_name_plural = 'Price History'
+        ordering = ['instrument', '-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['instrument', 'date'],
+                name='unique_instrument_price_per_day',
+            ),
+        ]
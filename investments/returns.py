@@ -0,0 +1,196 @@
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Investment, InvestmentTransaction
+
+# Seconds computed returns are kept; new transactions change the cache key anyway
+RETURNS_CACHE_TTL = 3600
+
+XIRR_GUESS = 0.1
+XIRR_TOLERANCE = 1e-7
+XIRR_MAX_ITERATIONS = 100
+
+
+def xirr_many(amounts, years, guess=XIRR_GUESS, tol=XIRR_TOLERANCE, max_iter=XIRR_MAX_ITERATIONS):
+    """
+    Annual internal rate of return of many cash-flow series at once.
+    `amounts` and `years` are (series, flows) arrays: money paid in is negative,
+    money taken out (and the closing value) positive, `years` counts from each
+    series' first flow. Series are padded with zero amounts. Newton's method runs
+    on every series together; series with no sign change, with every flow on the
+    same day (no rate is defined) or that do not converge come back as NaN.
+    """
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+    years = np.atleast_2d(np.asarray(years, dtype=float))
+    rate = np.full(amounts.shape[0], guess)
+    done = np.zeros(amounts.shape[0], dtype=bool)
+    span = np.where(amounts != 0, years, np.nan)
+    with np.errstate(invalid='ignore'):
+        solvable = (
+            (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+            & (np.nanmax(span, axis=1, initial=0) > np.nanmin(span, axis=1, initial=np.inf))
+        )
+
+    for _ in range(max_iter):
+        base = 1 + rate[:, None]
+        discounted = amounts * np.power(base, -years)
+        npv = discounted.sum(axis=1)
+        slope = (-years * discounted / base).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(slope != 0, npv / slope, 0.0)
+        # Keep every rate above -100%, where the discount factor is defined
+        rate = np.where(done, rate, np.maximum(rate - step, -0.9999))
+        # A flat NPV gives no step at all, which is not convergence
+        done |= (np.abs(step) < tol) & (slope != 0)
+        if done.all():
+            break
+
+    return np.where(solvable & done & np.isfinite(rate), rate, np.nan)
+
+
+def _forward_fill(values):
+    """Carry the last non-NaN value of each column down over later NaNs"""
+    rows = np.where(np.isnan(values), 0, np.arange(values.shape[0])[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+def twr_many(day_index, column, units, prices, closing_prices, days):
+    """
+    Time-weighted return of each column (holding) and of all columns together.
+    Each unit transaction is given by its day index (0 .. days - 1), column, signed
+    units and unit price; `closing_prices` is the unit price of each holding on the
+    last day (NaN when unknown). Holdings are valued at the last known unit price, the
+    period between consecutive days is linked geometrically and flows on a day
+    do not count as return. Returns (per-column TWR array, portfolio TWR).
+    """
+    holdings = len(closing_prices)
+
+    unit_changes = np.zeros((days, holdings))
+    np.add.at(unit_changes, (day_index, column), units)
+    held = np.cumsum(unit_changes, axis=0)
+
+    price = np.full((days, holdings), np.nan)
+    price[day_index, column] = prices
+    price[-1] = np.where(np.isnan(closing_prices), price[-1], closing_prices)
+    price = _forward_fill(price)
+
+    value_after = np.nan_to_num(held * price)
+    value_before = np.nan_to_num(held[:-1] * price[1:])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(value_after[:-1] > 0, value_before / value_after[:-1], 1.0)
+        total_growth = np.where(
+            value_after[:-1].sum(axis=1) > 0,
+            value_before.sum(axis=1) / value_after[:-1].sum(axis=1),
+            1.0,
+        )
+
+    priced = (value_after > 0).any(axis=0)
+    return np.where(priced, growth.prod(axis=0) - 1, np.nan), total_growth.prod() - 1
+
+
+def _percent(value):
+    return None if value is None or np.isnan(value) else round(float(value) * 100, 2)
+
+
+def _cash_flow(transaction_type, amount, units):
+    """Money the investor received (+) or paid (-) in a transaction"""
+    if transaction_type == 'Buy':
+        return -amount
+    if transaction_type == 'Dividend' and units:
+        # Reinvested dividend: bought units, no money left the holding
+        return 0
+    return amount
+
+
+def compute_returns(investments, as_of=None):
+    """
+    XIRR and time-weighted return (both in %) of each investment and of all of
+    them together, from their InvestmentTransaction cash flows. Active holdings
+    are closed out at their current value on `as_of`.
+    Returns {'investments': {id: {'xirr', 'twr'}}, 'portfolio': {'xirr', 'twr'}}.
+    """
+    as_of = as_of or timezone.localdate()
+    investments = list(investments.only('id', 'investment_status', 'current_value', 'units_held'))
+    columns = {investment.id: i for i, investment in enumerate(investments)}
+    rows = list(
+        InvestmentTransaction.objects.filter(investment__in=investments)
+        .order_by('transaction_date', 'id')
+        .values_list('investment_id', 'transaction_type', 'amount', 'units', 'price_per_unit', 'transaction_date')
+    )
+
+    # Cash flows per investment (row i) plus the whole portfolio (last row)
+    flows = [[] for _ in range(len(investments) + 1)]
+    units_rows = []
+    for investment_id, transaction_type, amount, units, price, transaction_date in rows:
+        day = timezone.localdate(transaction_date).toordinal()
+        flow = float(_cash_flow(transaction_type, amount, units))
+        if flow:
+            flows[columns[investment_id]].append((day, flow))
+            flows[-1].append((day, flow))
+        if units and price:
+            signed_units = -units if transaction_type == 'Sell' else units
+            units_rows.append((day, columns[investment_id], float(signed_units), float(price)))
+
+    closing_prices = np.full(len(investments), np.nan)
+    for i, investment in enumerate(investments):
+        if investment.investment_status == 'Active' and investment.current_value > 0:
+            flows[i].append((as_of.toordinal(), float(investment.current_value)))
+            flows[-1].append((as_of.toordinal(), float(investment.current_value)))
+            if investment.units_held > 0:
+                closing_prices[i] = float(investment.current_value / investment.units_held)
+
+    # XIRR: pad the series into (series, flows) arrays and solve them together
+    width = max((len(series) for series in flows), default=0) or 1
+    amounts = np.zeros((len(flows), width))
+    years = np.zeros((len(flows), width))
+    for i, series in enumerate(flows):
+        if series:
+            days, values = zip(*series)
+            amounts[i, :len(series)] = values
+            years[i, :len(series)] = (np.array(days) - min(days)) / 365
+    xirr = xirr_many(amounts, years)
+
+    # TWR: unit prices on every transaction day plus the closing day
+    if units_rows:
+        days, column, units, prices = (np.array(values) for values in zip(*units_rows))
+        calendar = np.unique(days[days < as_of.toordinal()])
+        twr, portfolio_twr = twr_many(
+            np.searchsorted(calendar, days), column.astype(int), units, prices, closing_prices,
+            days=len(calendar) + 1,
+        )
+    else:
+        twr, portfolio_twr = np.full(len(investments), np.nan), np.nan
+
+    return {
+        'investments': {
+            investment.id: {'xirr': _percent(xirr[i]), 'twr': _percent(twr[i])}
+            for i, investment in enumerate(investments)
+        },
+        'portfolio': {'xirr': _percent(xirr[-1]), 'twr': _percent(portfolio_twr)},
+    }
+
+
+def account_returns(account, as_of=None):
+    """
+    compute_returns() for all investments of an account, cached. The cache key
+    includes the account's latest transaction id, transaction count and total
+    current value, so a new transaction or a revaluation computes afresh.
+    """
+    as_of = as_of or timezone.localdate()
+    investments = Investment.objects.filter(account=account)
+    activity = InvestmentTransaction.objects.filter(investment__account=account).aggregate(
+        last_id=Max('id'), count=Count('id')
+    )
+    value = investments.aggregate(total=Sum('current_value'))['total']
+    cache_key = (
+        f'investments:returns:{account.pk}:{as_of.isoformat()}:'
+        f'{activity["last_id"]}:{activity["count"]}:{value}'
+    )
+    returns = cache.get(cache_key)
+    if returns is None:
+        returns = compute_returns(investments, as_of)
+        cache.set(cache_key, returns, RETURNS_CACHE_TTL)
+    return returns
@@ -1,3 +1,322 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from banking.models import Account
+from .maturity import run_maturity
+from .holdings import buy_units, sell_units, rebuild_holdings
+from .models import Investment, InvestmentTransaction, PriceHistory
+from .returns import twr_many, xirr_many
+from .valuation import import_prices, revalue_investments, PriceFileError
+
+User = get_user_model()
+
+
+def _create_account(username, phone_number, balance=0):
+    user = User.objects.create_user(username=username, password='pass12345')
+    return Account.objects.create(
+        user=user, account_holder_name=username.title(), phone_number=phone_number, balance=balance
+    )
+
+
+class FixedDepositMaturityTests(TestCase):
+    """
+    FD accrual must only ever add interest earned since the last run
+    """
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001', balance=Decimal('100.00'))
+        self.today = timezone.localdate()
+        self.fd = Investment.objects.create(
+            account=self.account, investment_type='Fixed_Deposit', investment_name='Alice FD',
+            principal_amount=Decimal('1000.00'), current_value=Decimal('1000.00'),
+            expected_return_rate=Decimal('10.00'), maturity_date=self.today + timedelta(days=730),
+        )
+        # Opened a year ago
+        Investment.objects.filter(pk=self.fd.pk).update(start_date=timezone.now() - timedelta(days=365))
+
+    def test_accrual_adds_simple_interest_once(self):
+        run_maturity(as_of=self.today)
+        run_maturity(as_of=self.today)
+
+        self.fd.refresh_from_db()
+        self.assertEqual(self.fd.current_value, Decimal('1100.00'))
+        self.assertEqual(self.fd.accrued_through, self.today)
+
+    def test_withdrawal_then_accrual_keeps_credited_interest(self):
+        run_maturity(as_of=self.today)
+        self.client.force_login(self.account.user)
+        self.client.post(
+            reverse('investments:withdraw_investment', args=[self.fd.id]),
+            {'confirm_withdrawal': 'on', 'withdrawal_amount': '500.00'},
+        )
+        self.fd.refresh_from_db()
+        self.assertEqual(self.fd.current_value, Decimal('600.00'))
+
+        # The withdrawal took the 100 interest and 400 principal; 600 keeps earning 10%
+        run_maturity(as_of=self.today + timedelta(days=365))
+
+        self.fd.refresh_from_db()
+        self.assertEqual(self.fd.current_value, Decimal('660.00'))
+
+    def test_maturity_credits_value_accrued_to_maturity_date(self):
+        run_maturity(as_of=self.today)
+        run_maturity(as_of=self.fd.maturity_date + timedelta(days=10))
+
+        self.fd.refresh_from_db()
+        self.account.refresh_from_db()
+        self.assertEqual(self.fd.investment_status, 'Matured')
+        self.assertEqual(self.fd.current_value, Decimal('1300.00'))
+        self.assertEqual(self.account.balance, Decimal('1400.00'))
+        self.assertTrue(InvestmentTransaction.objects.filter(investment=self.fd, transaction_type='Sell').exists())
+
+    def test_dry_run_changes_nothing(self):
+        run = run_maturity(as_of=self.fd.maturity_date, dry_run=True)
+
+        self.fd.refresh_from_db()
+        self.account.refresh_from_db()
+        self.assertEqual(run.matured, 1)
+        self.assertEqual(self.fd.investment_status, 'Active')
+        self.assertEqual(self.fd.current_value, Decimal('1000.00'))
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+
+
+class SIPExecutionTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001')
+        self.sip = Investment.objects.create(
+            account=self.account, investment_type='SIP', investment_name='Index Fund',
+            principal_amount=Decimal('100.00'), current_value=Decimal('100.00'),
+            expected_return_rate=Decimal('12.00'), sip_amount=Decimal('100.00'),
+            next_sip_date=self.today - timedelta(days=40),
+        )
+
+    def test_due_instalments_buy_units_until_balance_runs_out(self):
+        # Two instalments are due (40 and about 10 days ago); the balance covers one
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('150.00'))
+        PriceHistory.objects.create(instrument='Index Fund', date=self.today - timedelta(days=60), price=Decimal('10.00'))
+
+        run = run_maturity(as_of=self.today)
+
+        self.sip.refresh_from_db()
+        self.account.refresh_from_db()
+        self.assertEqual((run.sip_executed, run.sip_failed), (1, 1))
+        self.assertEqual(self.account.balance, Decimal('50.00'))
+        self.assertEqual(self.sip.principal_amount, Decimal('200.00'))
+        self.assertEqual(self.sip.current_value, Decimal('200.00'))
+        self.assertEqual(self.sip.units_held, Decimal('10.0000'))
+        self.assertGreater(self.sip.next_sip_date, self.today)
+
+    def test_bounced_instalment_is_skipped(self):
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('50.00'))
+
+        run = run_maturity(as_of=self.today)
+
+        self.sip.refresh_from_db()
+        self.assertEqual(run.sip_executed, 0)
+        self.assertEqual(self.sip.principal_amount, Decimal('100.00'))
+        self.assertGreater(self.sip.next_sip_date, self.today)
+        self.assertFalse(InvestmentTransaction.objects.exists())
+
+
+class HoldingsTests(TestCase):
+    """
+    Holdings track units only for money bought at a real price
+    """
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001')
+        self.fund = Investment.objects.create(
+            account=self.account, investment_type='Mutual_Fund', investment_name='Growth Fund',
+            principal_amount=Decimal('1000.00'), current_value=Decimal('1000.00'),
+            expected_return_rate=Decimal('12.00'),
+        )
+
+    def test_buy_and_sell_at_market_price(self):
+        PriceHistory.objects.create(instrument='Growth Fund', date=self.today, price=Decimal('20.00'))
+
+        buy_units(self.fund, Decimal('1000.00'), 'BUY-1')
+        buy_units(self.fund, Decimal('600.00'), 'BUY-2', price=Decimal('30.00'))
+        Investment.objects.filter(pk=self.fund.pk).update(current_value=Decimal('1600.00'))
+        sale = sell_units(self.fund, Decimal('400.00'), 'SELL-1')
+
+        self.fund.refresh_from_db()
+        # 50 + 20 units bought at an average of 1600 / 70; a quarter of the value sold
+        self.assertEqual(sale.units, Decimal('17.5000'))
+        self.assertEqual(self.fund.units_held, Decimal('52.5000'))
+        self.assertEqual(self.fund.average_cost, (Decimal('1600') / 70).quantize(Decimal('0.0001')))
+
+    def test_unpriced_purchase_records_no_units_and_is_not_revalued(self):
+        buy_units(self.fund, Decimal('1000.00'), 'BUY-1')
+        PriceHistory.objects.create(instrument='Growth Fund', date=self.today, price=Decimal('250.00'))
+        # A later priced purchase must not start counting units for part of the money
+        buy_units(self.fund, Decimal('500.00'), 'BUY-2')
+        Investment.objects.filter(pk=self.fund.pk).update(current_value=Decimal('1500.00'))
+
+        revalue_investments(as_of=self.today)
+
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.units_held, 0)
+        self.assertEqual(self.fund.current_value, Decimal('1500.00'))
+        self.assertFalse(InvestmentTransaction.objects.filter(units__isnull=False).exists())
+
+    def test_rebuild_matches_incremental_holdings(self):
+        PriceHistory.objects.create(instrument='Growth Fund', date=self.today, price=Decimal('20.00'))
+        buy_units(self.fund, Decimal('1000.00'), 'BUY-1')
+        buy_units(self.fund, Decimal('300.00'), 'BUY-2', price=Decimal('30.00'))
+        sell_units(self.fund, Decimal('200.00'), 'SELL-1')
+        self.fund.refresh_from_db()
+        expected = (self.fund.units_held, self.fund.average_cost)
+        Investment.objects.filter(pk=self.fund.pk).update(units_held=0, average_cost=0)
+
+        rebuild_holdings(Investment.objects.filter(pk=self.fund.pk))
+
+        self.fund.refresh_from_db()
+        self.assertEqual((self.fund.units_held, self.fund.average_cost), expected)
+
+
+class ValuationTests(TestCase):
+    """
+    Price files are upserted and investments revalued from their cached units
+    """
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001')
+
+    def _fund(self, name, units, value, status='Active'):
+        return Investment.objects.create(
+            account=self.account, investment_type='Mutual_Fund', investment_name=name,
+            principal_amount=value, current_value=value, units_held=units,
+            expected_return_rate=Decimal('12.00'), investment_status=status,
+        )
+
+    def test_import_upserts_and_keeps_last_duplicate(self):
+        yesterday = self.today - timedelta(days=1)
+        PriceHistory.objects.create(instrument='Growth Fund', date=yesterday, price=Decimal('9.00'))
+        price_file = StringIO(
+            'instrument,date,nav\n'
+            f'Growth Fund,{yesterday},10.00\n'
+            f'Growth Fund,{self.today},11.00\n'
+            f'Growth Fund,{self.today},12.00\n'
+        )
+
+        self.assertEqual(import_prices(price_file, batch_size=10), 3)
+
+        prices = dict(PriceHistory.objects.values_list('date', 'price'))
+        self.assertEqual(prices, {yesterday: Decimal('10.00'), self.today: Decimal('12.00')})
+
+    def test_invalid_price_file_is_rejected(self):
+        with self.assertRaises(PriceFileError):
+            import_prices(StringIO('instrument,date,price\nGrowth Fund,not-a-date,10\n'))
+
+    def test_revaluation_uses_latest_price_in_batches(self):
+        PriceHistory.objects.bulk_create([
+            PriceHistory(instrument='Growth Fund', date=self.today - timedelta(days=2), price=Decimal('10.00')),
+            PriceHistory(instrument='Growth Fund', date=self.today, price=Decimal('12.50')),
+            PriceHistory(instrument='Growth Fund', date=self.today + timedelta(days=1), price=Decimal('99.00')),
+        ])
+        first = self._fund('Growth Fund', Decimal('10'), Decimal('100.00'))
+        second = self._fund('Growth Fund', Decimal('4'), Decimal('40.00'))
+        unpriced = self._fund('Other Fund', Decimal('5'), Decimal('50.00'))
+        closed = self._fund('Growth Fund', Decimal('3'), Decimal('30.00'), status='Closed')
+
+        revalue_investments(as_of=self.today, batch_size=1)
+
+        values = dict(Investment.objects.values_list('pk', 'current_value'))
+        self.assertEqual(values[first.pk], Decimal('125.00'))
+        self.assertEqual(values[second.pk], Decimal('50.00'))
+        self.assertEqual(values[unpriced.pk], Decimal('50.00'))
+        self.assertEqual(values[closed.pk], Decimal('30.00'))
+
+
+class PortfolioSummaryTests(TestCase):
+    """
+    The portfolio summary groups totals and counts in one query
+    """
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001')
+        other = _create_account('bob', '9000000002')
+        for account, investment_type, status, risk, invested, value in [
+            (self.account, 'Mutual_Fund', 'Active', 'High', '1000.00', '1200.00'),
+            (self.account, 'Mutual_Fund', 'Active', 'Medium', '500.00', '450.00'),
+            (self.account, 'Fixed_Deposit', 'Matured', 'Low', '2000.00', '2100.00'),
+            (other, 'Stocks', 'Active', 'High', '9999.00', '9999.00'),
+        ]:
+            Investment.objects.create(
+                account=account, investment_type=investment_type, investment_name=f'{investment_type} {risk}',
+                investment_status=status, risk_level=risk, principal_amount=Decimal(invested),
+                current_value=Decimal(value), expected_return_rate=Decimal('8.00'),
+            )
+
+    def test_grouped_totals(self):
+        summary = Investment.objects.filter(account=self.account).portfolio_summary()
+
+        self.assertEqual((summary['count'], summary['active']), (3, 2))
+        self.assertEqual(summary['invested'], Decimal('3500.00'))
+        self.assertEqual(summary['current'], Decimal('3750.00'))
+        self.assertEqual(summary['active_value'], Decimal('1650.00'))
+        self.assertEqual(summary['profit_loss'], Decimal('250.00'))
+        self.assertAlmostEqual(float(summary['return_percentage']), 250 * 100 / 3500)
+        self.assertEqual(summary['by_type'], {'Mutual_Fund': 2, 'Fixed_Deposit': 1})
+        self.assertEqual(summary['by_status'], {'Active': 2, 'Matured': 1})
+        self.assertEqual(summary['by_risk'], {'High': 1, 'Medium': 1, 'Low': 1})
+
+    def test_empty_portfolio(self):
+        summary = Investment.objects.none().portfolio_summary()
+
+        self.assertEqual((summary['count'], summary['invested'], summary['return_percentage']), (0, 0, 0))
+
+    def test_dashboard_shows_portfolio_value(self):
+        User.objects.filter(pk=self.account.user_id).update(is_account_created=True)
+        self.client.force_login(self.account.user)
+
+        response = self.client.get(reverse('core:dashboard'))
+
+        self.assertEqual(response.context['investment_count'], 2)
+        self.assertContains(response, '₹1650.00')
+
+
+class ReturnsEngineTests(SimpleTestCase):
+    """
+    XIRR and time-weighted returns of known cash flows
+    """
+    def test_xirr_of_known_flows(self):
+        rates = xirr_many([[-1000, 1500, 0], [-1000, -1000, 2310]], [[0, 1, 0], [0, 1, 2]])
+
+        self.assertAlmostEqual(rates[0], 0.5, places=6)
+        self.assertAlmostEqual(rates[1], 0.1, places=6)
+
+    def test_xirr_of_same_day_flows_is_undefined(self):
+        rates = xirr_many([[-1000, 1000], [-1000, 1050]], [[0, 0], [0, 0]])
+
+        self.assertTrue(np.isnan(rates).all())
+
+    def test_xirr_without_sign_change_is_undefined(self):
+        rates = xirr_many([[-1000, -500], [1000, 500]], [[0, 1], [0, 1]])
+
+        self.assertTrue(np.isnan(rates).all())
+
+    def test_twr_ignores_flows_and_links_periods(self):
+        # Buy a unit at 10, another at 20, close at 10: the price is back where it started
+        twr, portfolio_twr = twr_many(
+            np.array([0, 1]), np.array([0, 0]), np.array([1.0, 1.0]), np.array([10.0, 20.0]),
+            closing_prices=np.array([10.0]), days=3,
+        )
+
+        self.assertAlmostEqual(twr[0], 0.0)
+        self.assertAlmostEqual(portfolio_twr, 0.0)
+
+    def test_twr_of_a_doubling_price(self):
+        twr, portfolio_twr = twr_many(
+            np.array([0]), np.array([0]), np.array([5.0]), np.array([10.0]),
+            closing_prices=np.array([20.0]), days=2,
+        )
+
+        self.assertAlmostEqual(twr[0], 1.0)
@@ -0,0 +1,122 @@
+import csv
+import io
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Investment, PriceHistory
+
+# Price rows written per INSERT when importing a price file
+PRICE_IMPORT_BATCH_SIZE = 5000
+
+# Investments revalued per UPDATE statement
+REVALUATION_BATCH_SIZE = 5000
+
+
+class PriceFileError(Exception):
+    """Raised when a price file cannot be parsed"""
+
+
+def parse_price_file(f):
+    """
+    Yield PriceHistory rows from a CSV file with columns instrument, date, price
+    (a `nav` column is accepted instead of `price`).
+    """
+    reader = csv.DictReader(f)
+    fields = {name.strip().lower() for name in reader.fieldnames or []}
+    price_column = 'price' if 'price' in fields else 'nav'
+    if not {'instrument', 'date', price_column} <= fields:
+        raise PriceFileError('Price file needs instrument, date and price (or nav) columns.')
+
+    for line, row in enumerate(reader, start=2):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        try:
+            yield PriceHistory(
+                instrument=row['instrument'],
+                date=date.fromisoformat(row['date']),
+                price=Decimal(row[price_column]),
+            )
+        except (ValueError, InvalidOperation):
+            raise PriceFileError(f'Invalid price row on line {line}: {row}')
+
+
+def import_prices(f, batch_size=PRICE_IMPORT_BATCH_SIZE):
+    """
+    Load a price file into PriceHistory with bulk upserts; a price already stored
+    for the same instrument and day is overwritten. Returns the number of rows read.
+    """
+    if isinstance(f, (bytes, bytearray)):
+        f = io.StringIO(f.decode())
+
+    count = 0
+    batch = []
+    for price in parse_price_file(f):
+        batch.append(price)
+        if len(batch) >= batch_size:
+            count += _upsert_prices(batch)
+            batch = []
+    if batch:
+        count += _upsert_prices(batch)
+    return count
+
+
+def _upsert_prices(batch):
+    """
+    Upsert one batch of prices. A price repeated for the same instrument and day
+    keeps its last row: one INSERT ... ON CONFLICT may not update a row twice.
+    """
+    unique = {(price.instrument, price.date): price for price in batch}
+    PriceHistory.objects.bulk_create(
+        list(unique.values()),
+        update_conflicts=True,
+        unique_fields=['instrument', 'date'],
+        update_fields=['price'],
+    )
+    return len(batch)
+
+
+def latest_price(as_of):
+    """Subquery for the outer investment's latest price on or before `as_of`"""
+    return Subquery(
+        PriceHistory.objects.filter(
+            instrument=OuterRef('investment_name'),
+            date__lte=as_of,
+        ).order_by('-date').values('price')[:1]
+    )
+
+
+def revaluation_expression(as_of):
+    """
+    current_value = units held x latest price, read from the holdings cache so no
+    transaction history is replayed; unchanged when there are no units or no price
+    """
+    value_field = DecimalField(max_digits=12, decimal_places=2)
+    return Case(
+        When(units_held__gt=0, then=Coalesce(F('units_held') * latest_price(as_of), F('current_value'))),
+        default=F('current_value'),
+        output_field=value_field,
+    )
+
+
+def revalue_investments(queryset=None, as_of=None, batch_size=REVALUATION_BATCH_SIZE):
+    """
+    Mark active investments to market: walks them in primary-key ranges and
+    revalues each range with one UPDATE. Returns the number of investments updated.
+    """
+    as_of = as_of or timezone.localdate()
+    queryset = Investment.objects.all() if queryset is None else queryset
+    queryset = queryset.filter(investment_status='Active')
+
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return updated
+        updated += queryset.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+            current_value=revaluation_expression(as_of)
+        )
+        last_id = ids[-1]
@@ -2,11 +2,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction as db_transaction
-from django.db.models import Sum, Q
 from django.utils import timezone
-from .models import Investment, InvestmentTransaction
+from .models import Investment
 from .forms import InvestmentForm, WithdrawInvestmentForm
-from transactions.models import Transaction
+from .valuation import revalue_investments
+from .holdings import buy_units, sell_units
+from .returns import account_returns
+from transactions.ledger import deposit, withdraw, LedgerError
+from dateutil.relativedelta import relativedelta
 import uuid
 
 @login_required
@@ -19,26 +22,15 @@ def investment_dashboard(request):
         return redirect('banking:create_account')
     
     investments = Investment.objects.filter(account=request.user.account)
-    
-    # Calculate totals
-    total_invested = investments.aggregate(
-        total=Sum('principal_amount')
-    )['total'] or 0
-    
-    total_current_value = investments.aggregate(
-        total=Sum('current_value')
-    )['total'] or 0
-    
-    total_profit_loss = float(total_current_value) - float(total_invested)
-    
-    active_count = investments.filter(investment_status='Active').count()
+    summary = investments.portfolio_summary()
     
     context = {
-        'investments': investments[:5],  # Latest 5
-        'total_invested': total_invested,
-        'total_current_value': total_current_value,
-        'total_profit_loss': total_profit_loss,
-        'active_count': active_count,
+        'investments': investments.with_returns()[:5],  # Latest 5
+        'summary': summary,
+        'total_invested': summary['invested'],
+        'total_current_value': summary['current'],
+        'total_profit_loss': summary['profit_loss'],
+        'active_count': summary['active'],
     }
     
     return render(request, 'investments/investment_dashboard.html', context)
@@ -61,6 +53,8 @@ def create_investment(request):
             investment = form.save(commit=False)
             investment.account = account
             investment.current_value = investment.principal_amount  # Initial value
+            if investment.investment_type == 'SIP':
+                investment.next_sip_date = timezone.localdate() + relativedelta(months=1)
             
             # Check if user has sufficient balance
             if account.balance < investment.principal_amount:
@@ -68,32 +62,18 @@ def create_investment(request):
                 return render(request, 'investments/create_investment.html', {'form': form, 'account_balance': account.balance})
             
             with db_transaction.atomic():
-                # Deduct from account
-                account.balance -= investment.principal_amount
-                account.save()
+                # Deduct from account and post the ledger row
+                try:
+                    withdraw(account, investment.principal_amount, f'Investment in {investment.investment_name}')
+                except LedgerError:
+                    messages.error(request, f'Insufficient balance. Required: ₹{investment.principal_amount}, Available: ₹{account.balance}')
+                    return render(request, 'investments/create_investment.html', {'form': form, 'account_balance': account.balance})
                 
                 # Save investment
                 investment.save()
                 
-                # Create transaction record
-                Transaction.objects.create(
-                    from_account=account,
-                    to_account=None,
-                    amount=investment.principal_amount,
-                    transaction_type='Withdrawal',
-                    status='Success',
-                    description=f'Investment in {investment.investment_name}',
-                    balance_after=account.balance,
-                    account=account
-                )
-                
-                # Create investment transaction
-                InvestmentTransaction.objects.create(
-                    investment=investment,
-                    transaction_type='Buy',
-                    amount=investment.principal_amount,
-                    reference_number=f'INV-{uuid.uuid4().hex[:8].upper()}'
-                )
+                # Create investment transaction and add the units to the holding
+                buy_units(investment, investment.principal_amount, f'INV-{uuid.uuid4().hex[:8].upper()}')
                 
                 messages.success(request, f'✅ Investment of ₹{investment.principal_amount} created successfully!')
                 return redirect('investments:investment_dashboard')
@@ -116,17 +96,20 @@ def portfolio_view(request):
         return redirect('banking:create_account')
     
     investments = Investment.objects.filter(account=request.user.account)
+    summary = investments.portfolio_summary()
+    returns = account_returns(request.user.account)
     
-    # Summary statistics
-    total_invested = sum(float(inv.principal_amount) for inv in investments)
-    total_current = sum(float(inv.current_value) for inv in investments)
-    total_profit = total_current - total_invested
+    holdings = list(investments.with_returns())
+    for investment in holdings:
+        investment.returns = returns['investments'].get(investment.id, {})
     
     context = {
-        'investments': investments,
-        'total_invested': total_invested,
-        'total_current': total_current,
-        'total_profit': total_profit,
+        'investments': holdings,
+        'summary': summary,
+        'portfolio_returns': returns['portfolio'],
+        'total_invested': summary['invested'],
+        'total_current': summary['current'],
+        'total_profit': summary['profit_loss'],
     }
     
     return render(request, 'investments/portfolio_view.html', context)
@@ -193,35 +176,18 @@ def withdraw_investment(request, investment_id):
                 })
             
             with db_transaction.atomic():
-                # Credit to account
-                account.balance += withdrawal_amount
-                account.save()
+                # Credit to account and post the ledger row
+                deposit(account, withdrawal_amount, f'Withdrawal from {investment.investment_name}')
                 
-                # Update investment
+                # Create investment transaction and take the units off the holding
+                sell_units(investment, withdrawal_amount, f'WDR-{uuid.uuid4().hex[:8].upper()}')
+                
+                # Update investment; the row is locked now, so re-read the value the scheduler may have accrued
+                investment.refresh_from_db(fields=['current_value'])
                 investment.current_value -= withdrawal_amount
                 if investment.current_value <= 0:
                     investment.investment_status = 'Closed'
-                investment.save()
-                
-                # Create transaction record
-                Transaction.objects.create(
-                    from_account=None,
-                    to_account=account,
-                    amount=withdrawal_amount,
-                    transaction_type='Deposit',
-                    status='Success',
-                    description=f'Withdrawal from {investment.investment_name}',
-                    balance_after=account.balance,
-                    account=account
-                )
-                
-                # Create investment transaction
-                InvestmentTransaction.objects.create(
-                    investment=investment,
-                    transaction_type='Sell',
-                    amount=withdrawal_amount,
-                    reference_number=f'WDR-{uuid.uuid4().hex[:8].upper()}'
-                )
+                investment.save(update_fields=['current_value', 'investment_status'])
                 
                 messages.success(request, f'✅ Withdrawal of ₹{withdrawal_amount} successful!')
                 return redirect('investments:investment_details', investment_id=investment.id)
@@ -252,6 +218,8 @@ def update_investment_value(request, investment_id):
         account=request.user.account
     )
     
-    # This would typically be done by admin or automated market data
-    messages.info(request, 'Market value updates are performed automatically by the system.')
+    # Mark this investment to market from the latest imported price
+    revalue_investments(Investment.objects.filter(pk=investment.pk))
+    investment.refresh_from_db(fields=['current_value'])
+    messages.info(request, f'Current value refreshed from the latest market price: ₹{investment.current_value}')
     return redirect('investments:investment_details', investment_id=investment.id)
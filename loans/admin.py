@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Loan, EMIPayment
+from .models import Loan, EMIPayment, AutopayCheckpoint
 
 @admin.register(Loan)
 class LoanAdmin(admin.ModelAdmin):
@@ -9,7 +9,7 @@ class LoanAdmin(admin.ModelAdmin):
     list_display = ('id', 'account', 'loan_type', 'loan_amount', 'interest_rate', 'tenure_months', 'loan_status', 'application_date')
     list_filter = ('loan_type', 'loan_status', 'application_date')
     search_fields = ('account__account_holder_name', 'account__account_number', 'purpose')
-    readonly_fields = ('application_date', 'monthly_emi', 'disbursement_date', 'closure_date')
+    readonly_fields = ('application_date', 'monthly_emi', 'disbursement_date', 'closure_date', 'paid_emi_count', 'total_paid', 'next_pending_emi')
     date_hierarchy = 'application_date'
     
     fieldsets = (
@@ -19,6 +19,9 @@ class LoanAdmin(admin.ModelAdmin):
         ('EMI Details', {
             'fields': ('monthly_emi', 'remaining_balance', 'next_emi_date', 'autopay_enabled')
         }),
+        ('Repayment Progress', {
+            'fields': ('paid_emi_count', 'total_paid', 'next_pending_emi')
+        }),
         ('Status', {
             'fields': ('loan_status', 'application_date', 'approval_date', 'disbursement_date', 'closure_date')
         }),
@@ -48,55 +51,45 @@ class LoanAdmin(admin.ModelAdmin):
     def disburse_loans(self, request, queryset):
         """Disburse selected approved loans and credit amount to accounts"""
         from django.db import transaction as db_transaction
-        from transactions.models import Transaction
+        from transactions.ledger import deposit_many, lock_accounts
         from django.utils import timezone
-        from datetime import timedelta
         from dateutil.relativedelta import relativedelta
+        from .schedule import create_emi_schedules
+        from .progress import refresh_next_emi
         
-        disbursed_count = 0
-        
-        for loan in queryset.filter(loan_status='Approved'):
-            with db_transaction.atomic():
-                # Credit the loan amount to the user's account
-                account = loan.account
-                account.balance += loan.loan_amount
-                account.save()
-                
-                # Create a transaction record
-                Transaction.objects.create(
-                    from_account=None,  # No source account for loan disbursement
-                    to_account=account,
-                    amount=loan.loan_amount,
-                    transaction_type='Deposit',
-                    status='Success',
-                    description=f'Loan disbursed - {loan.loan_type} Loan (ID: {loan.id})',
-                    balance_after=account.balance,
-                    account=account
-                )
-                
-                # Update loan status and details
-                now = timezone.now()
+        with db_transaction.atomic():
+            # Lock the borrowers' accounts before their loans, the order every loan path uses
+            lock_accounts(queryset.filter(loan_status='Approved').values_list('account_id', flat=True))
+            # Lock the loans so a concurrent run cannot disburse them twice
+            loans = list(
+                queryset.filter(loan_status='Approved').select_for_update().select_related('account')
+            )
+            if not loans:
+                self.message_user(request, '0 loan(s) have been disbursed, credited to accounts, and EMI schedules created.')
+                return
+            
+            # Credit every loan amount and post all ledger rows in one batch
+            deposit_many([
+                (loan.account, loan.loan_amount, f'Loan disbursed - {loan.loan_type} Loan (ID: {loan.id})')
+                for loan in loans
+            ])
+            
+            # Update loan status and details
+            now = timezone.now()
+            for loan in loans:
                 loan.loan_status = 'Disbursed'
                 loan.disbursement_date = now
                 loan.remaining_balance = loan.monthly_emi * loan.tenure_months  # Total payable
                 loan.next_emi_date = (now + relativedelta(months=1)).date()
-                loan.save()
-                
-                # Create EMI schedule
-                emi_date = loan.next_emi_date
-                for emi_num in range(1, loan.tenure_months + 1):
-                    EMIPayment.objects.create(
-                        loan=loan,
-                        emi_number=emi_num,
-                        due_date=emi_date,
-                        emi_amount=loan.monthly_emi,
-                        payment_status='Pending'
-                    )
-                    emi_date = emi_date + relativedelta(months=1)
-                
-                disbursed_count += 1
+            Loan.objects.bulk_update(
+                loans, ['loan_status', 'disbursement_date', 'remaining_balance', 'next_emi_date']
+            )
+            
+            # Create all EMI schedules with bulk INSERTs
+            create_emi_schedules(loans)
+            refresh_next_emi([loan.id for loan in loans])
         
-        self.message_user(request, f'{disbursed_count} loan(s) have been disbursed, credited to accounts, and EMI schedules created.')
+        self.message_user(request, f'{len(loans)} loan(s) have been disbursed, credited to accounts, and EMI schedules created.')
     disburse_loans.short_description = 'Disburse selected approved loans'
 
 
@@ -105,8 +98,18 @@ class EMIPaymentAdmin(admin.ModelAdmin):
     """
     Admin interface for EMI Payment model
     """
-    list_display = ('id', 'loan', 'emi_number', 'due_date', 'emi_amount', 'paid_amount', 'payment_status', 'payment_method', 'payment_date')
+    list_display = ('id', 'loan', 'emi_number', 'due_date', 'emi_amount', 'late_fee', 'paid_amount', 'payment_status', 'payment_method', 'payment_date')
     list_filter = ('payment_status', 'payment_method', 'due_date')
     search_fields = ('loan__account__account_holder_name', 'transaction_reference')
     readonly_fields = ('payment_date',)
     date_hierarchy = 'due_date'
+
+
+@admin.register(AutopayCheckpoint)
+class AutopayCheckpointAdmin(admin.ModelAdmin):
+    """
+    Admin interface for autopay shard progress
+    """
+    list_display = ('run_date', 'shard', 'shards', 'last_emi_id', 'collected', 'failed', 'amount', 'updated_at', 'completed_at')
+    list_filter = ('run_date', 'shards')
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,120 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+PAISA = Decimal('0.01')
+
+# Offsets around the requested tenure (months) and rate (% p.a.) tried by the what-if calculator
+WHAT_IF_TENURE_STEPS = (-24, -12, 0, 12, 24)
+WHAT_IF_RATE_STEPS = (-1, -0.5, 0, 0.5, 1)
+
+
+def to_paisa(value):
+    """Round a float or Decimal amount half-up to two decimal places"""
+    if not isinstance(value, Decimal):
+        value = Decimal(repr(float(value)))
+    return value.quantize(PAISA, rounding=ROUND_HALF_UP)
+
+
+def emi_amounts(principals, annual_rates, tenures):
+    """
+    Monthly EMI for arrays of loans (inputs broadcast against each other):
+    EMI = P x R x (1+R)^N / ((1+R)^N - 1), or P / N when the rate is zero.
+    """
+    p = np.asarray(principals, dtype=float)
+    r = np.asarray(annual_rates, dtype=float) / 1200
+    n = np.asarray(tenures, dtype=float)
+    growth = np.power(1 + r, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(r > 0, p * r * growth / (growth - 1), p / n)
+
+
+def amortization_schedules(principals, annual_rates, tenures):
+    """
+    Full schedules for many loans at once, as float arrays of shape (loans, months):
+    'principal', 'interest' and 'outstanding' (after the month's payment), plus
+    'emi' per loan. Months past a loan's tenure are zero.
+    """
+    p = np.atleast_1d(np.asarray(principals, dtype=float))
+    r = np.atleast_1d(np.asarray(annual_rates, dtype=float)) / 1200
+    n = np.atleast_1d(np.asarray(tenures, dtype=int))
+    p, r, n = np.broadcast_arrays(p, r, n)
+    emi = emi_amounts(p, r * 1200, n)
+
+    months = np.arange(1, n.max() + 1)
+    growth = np.power(1 + r[:, None], months[None, :])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Closed form balance after k payments, so no month-by-month loop
+        outstanding = np.where(
+            r[:, None] > 0,
+            p[:, None] * growth - emi[:, None] * (growth - 1) / r[:, None],
+            p[:, None] - emi[:, None] * months[None, :],
+        )
+    outstanding = np.clip(outstanding, 0, None)
+    opening = np.concatenate([p[:, None], outstanding[:, :-1]], axis=1)
+    interest = opening * r[:, None]
+    principal = opening - outstanding
+
+    active = months[None, :] <= n[:, None]
+    return {
+        'emi': emi,
+        'principal': np.where(active, principal, 0.0),
+        'interest': np.where(active, interest, 0.0),
+        'outstanding': np.where(active, outstanding, 0.0),
+    }
+
+
+def amortization_schedule(principal, annual_rate, tenure, emi=None):
+    """
+    Decimal schedule of one loan as a list of dicts (emi_number, payment, principal,
+    interest, outstanding). Interest is taken from the vectorized schedule and rounded
+    to the paisa; the last instalment absorbs the rounding residue so principal adds
+    up exactly to the loan amount and the loan ends at zero.
+    """
+    arrays = amortization_schedules([principal], [annual_rate], [tenure])
+    emi = to_paisa(arrays['emi'][0]) if emi is None else Decimal(emi)
+    balance = Decimal(principal)
+
+    rows = []
+    for month, interest in enumerate(arrays['interest'][0, :tenure], start=1):
+        interest = to_paisa(interest)
+        principal_part = balance if month == tenure else min(emi - interest, balance)
+        balance -= principal_part
+        rows.append({
+            'emi_number': month,
+            'payment': principal_part + interest,
+            'principal': principal_part,
+            'interest': interest,
+            'outstanding': balance,
+        })
+    return rows
+
+
+def what_if_scenarios(principal, annual_rate, tenure, rates=None, tenures=None):
+    """
+    EMI, total interest and total payable for every rate/tenure combination.
+    Defaults to a grid around the requested rate and tenure; computed in one pass.
+    """
+    if rates is None:
+        rates = [float(annual_rate) + step for step in WHAT_IF_RATE_STEPS]
+    if tenures is None:
+        tenures = [tenure + step for step in WHAT_IF_TENURE_STEPS]
+    rates = sorted({rate for rate in rates if rate >= 0})
+    tenures = sorted({months for months in tenures if months > 0})
+
+    rate_grid, tenure_grid = np.meshgrid(np.array(rates, dtype=float), np.array(tenures, dtype=int))
+    emis = emi_amounts(float(principal), rate_grid, tenure_grid)
+
+    principal = Decimal(principal)
+    scenarios = []
+    for rate, months, emi in zip(rate_grid.ravel(), tenure_grid.ravel(), emis.ravel()):
+        emi = to_paisa(emi)
+        total_payable = emi * int(months)
+        scenarios.append({
+            'interest_rate': to_paisa(rate),
+            'tenure_months': int(months),
+            'monthly_emi': emi,
+            'total_interest': total_payable - principal,
+            'total_payable': total_payable,
+        })
+    return scenarios
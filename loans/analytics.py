@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Loan, EMIPayment
+
+# Seconds a computed report is served from cache
+ANALYTICS_CACHE_TTL = 300
+
+# Days-past-due buckets as (label, lowest DPD, highest DPD or None)
+DPD_BUCKETS = (
+    ('current', 0, 0),
+    ('dpd_1_30', 1, 30),
+    ('dpd_31_60', 31, 60),
+    ('dpd_61_90', 61, 90),
+    ('dpd_90_plus', 91, None),
+)
+
+
+def outstanding_book():
+    """Size of the live loan book: active loans, principal disbursed and amount outstanding"""
+    return Loan.objects.filter(loan_status='Disbursed').aggregate(
+        active_loans=Count('id'),
+        principal=Sum('loan_amount', default=0),
+        outstanding=Sum('remaining_balance', default=0),
+        monthly_emi=Sum('monthly_emi', default=0),
+    )
+
+
+def _dpd_filter(as_of, low, high):
+    """Active loans whose oldest unpaid EMI is between `low` and `high` days past due"""
+    if low == 0:
+        return Q(next_emi_date__isnull=True) | Q(next_emi_date__gte=as_of)
+    condition = Q(next_emi_date__lte=as_of - timedelta(days=low))
+    if high is not None:
+        condition &= Q(next_emi_date__gte=as_of - timedelta(days=high))
+    return condition
+
+
+def delinquency_buckets(as_of):
+    """
+    Active loans and their outstanding balance per days-past-due bucket, in one query.
+    next_emi_date always points at the oldest unpaid EMI, so DPD needs no EMI scan.
+    """
+    aggregates = {}
+    for label, low, high in DPD_BUCKETS:
+        condition = _dpd_filter(as_of, low, high)
+        aggregates[f'{label}_loans'] = Count('id', filter=condition)
+        aggregates[f'{label}_outstanding'] = Sum('remaining_balance', filter=condition, default=0)
+    totals = Loan.objects.filter(loan_status='Disbursed').aggregate(**aggregates)
+
+    return [
+        {
+            'bucket': label,
+            'loans': totals[f'{label}_loans'],
+            'outstanding': totals[f'{label}_outstanding'],
+        }
+        for label, low, high in DPD_BUCKETS
+    ]
+
+
+def collections_by_month(start_date=None):
+    """EMIs collected and amount received per calendar month and payment method"""
+    payments = EMIPayment.objects.filter(payment_status='Paid', payment_date__isnull=False)
+    if start_date:
+        payments = payments.filter(payment_date__date__gte=start_date)
+    rows = (
+        payments.annotate(month=TruncMonth('payment_date'))
+        .values('month', 'payment_method')
+        .annotate(emis=Count('id'), amount=Sum('paid_amount'), late_fees=Sum('late_fee'))
+        .order_by('month', 'payment_method')
+    )
+    return [
+        {
+            'month': row['month'].strftime('%Y-%m'),
+            'payment_method': row['payment_method'],
+            'emis': row['emis'],
+            'amount': row['amount'],
+            'late_fees': row['late_fees'],
+        }
+        for row in rows
+    ]
+
+
+def loan_type_breakdown():
+    """Applications, active loans, principal and outstanding balance per loan type"""
+    active = Q(loan_status='Disbursed')
+    return list(
+        Loan.objects.values('loan_type')
+        .annotate(
+            applications=Count('id'),
+            active_loans=Count('id', filter=active),
+            closed_loans=Count('id', filter=Q(loan_status='Closed')),
+            principal=Sum('loan_amount', filter=active, default=0),
+            outstanding=Sum('remaining_balance', filter=active, default=0),
+        )
+        .order_by('loan_type')
+    )
+
+
+def _book_version():
+    """
+    Fingerprint of the loan book that changes whenever a loan is applied for,
+    disbursed, paid or closed, including through bulk UPDATEs that send no signals
+    """
+    version = Loan.objects.aggregate(
+        last_id=Max('id'),
+        active=Count('id', filter=Q(loan_status='Disbursed')),
+        closed=Count('id', filter=Q(loan_status='Closed')),
+        paid_emis=Sum('paid_emi_count'),
+        paid=Sum('total_paid'),
+        outstanding=Sum('remaining_balance'),
+    )
+    return ':'.join(str(version[key]) for key in ('last_id', 'active', 'closed', 'paid_emis', 'paid', 'outstanding'))
+
+
+def portfolio_analytics(as_of=None, use_cache=True):
+    """
+    All portfolio reports as {report name: list of rows}. Results are cached for
+    ANALYTICS_CACHE_TTL seconds so repeated dashboard loads and exports reuse one run.
+    The cache key includes a fingerprint of the loan book, so a loan that changes
+    computes afresh.
+    """
+    as_of = as_of or timezone.localdate()
+    cache_key = f'loans:portfolio_analytics:{as_of.isoformat()}:{_book_version()}'
+    if use_cache:
+        report = cache.get(cache_key)
+        if report is not None:
+            return report
+
+    report = {
+        'as_of': as_of,
+        'book': [outstanding_book()],
+        'delinquency': delinquency_buckets(as_of),
+        'collections': collections_by_month(),
+        'loan_types': loan_type_breakdown(),
+    }
+    cache.set(cache_key, report, ANALYTICS_CACHE_TTL)
+    return report
@@ -0,0 +1,268 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.db import OperationalError, connections, transaction as db_transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from transactions.ledger import lock_accounts, withdraw, LedgerError
+from .models import EMIPayment, AutopayCheckpoint
+from .progress import record_emi_payments
+
+# Due EMIs read per batch; each account's EMIs are collected in their own transaction
+AUTOPAY_BATCH_SIZE = 200
+
+# Extra attempts for an account whose transaction hit a deadlock or serialization failure
+AUTOPAY_LOCK_RETRIES = 1
+
+
+class AutopayRun:
+    """
+    Running totals of an autopay run
+    """
+    def __init__(self):
+        self.collected = 0
+        self.failed = 0
+        self.amount = 0
+        # EMIs left for the next run after repeated lock failures (also counted as failed)
+        self.skipped = 0
+        # Shards of a parallel run that stopped with an error, by shard number
+        self.failed_shards = {}
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """EMIs processed per second"""
+        elapsed = self.elapsed
+        return (self.collected + self.failed) / elapsed if elapsed else 0.0
+
+
+def due_emis(as_of):
+    """Unpaid EMIs of active autopay loans that are due on or before `as_of`"""
+    return EMIPayment.objects.filter(
+        payment_status__in=EMIPayment.UNPAID_STATUSES,
+        due_date__lte=as_of,
+        loan__autopay_enabled=True,
+        loan__loan_status='Disbursed',
+    )
+
+
+def shard_emis(queryset, shard, shards):
+    """
+    Restrict an EMI queryset to the accounts of one shard (account_id % shards == shard),
+    so all EMIs debiting an account are collected by the same worker
+    """
+    return queryset.annotate(account_shard=Mod('loan__account_id', shards)).filter(account_shard=shard)
+
+
+def next_due_emis(queryset, limit, after_id=0):
+    """(EMI id, account id) of the next `limit` EMIs of `queryset` after `after_id`, unlocked"""
+    return list(queryset.filter(id__gt=after_id).order_by('id').values_list('id', 'loan__account_id')[:limit])
+
+
+def claim_account_emis(queryset, account_id, emi_ids):
+    """
+    Lock an account and then those of `emi_ids` that are still due, skipping EMIs
+    another worker holds. Taking the account first matches manual payments and
+    preclosures, so none of them can deadlock against autopay.
+    Must be called inside a transaction. Returns (account, EMIs in repayment order).
+    """
+    account = lock_accounts([account_id]).get(account_id)
+    if account is None:
+        return None, []
+    emis = list(
+        queryset.filter(id__in=emi_ids)
+        .select_for_update(skip_locked=True, of=('self',))
+        .select_related('loan')
+        .order_by('loan_id', 'emi_number')
+    )
+    for emi in emis:
+        emi.loan.account = account
+    return account, emis
+
+
+def _collect(emi):
+    """Debit one EMI from its account and mark it paid; returns False on insufficient balance"""
+    loan = emi.loan
+    try:
+        with db_transaction.atomic():
+            withdraw(
+                loan.account,
+                emi.amount_due,
+                f'EMI Autopay #{emi.emi_number} - {loan.loan_type} Loan'
+            )
+    except LedgerError:
+        return False
+
+    emi.paid_amount = emi.amount_due
+    emi.payment_date = timezone.now()
+    emi.payment_status = 'Paid'
+    emi.payment_method = 'Auto'
+    emi.transaction_reference = f'EMI-{loan.id}-{emi.emi_number}'
+    emi.save(update_fields=[
+        'paid_amount', 'payment_date', 'payment_status', 'payment_method', 'transaction_reference'
+    ])
+    return True
+
+
+def collect_account_emis(queryset, account_id, emi_ids, checkpoint=None):
+    """
+    Collect the due EMIs of one account in one short transaction, recording the
+    totals on `checkpoint` in the same transaction.
+    Returns (collected, failed, amount).
+    """
+    with db_transaction.atomic():
+        account, emis = claim_account_emis(queryset, account_id, emi_ids)
+        paid = {}
+        short = set()
+        collected = failed = 0
+        amount = 0
+        for emi in emis:
+            # Never collect a later EMI of a loan whose earlier one just bounced
+            if emi.loan_id not in short and _collect(emi):
+                count, amount_paid, balance_paid = paid.get(emi.loan_id, (0, 0, 0))
+                paid[emi.loan_id] = (count + 1, amount_paid + emi.amount_due, balance_paid + emi.emi_amount)
+                collected += 1
+                amount += emi.amount_due
+            else:
+                short.add(emi.loan_id)
+                failed += 1
+        record_emi_payments(paid)
+
+        if checkpoint is not None and emis:
+            AutopayCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                collected=F('collected') + collected,
+                failed=F('failed') + failed,
+                amount=F('amount') + amount,
+                updated_at=timezone.now(),
+            )
+    return collected, failed, amount
+
+
+def process_autopay_batch(queryset, run, after_id=0, batch_size=AUTOPAY_BATCH_SIZE, checkpoint=None):
+    """
+    Collect the next batch of due EMIs, one short transaction per account, so no
+    account stays locked for longer than its own EMIs take. An account whose
+    transaction hits a deadlock or serialization failure is retried once and then
+    left for the next run. The checkpoint moves past the batch once every account
+    has been handled. Returns the id of the last EMI looked at, or None when
+    nothing is left.
+    """
+    rows = next_due_emis(queryset, batch_size, after_id)
+    if not rows:
+        return None
+
+    by_account = {}
+    for emi_id, account_id in rows:
+        by_account.setdefault(account_id, []).append(emi_id)
+
+    for account_id in sorted(by_account):
+        emi_ids = by_account[account_id]
+        for attempt in range(AUTOPAY_LOCK_RETRIES + 1):
+            try:
+                collected, failed, amount = collect_account_emis(queryset, account_id, emi_ids, checkpoint)
+                break
+            except OperationalError:
+                if attempt == AUTOPAY_LOCK_RETRIES:
+                    # Still unpaid, so the next run picks these EMIs up again
+                    collected, failed, amount = 0, len(emi_ids), 0
+                    run.skipped += len(emi_ids)
+        run.collected += collected
+        run.failed += failed
+        run.amount += amount
+
+    if checkpoint is not None:
+        AutopayCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            last_emi_id=rows[-1][0],
+            updated_at=timezone.now(),
+        )
+    return rows[-1][0]
+
+
+def run_autopay(as_of=None, batch_size=AUTOPAY_BATCH_SIZE, limit=None, shard=None, shards=1):
+    """
+    Collect every due autopay EMI up to `as_of` (default today) in batches.
+    Several processes can run this at once; each skips EMIs the others have locked.
+    EMIs that fail for lack of balance stay unpaid and are retried on the next run.
+
+    With `shard` set, only loans of accounts with account_id % shards == shard are processed and
+    progress is checkpointed per shard, so rerunning a crashed shard for the same
+    date carries on after the last committed batch.
+    """
+    as_of = as_of or timezone.localdate()
+    run = AutopayRun()
+    queryset = due_emis(as_of)
+    checkpoint = None
+    after_id = 0
+
+    if shard is not None:
+        queryset = shard_emis(queryset, shard, shards)
+        checkpoint, _ = AutopayCheckpoint.objects.get_or_create(run_date=as_of, shard=shard, shards=shards)
+        if checkpoint.completed_at:
+            return run
+        after_id = checkpoint.last_emi_id
+
+    while limit is None or run.collected + run.failed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - run.collected - run.failed)
+        last_id = process_autopay_batch(queryset, run, after_id, size, checkpoint)
+        if last_id is None:
+            if checkpoint is not None:
+                AutopayCheckpoint.objects.filter(pk=checkpoint.pk).update(completed_at=timezone.now())
+            break
+        after_id = last_id
+    return run
+
+
+def reset_checkpoints(as_of, shards):
+    """Forget recorded progress so the next run for `as_of` scans every shard again"""
+    return AutopayCheckpoint.objects.filter(run_date=as_of, shards=shards).delete()[0]
+
+
+def _init_worker():
+    django.setup()
+
+
+def _run_shard(as_of, shard, shards, batch_size):
+    try:
+        run = run_autopay(as_of=as_of, batch_size=batch_size, shard=shard, shards=shards)
+        return shard, run.collected, run.failed, run.amount, run.skipped
+    finally:
+        connections.close_all()
+
+
+def run_autopay_parallel(as_of=None, workers=2, shards=None, batch_size=AUTOPAY_BATCH_SIZE):
+    """
+    Run every shard of an autopay run across a pool of `workers` processes.
+    A shard that raises does not stop the others; its error is kept in
+    `failed_shards` and its checkpoint stays incomplete, so running again for the
+    same date carries on from its last committed batch.
+    Returns an AutopayRun with the combined totals of this invocation.
+    """
+    as_of = as_of or timezone.localdate()
+    shards = shards or workers
+    run = AutopayRun()
+
+    # Workers open their own connections; never share the parent's socket
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(_run_shard, as_of, shard, shards, batch_size)
+            for shard in range(shards)
+        ]
+        for shard, future in enumerate(futures):
+            try:
+                shard, collected, failed, amount, skipped = future.result()
+            except Exception as exc:
+                run.failed_shards[shard] = exc
+                continue
+            run.collected += collected
+            run.failed += failed
+            run.amount += amount
+            run.skipped += skipped
+    return run
@@ -45,6 +45,15 @@ class LoanApplicationForm(forms.ModelForm):
         }
 
 
+class LoanWhatIfForm(forms.Form):
+    """
+    Inputs for the EMI what-if calculator
+    """
+    loan_amount = forms.DecimalField(max_digits=12, decimal_places=2, min_value=1)
+    interest_rate = forms.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100)
+    tenure_months = forms.IntegerField(min_value=1, max_value=600)
+
+
 class ManualEMIPaymentForm(forms.Form):
     """
     Form for manual EMI payment
@@ -82,10 +91,17 @@ class LoanPreclosureForm(forms.Form):
             'class': 'w-4 h-4 text-teal-600 bg-gray-100 border-gray-300 rounded focus:ring-teal-500'
         })
     )
+    # Amount the customer was shown; the preclosure is refused if the quote has changed since
+    quoted_amount = forms.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        widget=forms.HiddenInput()
+    )
     
     def __init__(self, *args, **kwargs):
         self.preclosure_amount = kwargs.pop('preclosure_amount', 0)
         super().__init__(*args, **kwargs)
+        self.fields['quoted_amount'].initial = self.preclosure_amount
     
     def clean_confirm_preclosure(self):
         confirm = self.cleaned_data.get('confirm_preclosure')
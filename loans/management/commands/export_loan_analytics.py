@@ -0,0 +1,38 @@
+import csv
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.analytics import portfolio_analytics
+
+
+class Command(BaseCommand):
+    help = 'Write loan portfolio analytics as one CSV file per report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='.', help='Directory to write the CSV files to')
+        parser.add_argument('--date', help='Report date for days-past-due (YYYY-MM-DD, default today)')
+        parser.add_argument('--no-cache', action='store_true', help='Recompute instead of reusing a cached report')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        report = portfolio_analytics(as_of=as_of, use_cache=not options['no_cache'])
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for name in ('book', 'delinquency', 'collections', 'loan_types'):
+            rows = report[name]
+            path = output_dir / f"loan_{name}_{report['as_of'].isoformat()}.csv"
+            with path.open('w', newline='') as f:
+                if rows:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                    writer.writerows(rows)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(rows)} row(s) to {path}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from loans.models import Loan
+from loans.progress import rebuild_loan_progress
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized EMI counters on loans from their EMI rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loan', type=int, action='append',
+                            help='Only repair this loan id (may be repeated)')
+
+    def handle(self, *args, **options):
+        loans = Loan.objects.all()
+        if options['loan']:
+            loans = loans.filter(pk__in=options['loan'])
+        updated = rebuild_loan_progress(loans)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt EMI counters for {updated} loan(s)'))
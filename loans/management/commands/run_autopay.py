@@ -0,0 +1,73 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from loans.autopay import run_autopay, run_autopay_parallel, reset_checkpoints, AUTOPAY_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Collect due EMIs of loans with autopay enabled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Collect EMIs due on or before this date (YYYY-MM-DD, default today)')
+        parser.add_argument('--batch-size', type=int, default=AUTOPAY_BATCH_SIZE,
+                            help='Due EMIs read per batch (each account is collected in its own transaction)')
+        parser.add_argument('--limit', type=int, help='Stop after processing this many EMIs')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Run all shards across this many processes')
+        parser.add_argument('--shards', type=int,
+                            help='Split loans into this many shards by account_id %% shards (default: --workers)')
+        parser.add_argument('--shard', type=int,
+                            help='Process only this shard, e.g. to spread shards over several hosts')
+        parser.add_argument('--restart', action='store_true',
+                            help='Discard checkpoints for this date and scan every shard again')
+
+    def handle(self, *args, **options):
+        as_of = timezone.localdate()
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        workers = options['workers']
+        shards = options['shards'] or workers
+        shard = options['shard']
+        if workers < 1 or shards < 1:
+            raise CommandError('--workers and --shards must be at least 1')
+        if shard is not None and not 0 <= shard < shards:
+            raise CommandError(f'--shard must be between 0 and {shards - 1}')
+        sharded = shard is not None or workers > 1 or options['shards']
+
+        if options['restart'] and sharded:
+            deleted = reset_checkpoints(as_of, shards)
+            self.stdout.write(f'Discarded {deleted} checkpoint(s)')
+
+        if shard is not None:
+            run = run_autopay(as_of=as_of, batch_size=options['batch_size'], limit=options['limit'],
+                              shard=shard, shards=shards)
+        elif sharded:
+            if options['limit']:
+                raise CommandError('--limit cannot be combined with --workers or --shards')
+            run = run_autopay_parallel(as_of=as_of, workers=workers, shards=shards,
+                                       batch_size=options['batch_size'])
+        else:
+            run = run_autopay(as_of=as_of, batch_size=options['batch_size'], limit=options['limit'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Collected {run.collected} EMI(s) totalling ₹{run.amount} in {run.elapsed:.2f}s '
+            f'({run.rate:.1f} EMIs/sec)'
+        ))
+        if run.failed - run.skipped:
+            self.stderr.write(self.style.WARNING(
+                f'{run.failed - run.skipped} EMI(s) could not be collected (insufficient balance); they stay unpaid'
+            ))
+        for shard, error in sorted(run.failed_shards.items()):
+            self.stderr.write(self.style.ERROR(
+                f'Shard {shard} stopped with an error: {error}; run again to resume it from its checkpoint'
+            ))
+        if run.skipped:
+            self.stderr.write(self.style.WARNING(
+                f'{run.skipped} EMI(s) skipped after repeated lock conflicts; the next run collects them'
+            ))
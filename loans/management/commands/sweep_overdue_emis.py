@@ -0,0 +1,28 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.overdue import sweep_overdue_emis, OVERDUE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Mark past-due pending EMIs as overdue and charge late fees'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='EMIs due before this date are overdue (YYYY-MM-DD, default today)')
+        parser.add_argument('--batch-size', type=int, default=OVERDUE_BATCH_SIZE,
+                            help='EMIs updated per statement')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        started = time.monotonic()
+        marked = sweep_overdue_emis(as_of=as_of, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Marked {marked} EMI(s) overdue in {elapsed:.2f}s'))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_loan_autopay_enabled_loan_closure_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emipayment',
+            index=models.Index(fields=['payment_status', 'due_date'], name='emi_status_due_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_emipayment_status_due_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutopayCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField(help_text='EMIs due on or before this date are collected')),
+                ('shard', models.PositiveIntegerField(help_text='Shard number; the shard holds loans with loan_id % shards == shard')),
+                ('shards', models.PositiveIntegerField(help_text='Total number of shards in the run')),
+                ('last_emi_id', models.BigIntegerField(default=0, help_text='Highest EMI id processed so far')),
+                ('collected', models.PositiveIntegerField(default=0, help_text='EMIs collected so far')),
+                ('failed', models.PositiveIntegerField(default=0, help_text='EMIs that could not be collected')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, help_text='Total amount collected so far', max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Last time progress was recorded')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='When the shard finished', null=True)),
+            ],
+            options={
+                'verbose_name': 'Autopay Checkpoint',
+                'verbose_name_plural': 'Autopay Checkpoints',
+                'ordering': ['-run_date', 'shards', 'shard'],
+                'constraints': [models.UniqueConstraint(fields=('run_date', 'shards', 'shard'), name='unique_autopay_checkpoint')],
+            },
+        ),
+    ]
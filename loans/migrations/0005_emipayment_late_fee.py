@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_autopaycheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emipayment',
+            name='late_fee',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Late payment fee charged once the EMI became overdue', max_digits=12),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_emi_counters(apps, schema_editor):
+    Loan = apps.get_model('loans', 'Loan')
+    EMIPayment = apps.get_model('loans', 'EMIPayment')
+    paid = EMIPayment.objects.filter(loan=OuterRef('pk'), payment_status='Paid').order_by().values('loan')
+    unpaid = EMIPayment.objects.filter(
+        loan=OuterRef('pk'), payment_status__in=['Pending', 'Overdue']
+    ).order_by('emi_number')
+    Loan.objects.update(
+        paid_emi_count=Coalesce(Subquery(paid.annotate(n=Count('id')).values('n')), Value(0)),
+        total_paid=Coalesce(Subquery(paid.annotate(s=Sum('paid_amount')).values('s')), Value(0)),
+        next_pending_emi=Subquery(unpaid.values('id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_emipayment_late_fee'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='next_pending_emi',
+            field=models.ForeignKey(blank=True, help_text='Earliest EMI that is still unpaid', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='loans.emipayment'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='paid_emi_count',
+            field=models.IntegerField(default=0, help_text='Number of EMIs paid so far'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Total amount paid towards EMIs, including late fees', max_digits=12),
+        ),
+        migrations.RunPython(backfill_emi_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0006_loan_emi_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='autopaycheckpoint',
+            name='shard',
+            field=models.PositiveIntegerField(help_text='Shard number; the shard holds loans of accounts with account_id % shards == shard'),
+        ),
+    ]
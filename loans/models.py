@@ -1,6 +1,37 @@
 from django.db import models
+from django.db.models import Count, Q, Sum
 from banking.models import Account
 
+# Columns rendered on loan list pages
+LOAN_LIST_FIELDS = (
+    'id', 'loan_type', 'loan_amount', 'interest_rate', 'tenure_months',
+    'monthly_emi', 'loan_status', 'application_date',
+)
+
+
+class LoanQuerySet(models.QuerySet):
+    def for_list(self):
+        """Only the columns loan list pages display"""
+        return self.only(*LOAN_LIST_FIELDS)
+    
+    def status_summary(self):
+        """
+        Loan counts per status, outstanding balance and monthly EMI of active loans,
+        computed with one conditional aggregate
+        """
+        active = Q(loan_status='Disbursed')
+        return self.order_by().aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(loan_status='Pending')),
+            approved=Count('id', filter=Q(loan_status='Approved')),
+            rejected=Count('id', filter=Q(loan_status='Rejected')),
+            active=Count('id', filter=active),
+            closed=Count('id', filter=Q(loan_status='Closed')),
+            total_outstanding=Sum('remaining_balance', filter=active, default=0),
+            total_emi=Sum('monthly_emi', filter=active, default=0),
+        )
+
+
 class Loan(models.Model):
     """
     Loan model for tracking loan applications
@@ -96,6 +127,26 @@ class Loan(models.Model):
         blank=True,
         help_text="Date when loan was closed"
     )
+    paid_emi_count = models.IntegerField(
+        default=0,
+        help_text="Number of EMIs paid so far"
+    )
+    total_paid = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Total amount paid towards EMIs, including late fees"
+    )
+    next_pending_emi = models.ForeignKey(
+        'EMIPayment',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Earliest EMI that is still unpaid"
+    )
+    
+    objects = LoanQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.loan_type} - {self.loan_amount} - {self.account.account_holder_name}"
@@ -120,12 +171,12 @@ class Loan(models.Model):
     @property
     def paid_emis_count(self):
         """Count number of EMIs paid"""
-        return self.emi_payments.filter(payment_status='Paid').count()
+        return self.paid_emi_count
     
     @property
     def pending_emis_count(self):
         """Count number of EMIs pending"""
-        return self.tenure_months - self.paid_emis_count
+        return self.tenure_months - self.paid_emi_count
     
     def calculate_emi(self):
         """
@@ -133,17 +184,10 @@ class Loan(models.Model):
         EMI = [P x R x (1+R)^N] / [(1+R)^N-1]
         where P = loan amount, R = monthly rate, N = tenure in months
         """
+        from .amortization import emi_amounts, to_paisa
+        
         if self.loan_amount and self.interest_rate and self.tenure_months:
-            p = float(self.loan_amount)
-            r = float(self.interest_rate) / (12 * 100)  # Monthly rate
-            n = self.tenure_months
-            
-            if r > 0:
-                emi = (p * r * pow(1 + r, n)) / (pow(1 + r, n) - 1)
-            else:
-                emi = p / n
-            
-            return round(emi, 2)
+            return to_paisa(emi_amounts(self.loan_amount, self.interest_rate, self.tenure_months))
         return 0
     
     def save(self, *args, **kwargs):
@@ -169,6 +213,9 @@ class EMIPayment(models.Model):
         ('Failed', 'Failed'),
     ]
     
+    # EMIs that still have to be paid
+    UNPAID_STATUSES = ('Pending', 'Overdue')
+    
     PAYMENT_METHOD_CHOICES = [
         ('Auto', 'Auto-Pay'),
         ('Manual', 'Manual Payment'),
@@ -192,6 +239,12 @@ class EMIPayment(models.Model):
         decimal_places=2,
         help_text="EMI amount"
     )
+    late_fee = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Late payment fee charged once the EMI became overdue"
+    )
     paid_amount = models.DecimalField(
         max_digits=12,
         decimal_places=2,
@@ -226,8 +279,73 @@ class EMIPayment(models.Model):
     def __str__(self):
         return f"EMI #{self.emi_number} - {self.loan.loan_type} - {self.payment_status}"
     
+    @property
+    def amount_due(self):
+        """EMI amount plus any late fee"""
+        return self.emi_amount + self.late_fee
+    
     class Meta:
         verbose_name = 'EMI Payment'
         verbose_name_plural = 'EMI Payments'
         ordering = ['loan', 'emi_number']
         unique_together = ['loan', 'emi_number']
+        indexes = [
+            # Due-EMI scans by autopay and the overdue sweep
+            models.Index(fields=['payment_status', 'due_date'], name='emi_status_due_idx'),
+        ]
+
+
+class AutopayCheckpoint(models.Model):
+    """
+    Progress of one shard of an autopay run, so a crashed run resumes where it stopped
+    """
+    run_date = models.DateField(
+        help_text="EMIs due on or before this date are collected"
+    )
+    shard = models.PositiveIntegerField(
+        help_text="Shard number; the shard holds loans of accounts with account_id % shards == shard"
+    )
+    shards = models.PositiveIntegerField(
+        help_text="Total number of shards in the run"
+    )
+    last_emi_id = models.BigIntegerField(
+        default=0,
+        help_text="Highest EMI id processed so far"
+    )
+    collected = models.PositiveIntegerField(
+        default=0,
+        help_text="EMIs collected so far"
+    )
+    failed = models.PositiveIntegerField(
+        default=0,
+        help_text="EMIs that could not be collected"
+    )
+    amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Total amount collected so far"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last time progress was recorded"
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the shard finished"
+    )
+    
+    def __str__(self):
+        return f"Autopay {self.run_date} shard {self.shard}/{self.shards}"
+    
+    class Meta:
+        verbose_name = 'Autopay Checkpoint'
+        verbose_name_plural = 'Autopay Checkpoints'
+        ordering = ['-run_date', 'shards', 'shard']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['run_date', 'shards', 'shard'],
+                name='unique_autopay_checkpoint',
+            ),
+        ]
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import EMIPayment
+from .progress import refresh_next_emi
+
+# Late fee charged on an EMI that goes overdue, as a fraction of the EMI amount
+LATE_FEE_RATE = Decimal('0.02')
+
+# EMIs flipped to Overdue per UPDATE statement
+OVERDUE_BATCH_SIZE = 5000
+
+
+def sweep_overdue_batch(as_of, batch_size=OVERDUE_BATCH_SIZE, after_id=0):
+    """
+    Flip the next batch of past-due Pending EMIs to Overdue and charge their late fee.
+    Returns (rows updated, last EMI id looked at) or (0, None) when nothing is left.
+    """
+    rows = list(
+        EMIPayment.objects.filter(
+            payment_status='Pending',
+            due_date__lt=as_of,
+            id__gt=after_id,
+            loan__loan_status='Disbursed',
+        ).order_by('id').values_list('id', 'loan_id')[:batch_size]
+    )
+    if not rows:
+        return 0, None
+
+    emi_ids = [emi_id for emi_id, loan_id in rows]
+    with db_transaction.atomic():
+        # Re-checking the status in the UPDATE skips EMIs paid since they were read
+        updated = EMIPayment.objects.filter(id__in=emi_ids, payment_status='Pending').update(
+            payment_status='Overdue',
+            late_fee=Round(F('emi_amount') * Value(LATE_FEE_RATE), 2),
+        )
+        refresh_next_emi({loan_id for emi_id, loan_id in rows})
+    return updated, emi_ids[-1]
+
+
+def sweep_overdue_emis(as_of=None, batch_size=OVERDUE_BATCH_SIZE):
+    """
+    Mark every EMI due before `as_of` (default today) that is still Pending as Overdue.
+    Returns the number of EMIs marked.
+    """
+    as_of = as_of or timezone.localdate()
+    total = 0
+    after_id = 0
+    while True:
+        updated, after_id = sweep_overdue_batch(as_of, batch_size, after_id)
+        if after_id is None:
+            return total
+        total += updated
@@ -0,0 +1,95 @@
+from dateutil.relativedelta import relativedelta
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from .amortization import amortization_schedule, to_paisa
+from .models import EMIPayment
+from .overdue import LATE_FEE_RATE
+
+
+def unpaid_emis(loan):
+    """(emi_number, payment_status, due_date, emi_amount, late_fee) of every unpaid EMI, in order"""
+    return list(
+        loan.emi_payments.filter(payment_status__in=EMIPayment.UNPAID_STATUSES)
+        .order_by('emi_number')
+        .values_list('emi_number', 'payment_status', 'due_date', 'emi_amount', 'late_fee')
+    )
+
+
+def preclosure_quote(loan, unpaid, as_of=None):
+    """
+    Payoff amount for closing a loan on `as_of` (default today), given its `unpaid` EMIs.
+    EMIs already due are owed in full with their late fee, including past-due EMIs
+    the overdue sweep has not reached yet. EMIs not yet due are settled at their
+    principal share from the amortization schedule, plus the interest accrued on
+    that principal since the last due date, pro rata by day, added to the next EMI.
+    Returns (total, {emi_number: amount settled}, {emi_number: late fee charged}).
+    """
+    as_of = as_of or timezone.localdate()
+    schedule = amortization_schedule(
+        loan.loan_amount, loan.interest_rate, loan.tenure_months, emi=loan.monthly_emi
+    )
+    shares = {}
+    late_fees = {}
+    next_due = None
+    for emi_number, payment_status, due_date, emi_amount, late_fee in unpaid:
+        if payment_status == 'Overdue' or due_date <= as_of:
+            if payment_status == 'Pending' and due_date < as_of and not late_fee:
+                late_fee = to_paisa(emi_amount * LATE_FEE_RATE)
+            shares[emi_number] = emi_amount + late_fee
+            late_fees[emi_number] = late_fee
+        else:
+            shares[emi_number] = schedule[emi_number - 1]['principal']
+            if next_due is None:
+                next_due = (emi_number, due_date)
+
+    if next_due is not None:
+        emi_number, due_date = next_due
+        period_start = due_date - relativedelta(months=1)
+        elapsed = max((as_of - period_start).days, 0)
+        interest = schedule[emi_number - 1]['interest'] * elapsed / (due_date - period_start).days
+        shares[emi_number] += to_paisa(interest)
+    return sum(shares.values()), shares, late_fees
+
+
+def _per_emi(values, default, output_field):
+    """CASE expression picking each EMI's value from `values` by emi_number"""
+    return Case(
+        *[
+            When(emi_number=emi_number, then=Value(value, output_field=output_field))
+            for emi_number, value in values.items()
+        ],
+        default=default,
+        output_field=output_field,
+    )
+
+
+def settle_preclosure(loan, shares, late_fees):
+    """
+    Mark all unpaid EMIs of a locked loan paid with one UPDATE and close the loan.
+    `shares` and `late_fees` are the per-EMI splits returned by preclosure_quote;
+    the late fees are written with the payments so each EMI row matches the quote.
+    """
+    now = timezone.now()
+    amount_field = DecimalField(max_digits=12, decimal_places=2)
+    paid = loan.emi_payments.filter(payment_status__in=EMIPayment.UNPAID_STATUSES).update(
+        paid_amount=_per_emi(shares, F('emi_amount'), amount_field),
+        late_fee=_per_emi(late_fees, F('late_fee'), amount_field),
+        payment_date=now,
+        payment_status='Paid',
+        payment_method='Preclosure',
+        transaction_reference=f'PRECLOSURE-{loan.id}',
+    )
+
+    loan.paid_emi_count += paid
+    loan.total_paid += sum(shares.values())
+    loan.next_pending_emi = None
+    loan.remaining_balance = 0
+    loan.loan_status = 'Closed'
+    loan.closure_date = now
+    loan.next_emi_date = None
+    loan.save(update_fields=[
+        'paid_emi_count', 'total_paid', 'next_pending_emi', 'remaining_balance',
+        'loan_status', 'closure_date', 'next_emi_date',
+    ])
+    return paid
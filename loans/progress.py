@@ -0,0 +1,60 @@
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Loan, EMIPayment
+
+
+def _next_unpaid(field):
+    """Subquery for `field` of the earliest unpaid EMI of the outer loan"""
+    return Subquery(
+        EMIPayment.objects.filter(
+            loan=OuterRef('pk'),
+            payment_status__in=EMIPayment.UNPAID_STATUSES,
+        ).order_by('emi_number').values(field)[:1]
+    )
+
+
+def refresh_next_emi(loan_ids):
+    """Point next_pending_emi and next_emi_date of the given loans at their earliest unpaid EMI"""
+    return Loan.objects.filter(pk__in=loan_ids).update(
+        next_pending_emi=_next_unpaid('id'),
+        next_emi_date=_next_unpaid('due_date'),
+    )
+
+
+def record_emi_payments(paid):
+    """
+    Fold freshly paid EMIs into their loans' counters.
+    `paid` maps loan id to (EMIs paid, amount paid, EMI amount to take off the
+    remaining balance). Counters change with UPDATE ... SET x = x + n, so this is
+    safe next to concurrent payments; loans with nothing left to pay are closed.
+    Must run in the transaction that marked the EMIs paid.
+    """
+    if not paid:
+        return
+    for loan_id, (count, amount, balance_paid) in paid.items():
+        Loan.objects.filter(pk=loan_id).update(
+            paid_emi_count=F('paid_emi_count') + count,
+            total_paid=F('total_paid') + amount,
+            remaining_balance=F('remaining_balance') - balance_paid,
+        )
+    refresh_next_emi(paid)
+    Loan.objects.filter(pk__in=paid, loan_status='Disbursed', next_pending_emi__isnull=True).update(
+        loan_status='Closed',
+        closure_date=timezone.now(),
+    )
+
+
+def rebuild_loan_progress(loans):
+    """
+    Recompute paid_emi_count, total_paid and the next unpaid EMI of `loans` from
+    their EMI rows, in one UPDATE. Returns the number of loans updated.
+    """
+    paid = EMIPayment.objects.filter(loan=OuterRef('pk'), payment_status='Paid').order_by().values('loan')
+    return loans.update(
+        paid_emi_count=Coalesce(Subquery(paid.annotate(n=Count('id')).values('n')), Value(0)),
+        total_paid=Coalesce(Subquery(paid.annotate(s=Sum('paid_amount')).values('s')), Value(0)),
+        next_pending_emi=_next_unpaid('id'),
+        next_emi_date=_next_unpaid('due_date'),
+    )
@@ -0,0 +1,37 @@
+from dateutil.relativedelta import relativedelta
+
+from .models import EMIPayment
+
+# EMI rows written per INSERT statement
+EMI_BULK_BATCH_SIZE = 1000
+
+
+def build_emi_schedule(loan, first_due_date):
+    """
+    Unsaved EMIPayment rows for the whole tenure of a loan, one per month
+    starting at `first_due_date`
+    """
+    schedule = []
+    due_date = first_due_date
+    for emi_number in range(1, loan.tenure_months + 1):
+        schedule.append(EMIPayment(
+            loan=loan,
+            emi_number=emi_number,
+            due_date=due_date,
+            emi_amount=loan.monthly_emi,
+            payment_status='Pending'
+        ))
+        due_date = due_date + relativedelta(months=1)
+    return schedule
+
+
+def create_emi_schedules(loans):
+    """
+    Write the EMI schedules of already disbursed loans with bulk INSERTs.
+    Each loan's first EMI falls on its next_emi_date. Returns the number of rows written.
+    """
+    rows = []
+    for loan in loans:
+        rows.extend(build_emi_schedule(loan, loan.next_emi_date))
+    EMIPayment.objects.bulk_create(rows, batch_size=EMI_BULK_BATCH_SIZE)
+    return len(rows)
@@ -1,3 +1,444 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from banking.models import Account
+from .amortization import amortization_schedule, emi_amounts, to_paisa, what_if_scenarios
+from .analytics import collections_by_month, delinquency_buckets, loan_type_breakdown, outstanding_book, portfolio_analytics
+from .autopay import due_emis, run_autopay, shard_emis
+from .models import Loan, EMIPayment, AutopayCheckpoint
+from .overdue import sweep_overdue_emis, LATE_FEE_RATE
+from .preclosure import unpaid_emis, preclosure_quote
+from .progress import rebuild_loan_progress
+from .schedule import create_emi_schedules
+
+User = get_user_model()
+
+
+def _create_account(username, phone_number, balance=0):
+    user = User.objects.create_user(username=username, password='pass12345')
+    return Account.objects.create(
+        user=user, account_holder_name=username.title(), phone_number=phone_number, balance=balance
+    )
+
+
+def _disbursed_loan(account, first_due_date, interest_rate=Decimal('0.00'), autopay_enabled=True):
+    """A disbursed 3-month loan of 3,000 (EMI 1,000 at 0%) with its EMI schedule written"""
+    loan = Loan.objects.create(
+        account=account, loan_amount=Decimal('3000.00'), loan_type='Personal', interest_rate=interest_rate,
+        tenure_months=3, monthly_emi=None if interest_rate else Decimal('1000.00'), loan_status='Disbursed',
+        disbursement_date=timezone.now(), autopay_enabled=autopay_enabled, next_emi_date=first_due_date,
+    )
+    loan.remaining_balance = loan.monthly_emi * loan.tenure_months
+    loan.save(update_fields=['remaining_balance'])
+    create_emi_schedules([loan])
+    return loan
+
+
+class AutopayTests(TestCase):
+    """
+    Autopay collects due EMIs per account and resumes sharded runs from their checkpoint
+    """
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001', balance=Decimal('2500.00'))
+        self.loan = _disbursed_loan(self.account, self.today - timedelta(days=31))
+
+    def test_collects_due_emis_and_updates_counters(self):
+        run = run_autopay(as_of=self.today)
+
+        self.assertEqual((run.collected, run.failed, run.skipped), (2, 0, 0))
+        self.assertEqual(run.amount, Decimal('2000.00'))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('500.00'))
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.paid_emi_count, 2)
+        self.assertEqual(self.loan.total_paid, Decimal('2000.00'))
+        self.assertEqual(self.loan.remaining_balance, Decimal('1000.00'))
+        self.assertEqual(self.loan.next_pending_emi.emi_number, 3)
+        self.assertEqual(
+            list(self.loan.emi_payments.filter(payment_method='Auto').values_list('emi_number', flat=True)),
+            [1, 2],
+        )
+
+    def test_insufficient_balance_leaves_later_emis_unpaid(self):
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('500.00'))
+
+        run = run_autopay(as_of=self.today)
+
+        self.assertEqual((run.collected, run.failed), (0, 2))
+        self.assertFalse(self.loan.emi_payments.filter(payment_status='Paid').exists())
+
+    def test_accounts_are_collected_independently(self):
+        other = _create_account('bob', '9000000002', balance=Decimal('100.00'))
+        _disbursed_loan(other, self.today)
+
+        run = run_autopay(as_of=self.today)
+
+        self.assertEqual((run.collected, run.failed), (2, 1))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('500.00'))
+
+    def test_sharded_run_resumes_from_checkpoint(self):
+        first = self.loan.emi_payments.get(emi_number=1)
+        AutopayCheckpoint.objects.create(run_date=self.today, shard=0, shards=1, last_emi_id=first.id)
+
+        run = run_autopay(as_of=self.today, shard=0, shards=1)
+
+        # EMI 1 lies before the checkpoint, so only EMI 2 is collected
+        self.assertEqual(run.collected, 1)
+        self.assertEqual(EMIPayment.objects.get(pk=first.pk).payment_status, 'Pending')
+        checkpoint = AutopayCheckpoint.objects.get(run_date=self.today, shard=0, shards=1)
+        self.assertEqual(checkpoint.collected, 1)
+        self.assertIsNotNone(checkpoint.completed_at)
+
+        # A completed shard is not processed again
+        self.assertEqual(run_autopay(as_of=self.today, shard=0, shards=1).collected, 0)
+
+    def test_shards_split_by_account(self):
+        other = _create_account('bob', '9000000002', balance=Decimal('5000.00'))
+        _disbursed_loan(other, self.today)
+        second = _disbursed_loan(self.account, self.today)
+
+        due = due_emis(self.today)
+        shards = [set(shard_emis(due, shard, 2).values_list('loan__account_id', flat=True)) for shard in range(2)]
+
+        # Every account lands in exactly one shard, with all of its loans
+        self.assertEqual(sorted(len(accounts) for accounts in shards), [1, 1])
+        alice_shard = shard_emis(due, self.account.pk % 2, 2)
+        self.assertEqual(set(alice_shard.values_list('loan_id', flat=True)), {self.loan.pk, second.pk})
+
+
+class PreclosureTests(TestCase):
+    """
+    Preclosure charges everything already due in full and only principal plus
+    accrued interest for the rest
+    """
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001', balance=Decimal('10000.00'))
+        # EMI 1 fell due 10 days ago and the overdue sweep has not run yet
+        self.loan = _disbursed_loan(
+            self.account, self.today - timedelta(days=10), interest_rate=Decimal('12.00'), autopay_enabled=False
+        )
+        self.schedule = amortization_schedule(
+            self.loan.loan_amount, self.loan.interest_rate, self.loan.tenure_months, emi=self.loan.monthly_emi
+        )
+
+    def test_quote_charges_due_emis_in_full_and_accrued_interest(self):
+        total, shares, late_fees = preclosure_quote(self.loan, unpaid_emis(self.loan))
+
+        emi = self.loan.monthly_emi
+        first, second = self.loan.emi_payments.order_by('emi_number')[:2]
+        period = (second.due_date - first.due_date).days
+        self.assertEqual(shares[1], emi + (emi * Decimal('0.02')).quantize(Decimal('0.01')))
+        self.assertEqual(
+            shares[2],
+            self.schedule[1]['principal'] + (self.schedule[1]['interest'] * 10 / period).quantize(Decimal('0.01')),
+        )
+        self.assertEqual(shares[3], self.schedule[2]['principal'])
+        self.assertEqual(total, sum(shares.values()))
+
+    def test_emi_due_today_is_owed_without_late_fee(self):
+        EMIPayment.objects.filter(loan=self.loan, emi_number=1).update(due_date=self.today)
+
+        total, shares, late_fees = preclosure_quote(self.loan, unpaid_emis(self.loan))
+
+        self.assertEqual(shares[1], self.loan.monthly_emi)
+
+    def test_preclosure_settles_loan(self):
+        total, shares, late_fees = preclosure_quote(self.loan, unpaid_emis(self.loan))
+        self.client.force_login(self.account.user)
+
+        self.client.post(
+            reverse('loans:preclose_loan', args=[self.loan.id]),
+            {'confirm_preclosure': 'on', 'quoted_amount': total},
+        )
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.loan_status, 'Closed')
+        self.assertEqual(self.loan.remaining_balance, 0)
+        self.assertEqual(self.loan.total_paid, total)
+        self.assertFalse(self.loan.emi_payments.filter(payment_status__in=EMIPayment.UNPAID_STATUSES).exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('10000.00') - total)
+        # The late fee in the quote is recorded on the EMI it was charged for
+        self.assertEqual(
+            dict(self.loan.emi_payments.values_list('emi_number', 'late_fee')),
+            {1: late_fees[1], 2: 0, 3: 0},
+        )
+        self.assertEqual(sum(self.loan.emi_payments.values_list('paid_amount', flat=True)), total)
+
+    def test_preclosure_refused_when_quote_has_changed(self):
+        total, shares, late_fees = preclosure_quote(self.loan, unpaid_emis(self.loan))
+        self.client.force_login(self.account.user)
+
+        response = self.client.post(
+            reverse('loans:preclose_loan', args=[self.loan.id]),
+            {'confirm_preclosure': 'on', 'quoted_amount': total - Decimal('1.00')},
+        )
+
+        self.assertRedirects(response, reverse('loans:preclose_loan', args=[self.loan.id]))
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.loan_status, 'Disbursed')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('10000.00'))
+
+
+class DisbursementTests(TestCase):
+    """
+    Disbursing approved loans credits the borrower and writes the full EMI schedule
+    """
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001')
+        self.loan = Loan.objects.create(
+            account=self.account, loan_amount=Decimal('12000.00'), loan_type='Personal',
+            interest_rate=Decimal('12.00'), tenure_months=12, loan_status='Approved',
+        )
+        admin_user = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_login(admin_user)
+
+    def _disburse(self, *loans):
+        return self.client.post(reverse('admin:loans_loan_changelist'), {
+            'action': 'disburse_loans',
+            '_selected_action': [loan.pk for loan in loans],
+        })
+
+    def test_disbursal_credits_account_and_creates_schedule(self):
+        self._disburse(self.loan)
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.loan_status, 'Disbursed')
+        self.assertEqual(self.loan.remaining_balance, self.loan.monthly_emi * 12)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('12000.00'))
+
+        emis = list(self.loan.emi_payments.order_by('emi_number'))
+        self.assertEqual([emi.emi_number for emi in emis], list(range(1, 13)))
+        self.assertEqual(emis[0].due_date, self.loan.next_emi_date)
+        self.assertEqual(emis[1].due_date, self.loan.next_emi_date + relativedelta(months=1))
+        self.assertTrue(all(emi.payment_status == 'Pending' for emi in emis))
+        self.assertEqual(self.loan.next_pending_emi_id, emis[0].id)
+
+    def test_loan_is_disbursed_only_once(self):
+        self._disburse(self.loan)
+        self._disburse(self.loan)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('12000.00'))
+        self.assertEqual(self.loan.emi_payments.count(), 12)
+
+
+class OverdueSweepTests(TestCase):
+    """
+    The overdue sweep flags past-due EMIs once and charges the late fee once
+    """
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001')
+        self.loan = _disbursed_loan(self.account, self.today - relativedelta(months=1), autopay_enabled=False)
+
+    def test_past_due_emis_are_marked_overdue_with_late_fee(self):
+        self.assertEqual(sweep_overdue_emis(self.today), 1)
+        # A second sweep finds nothing new and charges no second fee
+        self.assertEqual(sweep_overdue_emis(self.today), 0)
+
+        emis = {emi.emi_number: emi for emi in self.loan.emi_payments.all()}
+        self.assertEqual(emis[1].payment_status, 'Overdue')
+        self.assertEqual(emis[1].late_fee, Decimal('1000.00') * LATE_FEE_RATE)
+        # Due today is not overdue yet
+        self.assertEqual(emis[2].payment_status, 'Pending')
+        self.assertEqual(emis[2].late_fee, 0)
+
+    def test_overdue_emi_is_collected_with_its_fee(self):
+        sweep_overdue_emis(self.today)
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('5000.00'))
+        Loan.objects.filter(pk=self.loan.pk).update(autopay_enabled=True)
+
+        run = run_autopay(as_of=self.today)
+
+        self.assertEqual(run.amount, Decimal('2000.00') + Decimal('1000.00') * LATE_FEE_RATE)
+
+
+class LoanProgressTests(TestCase):
+    """
+    EMI counters on Loan follow payments and can be rebuilt from the EMI rows
+    """
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001', balance=Decimal('5000.00'))
+        self.loan = _disbursed_loan(self.account, self.today, autopay_enabled=False)
+        self.client.force_login(self.account.user)
+
+    def _pay_next_emi(self):
+        self.client.post(reverse('loans:pay_emi_manual', args=[self.loan.id]), {'confirm_payment': 'on'})
+
+    def test_manual_payments_update_counters_and_close_loan(self):
+        self._pay_next_emi()
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.paid_emi_count, 1)
+        self.assertEqual(self.loan.total_paid, Decimal('1000.00'))
+        self.assertEqual(self.loan.remaining_balance, Decimal('2000.00'))
+        self.assertEqual(self.loan.next_pending_emi.emi_number, 2)
+
+        self._pay_next_emi()
+        self._pay_next_emi()
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.loan_status, 'Closed')
+        self.assertEqual(self.loan.paid_emi_count, 3)
+        self.assertIsNone(self.loan.next_pending_emi)
+
+    def test_rebuild_repairs_counters(self):
+        self._pay_next_emi()
+        Loan.objects.filter(pk=self.loan.pk).update(paid_emi_count=0, total_paid=0, next_pending_emi=None)
+
+        rebuild_loan_progress(Loan.objects.filter(pk=self.loan.pk))
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.paid_emi_count, 1)
+        self.assertEqual(self.loan.total_paid, Decimal('1000.00'))
+        self.assertEqual(self.loan.next_pending_emi.emi_number, 2)
+
+
+class LoanSummaryTests(TestCase):
+    """
+    The per-account loan summary counts loans per status in one query
+    """
+    def test_counts_and_totals_per_status(self):
+        account = _create_account('alice', '9000000001')
+        other = _create_account('bob', '9000000002')
+        for status in ['Pending', 'Pending', 'Approved', 'Rejected', 'Closed']:
+            Loan.objects.create(
+                account=account, loan_amount=Decimal('1000.00'), loan_type='Personal',
+                interest_rate=Decimal('0.00'), tenure_months=10, monthly_emi=Decimal('100.00'), loan_status=status,
+            )
+        _disbursed_loan(account, timezone.localdate())
+        _disbursed_loan(other, timezone.localdate())
+
+        summary = Loan.objects.filter(account=account).status_summary()
+
+        self.assertEqual(summary['total'], 6)
+        self.assertEqual(
+            [summary[key] for key in ('pending', 'approved', 'rejected', 'active', 'closed')],
+            [2, 1, 1, 1, 1],
+        )
+        self.assertEqual(summary['total_outstanding'], Decimal('3000.00'))
+        self.assertEqual(summary['total_emi'], Decimal('1000.00'))
+
+    def test_dashboard_shows_loan_summary(self):
+        account = _create_account('alice', '9000000001')
+        _disbursed_loan(account, timezone.localdate())
+        User.objects.filter(pk=account.user_id).update(is_account_created=True)
+        self.client.force_login(account.user)
+
+        response = self.client.get(reverse('core:dashboard'))
+
+        self.assertEqual(response.context['active_loans'], 1)
+        self.assertContains(response, '₹3000.00')
+
+
+class PortfolioAnalyticsTests(TestCase):
+    """
+    Portfolio reports aggregate the live loan book per bucket and type, and the cached
+    report is recomputed as soon as a loan changes
+    """
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.account = _create_account('alice', '9000000001', balance=Decimal('1000.00'))
+        self.late = _disbursed_loan(self.account, self.today - timedelta(days=40))
+        self.current = _disbursed_loan(self.account, self.today + timedelta(days=5))
+        Loan.objects.create(
+            account=self.account, loan_amount=Decimal('50000.00'), loan_type='Home',
+            interest_rate=Decimal('8.00'), tenure_months=60, loan_status='Pending',
+        )
+
+    def test_grouped_aggregates(self):
+        book = outstanding_book()
+        self.assertEqual(book['active_loans'], 2)
+        self.assertEqual(book['principal'], Decimal('6000.00'))
+        self.assertEqual(book['outstanding'], Decimal('6000.00'))
+        self.assertEqual(book['monthly_emi'], Decimal('2000.00'))
+
+        buckets = {row['bucket']: (row['loans'], row['outstanding']) for row in delinquency_buckets(self.today)}
+        self.assertEqual(buckets['current'], (1, Decimal('3000.00')))
+        self.assertEqual(buckets['dpd_31_60'], (1, Decimal('3000.00')))
+        self.assertEqual(buckets['dpd_1_30'], (0, 0))
+        self.assertEqual(buckets['dpd_90_plus'], (0, 0))
+
+        types = {row['loan_type']: row for row in loan_type_breakdown()}
+        self.assertEqual((types['Home']['applications'], types['Home']['active_loans']), (1, 0))
+        self.assertEqual(types['Home']['principal'], 0)
+        self.assertEqual((types['Personal']['applications'], types['Personal']['active_loans']), (2, 2))
+        self.assertEqual(types['Personal']['principal'], Decimal('6000.00'))
+
+    def test_collections_by_month(self):
+        run_autopay(as_of=self.today)
+
+        rows = collections_by_month()
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['month'], timezone.now().strftime('%Y-%m'))
+        self.assertEqual((rows[0]['payment_method'], rows[0]['emis']), ('Auto', 1))
+        self.assertEqual(rows[0]['amount'], Decimal('1000.00'))
+
+    def test_cached_report_refreshes_when_a_loan_changes(self):
+        report = portfolio_analytics(self.today)
+        # Only the book fingerprint is read while nothing has changed
+        with self.assertNumQueries(1):
+            self.assertEqual(portfolio_analytics(self.today), report)
+
+        run_autopay(as_of=self.today)
+        report = portfolio_analytics(self.today)
+
+        self.assertEqual(report['book'][0]['outstanding'], Decimal('5000.00'))
+        self.assertEqual(len(report['collections']), 1)
+
+        Loan.objects.filter(pk=self.current.pk).update(loan_status='Closed', remaining_balance=0)
+        report = portfolio_analytics(self.today)
+
+        self.assertEqual(report['book'][0]['active_loans'], 1)
+
+
+class AmortizationTests(SimpleTestCase):
+    """
+    EMIs and schedules match the standard reducing-balance formula to the paisa
+    """
+    def test_known_emis(self):
+        emis = emi_amounts([100000, 500000, 12000], [12, 8.5, 0], [12, 240, 12])
+
+        self.assertEqual([to_paisa(emi) for emi in emis], [Decimal('8884.88'), Decimal('4339.12'), Decimal('1000.00')])
+
+    def test_schedule_repays_principal_exactly(self):
+        schedule = amortization_schedule(100000, 12, 12)
+
+        self.assertEqual(len(schedule), 12)
+        self.assertEqual(schedule[0]['interest'], Decimal('1000.00'))
+        self.assertEqual(schedule[0]['principal'], Decimal('7884.88'))
+        self.assertEqual(sum(row['principal'] for row in schedule), Decimal('100000'))
+        self.assertEqual(schedule[-1]['outstanding'], 0)
+
+    def test_zero_rate_schedule(self):
+        schedule = amortization_schedule(1000, 0, 3)
+
+        self.assertEqual([row['interest'] for row in schedule], [0, 0, 0])
+        self.assertEqual([row['principal'] for row in schedule], [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')])
+        self.assertEqual(schedule[-1]['outstanding'], 0)
+
+    def test_what_if_grid(self):
+        scenarios = what_if_scenarios(100000, 12, 12, rates=[0, 12], tenures=[12, 24, -12])
+
+        by_key = {(row['interest_rate'], row['tenure_months']): row for row in scenarios}
+        self.assertEqual(len(scenarios), 4)
+        self.assertEqual(by_key[(Decimal('12.00'), 12)]['monthly_emi'], Decimal('8884.88'))
+        self.assertEqual(by_key[(Decimal('12.00'), 12)]['total_interest'], Decimal('6618.56'))
+        for row in scenarios:
+            self.assertEqual(row['total_payable'], row['monthly_emi'] * row['tenure_months'])
@@ -5,6 +5,8 @@ app_name = 'loans'
 
 urlpatterns = [
     path('apply/', views.apply_loan, name='apply_loan'),
+    path('apply/what-if/', views.loan_what_if, name='loan_what_if'),
+    path('analytics/', views.loan_analytics, name='loan_analytics'),
     path('status/', views.loan_status, name='loan_status'),
     path('details/<int:loan_id>/', views.loan_details, name='loan_details'),
     path('<int:loan_id>/emi-schedule/', views.emi_schedule, name='emi_schedule'),
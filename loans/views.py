@@ -1,13 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.db import transaction as db_transaction
-from django.db import models
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 from .models import Loan, EMIPayment
-from .forms import LoanApplicationForm, ManualEMIPaymentForm, AutopayToggleForm, LoanPreclosureForm
-from transactions.models import Transaction
+from .forms import LoanApplicationForm, LoanWhatIfForm, ManualEMIPaymentForm, AutopayToggleForm, LoanPreclosureForm
+from .amortization import amortization_schedule
+from .progress import record_emi_payments
+from .preclosure import unpaid_emis, preclosure_quote, settle_preclosure
+from transactions.ledger import lock_accounts, withdraw, LedgerError
 
 @login_required
 def apply_loan(request):
@@ -31,6 +34,39 @@ def apply_loan(request):
     return render(request, 'loans/apply_loan.html', {'form': form})
 
 
+@staff_member_required
+def loan_analytics(request):
+    from django.http import JsonResponse
+    from .analytics import portfolio_analytics
+    
+    # Served from a short-lived cache so risk dashboards do not rescan the loan tables
+    return JsonResponse(portfolio_analytics())
+
+
+@login_required
+def loan_what_if(request):
+    from django.http import JsonResponse
+    from .amortization import what_if_scenarios
+    
+    form = LoanWhatIfForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    # EMI and totals for a grid of rates and tenures around the requested terms
+    scenarios = what_if_scenarios(
+        form.cleaned_data['loan_amount'],
+        form.cleaned_data['interest_rate'],
+        form.cleaned_data['tenure_months'],
+    )
+    
+    return JsonResponse({
+        'scenarios': [
+            {key: str(value) if key != 'tenure_months' else value for key, value in scenario.items()}
+            for scenario in scenarios
+        ],
+    })
+
+
 @login_required
 def loan_status(request):
     # Check if user has an account
@@ -38,18 +74,18 @@ def loan_status(request):
         messages.error(request, 'You need to create a bank account first.')
         return redirect('banking:create_account')
     
-    loans = Loan.objects.filter(account=request.user.account).order_by('-application_date')
+    account_loans = Loan.objects.filter(account=request.user.account)
+    loans = account_loans.for_list().order_by('-application_date')
     
-    # Calculate counts
-    pending_count = loans.filter(loan_status='Pending').count()
-    approved_count = loans.filter(loan_status='Approved').count()
-    rejected_count = loans.filter(loan_status='Rejected').count()
+    # Counts and totals in one query
+    summary = account_loans.status_summary()
     
     context = {
         'loans': loans,
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'rejected_count': rejected_count,
+        'summary': summary,
+        'pending_count': summary['pending'],
+        'approved_count': summary['approved'],
+        'rejected_count': summary['rejected'],
     }
     
     return render(request, 'loans/loan_status.html', context)
@@ -92,17 +128,17 @@ def emi_schedule(request, loan_id):
         return redirect('loans:loan_details', loan_id=loan.id)
     
     # Get all EMI payments
-    emi_payments = loan.emi_payments.all().order_by('emi_number')
+    emi_payments = list(loan.emi_payments.all().order_by('emi_number'))
     
-    # Calculate summary
-    total_paid = loan.emi_payments.filter(payment_status='Paid').aggregate(
-        total=models.Sum('paid_amount')
-    )['total'] or 0
+    # Principal/interest split of each instalment
+    split = amortization_schedule(loan.loan_amount, loan.interest_rate, loan.tenure_months, emi=loan.monthly_emi)
+    for emi, row in zip(emi_payments, split):
+        emi.split = row
     
     context = {
         'loan': loan,
         'emi_payments': emi_payments,
-        'total_paid': total_paid,
+        'total_paid': loan.total_paid,
     }
     
     return render(request, 'loans/emi_schedule.html', context)
@@ -120,8 +156,8 @@ def pay_emi_manual(request, loan_id):
         messages.error(request, 'You can only pay EMI for active loans.')
         return redirect('loans:loan_details', loan_id=loan.id)
     
-    # Get next pending EMI
-    next_emi = loan.emi_payments.filter(payment_status='Pending').order_by('emi_number').first()
+    # Get next unpaid EMI (overdue ones come first)
+    next_emi = loan.emi_payments.filter(payment_status__in=EMIPayment.UNPAID_STATUSES).order_by('emi_number').first()
     
     if not next_emi:
         messages.info(request, 'All EMIs have been paid!')
@@ -129,66 +165,52 @@ def pay_emi_manual(request, loan_id):
     
     # Check if user has sufficient balance
     account = request.user.account
-    if account.balance < next_emi.emi_amount:
-        messages.error(request, f'Insufficient balance. You need ₹{next_emi.emi_amount} to pay this EMI. Current balance: ₹{account.balance}')
+    if account.balance < next_emi.amount_due:
+        messages.error(request, f'Insufficient balance. You need ₹{next_emi.amount_due} to pay this EMI. Current balance: ₹{account.balance}')
         return redirect('loans:emi_schedule', loan_id=loan.id)
     
     if request.method == 'POST':
         form = ManualEMIPaymentForm(request.POST)
         if form.is_valid():
             with db_transaction.atomic():
+                # Lock the account before the EMI, in the same order as autopay and preclosure
+                lock_accounts([account.pk])
                 # Re-fetch EMI with lock to prevent race conditions
                 next_emi = EMIPayment.objects.select_for_update().get(id=next_emi.id)
                 
-                # Double-check EMI is still pending (prevent double payment)
-                if next_emi.payment_status != 'Pending':
+                # Double-check EMI is still unpaid (prevent double payment)
+                if next_emi.payment_status not in EMIPayment.UNPAID_STATUSES:
                     messages.warning(request, f'EMI #{next_emi.emi_number} has already been paid.')
                     return redirect('loans:emi_schedule', loan_id=loan.id)
                 
-                # Deduct EMI amount from account
-                account.balance -= next_emi.emi_amount
-                account.save()
+                # Deduct EMI amount from account and post the ledger row
+                try:
+                    withdraw(
+                        account,
+                        next_emi.amount_due,
+                        f'EMI Payment #{next_emi.emi_number} - {loan.loan_type} Loan'
+                    )
+                except LedgerError:
+                    messages.error(request, f'Insufficient balance. You need ₹{next_emi.amount_due} to pay this EMI.')
+                    return redirect('loans:emi_schedule', loan_id=loan.id)
                 
                 # Update EMI payment (mark as paid with Manual method)
-                # NOTE: Autopay logic should check payment_status='Pending' before attempting to pay
-                next_emi.paid_amount = next_emi.emi_amount
+                # NOTE: Autopay logic should check the EMI is still unpaid before attempting to pay
+                next_emi.paid_amount = next_emi.amount_due
                 next_emi.payment_date = timezone.now()
                 next_emi.payment_status = 'Paid'
                 next_emi.payment_method = 'Manual'
                 next_emi.transaction_reference = f'EMI-{loan.id}-{next_emi.emi_number}'
                 next_emi.save()
                 
-                # Update loan details
-                loan.remaining_balance -= next_emi.emi_amount
-                
-                # Update next EMI date
-                next_pending = loan.emi_payments.filter(payment_status='Pending').order_by('emi_number').first()
-                if next_pending:
-                    loan.next_emi_date = next_pending.due_date
-                else:
-                    # All EMIs paid, close the loan
-                    loan.loan_status = 'Closed'
-                    loan.closure_date = timezone.now()
-                    loan.next_emi_date = None
-                
-                loan.save()
-                
-                # Create transaction record
-                Transaction.objects.create(
-                    from_account=account,
-                    to_account=None,
-                    amount=next_emi.emi_amount,
-                    transaction_type='Withdrawal',
-                    status='Success',
-                    description=f'EMI Payment #{next_emi.emi_number} - {loan.loan_type} Loan',
-                    balance_after=account.balance,
-                    account=account
-                )
+                # Update loan counters, next EMI date, and close the loan if all EMIs are paid
+                record_emi_payments({loan.id: (1, next_emi.amount_due, next_emi.emi_amount)})
+                loan.refresh_from_db()
                 
                 if loan.loan_status == 'Closed':
                     messages.success(request, f'✅ EMI #{next_emi.emi_number} paid successfully! 🎉 Your loan is now fully paid and closed!')
                 else:
-                    messages.success(request, f'✅ EMI #{next_emi.emi_number} paid successfully! Amount: ₹{next_emi.emi_amount}')
+                    messages.success(request, f'✅ EMI #{next_emi.emi_number} paid successfully! Amount: ₹{next_emi.amount_due}')
                 
                 return redirect('loans:emi_schedule', loan_id=loan.id)
     else:
@@ -221,7 +243,7 @@ def toggle_autopay(request, loan_id):
         if form.is_valid():
             autopay_enabled = form.cleaned_data['autopay_enabled']
             loan.autopay_enabled = autopay_enabled
-            loan.save()
+            loan.save(update_fields=['autopay_enabled'])
             
             if autopay_enabled:
                 messages.success(request, '✅ Autopay enabled successfully! EMIs will be automatically deducted on due dates.')
@@ -252,8 +274,9 @@ def preclose_loan(request, loan_id):
         messages.error(request, 'You can only preclose active loans.')
         return redirect('loans:loan_details', loan_id=loan.id)
     
-    # Calculate preclosure amount (remaining balance)
-    preclosure_amount = loan.remaining_balance or 0
+    # Calculate preclosure amount (outstanding principal plus overdue instalments)
+    unpaid = unpaid_emis(loan)
+    preclosure_amount, shares, late_fees = preclosure_quote(loan, unpaid)
     
     account = request.user.account
     
@@ -266,6 +289,8 @@ def preclose_loan(request, loan_id):
         form = LoanPreclosureForm(request.POST, preclosure_amount=preclosure_amount)
         if form.is_valid():
             with db_transaction.atomic():
+                # Lock the account before the loan, in the same order as autopay and manual payments
+                lock_accounts([loan.account_id])
                 # Re-fetch loan with lock to prevent race conditions
                 loan = Loan.objects.select_for_update().get(id=loan.id)
                 
@@ -274,44 +299,31 @@ def preclose_loan(request, loan_id):
                     messages.warning(request, 'This loan has already been closed or is not active.')
                     return redirect('loans:loan_details', loan_id=loan.id)
                 
-                # Deduct preclosure amount from account
-                account.balance -= preclosure_amount
-                account.save()
-                
-                # Mark all pending EMIs as paid (only those that are still pending)
-                # This ensures that if any EMI was paid manually, it won't be double-charged
-                pending_emis = loan.emi_payments.filter(payment_status='Pending').select_for_update()
-                
-                if not pending_emis.exists():
+                # Re-quote under the lock; an EMI paid meanwhile must not be charged twice
+                unpaid = unpaid_emis(loan)
+                if not unpaid:
                     messages.info(request, 'All EMIs have already been paid!')
                     return redirect('loans:loan_details', loan_id=loan.id)
                 
-                for emi in pending_emis:
-                    emi.paid_amount = emi.emi_amount
-                    emi.payment_date = timezone.now()
-                    emi.payment_status = 'Paid'
-                    emi.payment_method = 'Preclosure'
-                    emi.transaction_reference = f'PRECLOSURE-{loan.id}'
-                    emi.save()
+                # Settle only at the amount the customer confirmed
+                preclosure_amount, shares, late_fees = preclosure_quote(loan, unpaid)
+                if preclosure_amount != form.cleaned_data['quoted_amount']:
+                    messages.warning(request, f'The preclosure amount has changed to ₹{preclosure_amount}. Please review and confirm again.')
+                    return redirect('loans:preclose_loan', loan_id=loan.id)
                 
-                # Close the loan
-                loan.remaining_balance = 0
-                loan.loan_status = 'Closed'
-                loan.closure_date = timezone.now()
-                loan.next_emi_date = None
-                loan.save()
+                # Deduct preclosure amount from account and post the ledger row
+                try:
+                    withdraw(
+                        account,
+                        preclosure_amount,
+                        f'Loan Preclosure - {loan.loan_type} Loan (Full Payment)'
+                    )
+                except LedgerError:
+                    messages.error(request, f'Insufficient balance. You need ₹{preclosure_amount} to preclose this loan.')
+                    return redirect('loans:emi_schedule', loan_id=loan.id)
                 
-                # Create transaction record
-                Transaction.objects.create(
-                    from_account=account,
-                    to_account=None,
-                    amount=preclosure_amount,
-                    transaction_type='Withdrawal',
-                    status='Success',
-                    description=f'Loan Preclosure - {loan.loan_type} Loan (Full Payment)',
-                    balance_after=account.balance,
-                    account=account
-                )
+                # Mark every remaining EMI paid in one statement and close the loan
+                settle_preclosure(loan, shares, late_fees)
                 
                 messages.success(request, f'🎉 Loan preclosed successfully! Amount paid: ₹{preclosure_amount}. Your loan is now fully settled!')
                 return redirect('loans:loan_details', loan_id=loan.id)
@@ -319,7 +331,7 @@ def preclose_loan(request, loan_id):
         form = LoanPreclosureForm(preclosure_amount=preclosure_amount)
     
     # Count pending EMIs
-    pending_emis_count = loan.emi_payments.filter(payment_status='Pending').count()
+    pending_emis_count = len(unpaid)
     
     context = {
         'loan': loan,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaction
+from .models import Transaction, StatementJob, DailyBalanceSnapshot, IdempotencyKey
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -23,3 +23,35 @@ class TransactionAdmin(admin.ModelAdmin):
             'fields': ('description', 'timestamp')
         }),
     )
+
+
+@admin.register(StatementJob)
+class StatementJobAdmin(admin.ModelAdmin):
+    """
+    Admin interface for queued PDF statements
+    """
+    list_display = ('id', 'account', 'start_date', 'end_date', 'last_transaction_id', 'status', 'created_at', 'claimed_at', 'completed_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('account__account_number', 'account__account_holder_name', 'cache_key')
+    readonly_fields = ('cache_key', 'created_at', 'claimed_at', 'completed_at')
+
+
+@admin.register(DailyBalanceSnapshot)
+class DailyBalanceSnapshotAdmin(admin.ModelAdmin):
+    """
+    Admin interface for daily balance snapshots
+    """
+    list_display = ('account', 'date', 'opening_balance', 'closing_balance', 'total_credits', 'total_debits', 'transaction_count')
+    search_fields = ('account__account_number', 'account__account_holder_name')
+    date_hierarchy = 'date'
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    """
+    Admin interface for processed idempotency keys
+    """
+    list_display = ('key', 'account', 'endpoint', 'created_at')
+    list_filter = ('endpoint', 'created_at')
+    search_fields = ('key', 'account__account_number')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,61 @@
+import uuid
+
+from django.contrib import messages
+from django.db import IntegrityError, transaction as db_transaction
+from django.http import HttpResponse
+from django.shortcuts import redirect
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_FIELD = 'idempotency_key'
+
+
+def new_idempotency_key():
+    """Fresh key to embed in a form as a hidden field"""
+    return uuid.uuid4().hex
+
+
+def get_idempotency_key(request):
+    """Key from the Idempotency-Key header or the hidden form field, if any"""
+    key = request.headers.get('Idempotency-Key') or request.POST.get(IDEMPOTENCY_FIELD)
+    if not key:
+        return None
+    return key.strip()[:64] or None
+
+
+def claim_idempotency_key(account, key, endpoint):
+    """
+    Record first use of a key with a single INSERT on the unique (account, key) index.
+    Returns (record, created). Call inside the transaction that does the posting so a
+    failed posting releases the key; a concurrent duplicate waits on the index and
+    then sees the committed record.
+    """
+    try:
+        with db_transaction.atomic():
+            return IdempotencyKey.objects.create(account=account, key=key, endpoint=endpoint), True
+    except IntegrityError:
+        return IdempotencyKey.objects.get(account=account, key=key), False
+
+
+def complete_idempotency_key(record, result_message, redirect_url):
+    """Store the result to replay for later requests with the same key"""
+    record.result_message = result_message
+    record.redirect_url = redirect_url
+    record.save(update_fields=['result_message', 'redirect_url'])
+
+
+def replay_idempotent_response(request, record, endpoint):
+    """
+    Answer a replayed request with the original result, without posting again.
+    A key first used on another endpoint is rejected with 422 instead, since
+    replaying would report an operation the client did not ask for.
+    """
+    if record.endpoint != endpoint:
+        return HttpResponse(
+            f'This idempotency key was already used for {record.endpoint}; use a new key.',
+            status=422,
+            content_type='text/plain',
+        )
+    if record.result_message:
+        messages.success(request, record.result_message)
+    return redirect(record.redirect_url or 'core:dashboard')
@@ -0,0 +1,356 @@
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from banking.models import Account
+from .models import Transaction, DailyBalanceSnapshot
+
+ZERO = Decimal('0.00')
+
+# Ledger rows read per round trip when rebuilding snapshots
+SNAPSHOT_REBUILD_CHUNK_SIZE = 2000
+
+
+class LedgerError(Exception):
+    """Raised when a posting cannot be made; the message is safe to show to the user"""
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def _entry_amounts(entry):
+    """(credit, debit) of a ledger row from the point of view of its account"""
+    credit = entry.amount if entry.to_account_id == entry.account_id else ZERO
+    debit = entry.amount if entry.from_account_id == entry.account_id else ZERO
+    return credit, debit
+
+
+def balance_before(account, date):
+    """
+    Account balance at the start of `date`.
+    Read from the latest daily snapshot before that day; falls back to the last
+    ledger row for history that predates the snapshots.
+    """
+    balance = DailyBalanceSnapshot.objects.filter(
+        account=account,
+        date__lt=date,
+    ).order_by('-date').values_list('closing_balance', flat=True).first()
+    if balance is not None:
+        return balance
+
+    balance = Transaction.objects.filter(
+        account=account,
+        timestamp__lt=_start_of_day(date),
+        balance_after__isnull=False,
+    ).order_by('-timestamp', '-id').values_list('balance_after', flat=True).first()
+    return balance if balance is not None else ZERO
+
+
+def ledger_summary(account, start_date=None, end_date=None):
+    """
+    Credit/debit totals, counts and opening/closing balance for an account's ledger.
+    Totals come from a single conditional aggregate, so the cost does not grow with
+    the number of rows returned to Python; amounts stay Decimal throughout.
+    """
+    transactions = Transaction.objects.filter(account=account)
+    if start_date:
+        transactions = transactions.filter(timestamp__date__gte=start_date)
+    if end_date:
+        transactions = transactions.filter(timestamp__date__lte=end_date)
+
+    credit = Q(to_account_id=account.id)
+    debit = Q(from_account_id=account.id)
+    totals = transactions.order_by().aggregate(
+        total_credits=Sum('amount', filter=credit, default=ZERO),
+        total_debits=Sum('amount', filter=debit, default=ZERO),
+        credit_count=Count('id', filter=credit),
+        debit_count=Count('id', filter=debit),
+        transaction_count=Count('id'),
+    )
+
+    opening_balance = balance_before(account, start_date) if start_date else ZERO
+    totals['opening_balance'] = opening_balance
+    totals['closing_balance'] = opening_balance + totals['total_credits'] - totals['total_debits']
+    return totals
+
+
+def update_daily_balances(entries):
+    """
+    Fold freshly posted ledger rows into their accounts' daily snapshots.
+    Must run in the same database transaction that created the rows.
+    """
+    for entry in entries:
+        if entry.account_id is None:
+            continue
+        day = timezone.localdate(entry.timestamp)
+        credit, debit = _entry_amounts(entry)
+        if entry.balance_after is not None:
+            closing_balance = entry.balance_after
+        else:
+            closing_balance = F('closing_balance') + credit - debit
+        changes = {
+            'closing_balance': closing_balance,
+            'total_credits': F('total_credits') + credit,
+            'total_debits': F('total_debits') + debit,
+            'transaction_count': F('transaction_count') + 1,
+        }
+        snapshots = DailyBalanceSnapshot.objects.filter(account_id=entry.account_id, date=day)
+        if snapshots.update(**changes):
+            continue
+
+        # First posting of the day for this account
+        if entry.balance_after is not None:
+            opening_balance = entry.balance_after - credit + debit
+        else:
+            opening_balance = balance_before(entry.account_id, day)
+        try:
+            with db_transaction.atomic():
+                DailyBalanceSnapshot.objects.create(
+                    account_id=entry.account_id,
+                    date=day,
+                    opening_balance=opening_balance,
+                    closing_balance=opening_balance + credit - debit,
+                    total_credits=credit,
+                    total_debits=debit,
+                    transaction_count=1,
+                )
+        except IntegrityError:
+            # Another posting created the day's snapshot first
+            snapshots.update(**changes)
+
+
+def rebuild_daily_balances(account):
+    """
+    Recompute all daily snapshots of an account from its ledger.
+    Streams the ledger in chunks, so memory is bounded by the number of days.
+    Returns the number of snapshots written.
+    """
+    rows = Transaction.objects.filter(account=account).order_by('timestamp', 'id').values_list(
+        'timestamp', 'amount', 'account_id', 'to_account_id', 'from_account_id', 'balance_after'
+    )
+
+    snapshots = []
+    current = None
+    balance = ZERO
+    for timestamp, amount, account_id, to_account_id, from_account_id, balance_after in rows.iterator(
+        chunk_size=SNAPSHOT_REBUILD_CHUNK_SIZE
+    ):
+        credit = amount if to_account_id == account_id else ZERO
+        debit = amount if from_account_id == account_id else ZERO
+        day = timezone.localdate(timestamp)
+        if current is None or current.date != day:
+            opening_balance = balance_after - credit + debit if balance_after is not None else balance
+            current = DailyBalanceSnapshot(
+                account=account,
+                date=day,
+                opening_balance=opening_balance,
+                closing_balance=opening_balance,
+                total_credits=ZERO,
+                total_debits=ZERO,
+                transaction_count=0,
+            )
+            snapshots.append(current)
+        balance = balance_after if balance_after is not None else current.closing_balance + credit - debit
+        current.closing_balance = balance
+        current.total_credits += credit
+        current.total_debits += debit
+        current.transaction_count += 1
+
+    with db_transaction.atomic():
+        DailyBalanceSnapshot.objects.filter(account=account).delete()
+        DailyBalanceSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+def balance_history(account, start_date=None, end_date=None, max_points=300):
+    """
+    Closing balance over time from daily snapshots, as [(date, balance), ...].
+    Long ranges are thinned to at most `max_points` points, always keeping the last day.
+    """
+    snapshots = DailyBalanceSnapshot.objects.filter(account=account)
+    if start_date:
+        snapshots = snapshots.filter(date__gte=start_date)
+    if end_date:
+        snapshots = snapshots.filter(date__lte=end_date)
+    points = list(snapshots.order_by('date').values_list('date', 'closing_balance'))
+
+    if len(points) > max_points:
+        step = -(-len(points) // max_points)
+        points = points[len(points) - 1::-step][::-1]
+    return points
+
+
+def lock_accounts(account_ids):
+    """
+    Lock accounts with one SELECT ... FOR UPDATE in primary-key order and return
+    them by pk. Every path that locks an account together with loans, EMIs or other
+    accounts takes the account locks first, in this order, so they cannot deadlock.
+    Must be called inside a transaction.
+    """
+    return {
+        account.pk: account
+        for account in Account.objects.select_for_update().filter(
+            pk__in=sorted(set(account_ids))
+        ).order_by('pk').only('id', 'balance', 'account_holder_name')
+    }
+
+
+def _post(postings):
+    """
+    Apply balance changes and write their ledger rows atomically.
+    `postings` is a list of (account, delta, ledger_row_fields). All accounts are
+    locked with one SELECT ... FOR UPDATE in primary-key order, each balance is
+    changed with one UPDATE ... SET balance = balance + delta, and all ledger rows
+    are written with one bulk INSERT. Returns the ledger rows in posting order.
+    """
+    account_ids = sorted({account.pk for account, delta, fields in postings})
+
+    with db_transaction.atomic():
+        locked = lock_accounts(account_ids)
+
+        balances = {pk: account.balance for pk, account in locked.items()}
+        entries = []
+        for account, delta, fields in postings:
+            balances[account.pk] += delta
+            if delta < 0 and balances[account.pk] < 0:
+                raise LedgerError('Insufficient balance.')
+            entries.append(Transaction(
+                account=account,
+                amount=abs(delta),
+                status='Success',
+                balance_after=balances[account.pk],
+                **fields
+            ))
+
+        for pk in account_ids:
+            delta = balances[pk] - locked[pk].balance
+            if delta:
+                Account.objects.filter(pk=pk).update(balance=F('balance') + delta)
+        for account, delta, fields in postings:
+            account.balance = balances[account.pk]
+
+        entries = Transaction.objects.bulk_create(entries)
+        update_daily_balances(entries)
+
+    return entries
+
+
+def deposit(account, amount, description, transaction_type='Deposit'):
+    """Credit `amount` to an account from outside the bank and post its ledger row"""
+    entries = _post([
+        (account, amount, {
+            'from_account': None,
+            'to_account': account,
+            'transaction_type': transaction_type,
+            'description': description,
+        }),
+    ])
+    return entries[0]
+
+
+def deposit_many(credits, transaction_type='Deposit'):
+    """
+    Post many deposits in one go: `credits` is a list of (account, amount, description).
+    All accounts are locked and updated once and all ledger rows go out in one INSERT.
+    Returns the ledger rows in the same order.
+    """
+    return _post([
+        (account, amount, {
+            'from_account': None,
+            'to_account': account,
+            'transaction_type': transaction_type,
+            'description': description,
+        })
+        for account, amount, description in credits
+    ])
+
+
+def deposit_opening_balances(credits):
+    """
+    Post the first deposit of accounts created in the current transaction:
+    `credits` is a list of (account, amount, description). The accounts have no
+    ledger history and nobody else can see them yet, so nothing is locked and
+    balances, ledger rows and daily snapshots each go out in one bulk statement.
+    Returns the ledger rows in the same order.
+    """
+    accounts = []
+    entries = []
+    for account, amount, description in credits:
+        account.balance = amount
+        accounts.append(account)
+        entries.append(Transaction(
+            account=account,
+            from_account=None,
+            to_account=account,
+            amount=amount,
+            transaction_type='Deposit',
+            status='Success',
+            description=description,
+            balance_after=amount,
+        ))
+
+    with db_transaction.atomic():
+        Account.objects.bulk_update(accounts, ['balance'])
+        entries = Transaction.objects.bulk_create(entries)
+        DailyBalanceSnapshot.objects.bulk_create([
+            DailyBalanceSnapshot(
+                account=entry.account,
+                date=timezone.localdate(entry.timestamp),
+                opening_balance=ZERO,
+                closing_balance=entry.amount,
+                total_credits=entry.amount,
+                total_debits=ZERO,
+                transaction_count=1,
+            )
+            for entry in entries
+        ])
+    return entries
+
+
+def withdraw(account, amount, description, transaction_type='Withdrawal'):
+    """
+    Debit `amount` from an account to outside the bank and post its ledger row.
+    Raises LedgerError if the balance is insufficient.
+    """
+    entries = _post([
+        (account, -amount, {
+            'from_account': account,
+            'to_account': None,
+            'transaction_type': transaction_type,
+            'description': description,
+        }),
+    ])
+    return entries[0]
+
+
+def transfer(sender, recipient, amount, description=''):
+    """
+    Move `amount` from sender to recipient and post both ledger rows.
+    Both accounts are locked in primary-key order, so two opposite transfers
+    between the same accounts queue behind each other instead of deadlocking.
+    Returns (sender_entry, recipient_entry).
+    """
+    if sender.pk == recipient.pk:
+        raise LedgerError('You cannot transfer money to yourself.')
+
+    entries = _post([
+        # Sender's ledger row (outgoing)
+        (sender, -amount, {
+            'from_account': sender,
+            'to_account': recipient,
+            'transaction_type': 'Transfer',
+            'description': description or f'Transfer to {recipient.account_holder_name}',
+        }),
+        # Recipient's ledger row (incoming)
+        (recipient, amount, {
+            'from_account': sender,
+            'to_account': recipient,
+            'transaction_type': 'Transfer',
+            'description': description or f'Transfer from {sender.account_holder_name}',
+        }),
+    ])
+    return entries[0], entries[1]
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions.statements import claim_statement_jobs, process_statement_job
+
+
+class Command(BaseCommand):
+    help = 'Render queued PDF statements off the request path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue once and exit instead of polling')
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = list(claim_statement_jobs(options['batch_size']))
+
+            for job in jobs:
+                started = time.monotonic()
+                job = process_statement_job(job)
+                elapsed = time.monotonic() - started
+                if job.status == 'Completed':
+                    self.stdout.write(self.style.SUCCESS(f'Rendered statement job {job.id} in {elapsed:.2f}s'))
+                else:
+                    self.stderr.write(self.style.ERROR(f'Statement job {job.id} failed: {job.error}'))
+
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
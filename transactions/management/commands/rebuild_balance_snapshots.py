@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking.models import Account
+from transactions.ledger import rebuild_daily_balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily balance snapshots from the transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', dest='account_number',
+                            help='Only rebuild the account with this account number')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('id')
+        if options['account_number']:
+            accounts = accounts.filter(account_number=options['account_number'])
+            if not accounts.exists():
+                raise CommandError(f"No account found with number {options['account_number']}")
+
+        started = time.monotonic()
+        account_count = 0
+        snapshot_count = 0
+        for account in accounts.only('id').iterator():
+            snapshot_count += rebuild_daily_balances(account)
+            account_count += 1
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {snapshot_count} snapshot(s) for {account_count} account(s) in {elapsed:.2f}s'
+        ))
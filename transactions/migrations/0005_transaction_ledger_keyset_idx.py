@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_remove_account_email_verification_token_and_more'),
+        ('transactions', '0004_alter_transaction_to_account'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-timestamp', '-id'], name='txn_ledger_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_remove_account_email_verification_token_and_more'),
+        ('transactions', '0005_transaction_ledger_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(blank=True, help_text='Statement period start (null for all time)', null=True)),
+                ('end_date', models.DateField(blank=True, help_text='Statement period end (null for all time)', null=True)),
+                ('last_transaction_id', models.BigIntegerField(default=0, help_text='Latest ledger row of the account when the job was queued')),
+                ('cache_key', models.CharField(help_text='Unique key of (account, start_date, end_date, last_transaction_id)', max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', help_text='Job status', max_length=10)),
+                ('file', models.FileField(blank=True, help_text='Rendered statement PDF', upload_to='statements/')),
+                ('error', models.TextField(blank=True, help_text='Error message if rendering failed')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the job was queued')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='When rendering finished', null=True)),
+                ('account', models.ForeignKey(help_text='Account the statement is generated for', on_delete=django.db.models.deletion.CASCADE, related_name='statement_jobs', to='banking.account')),
+            ],
+            options={
+                'verbose_name': 'Statement Job',
+                'verbose_name_plural': 'Statement Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='stmt_job_queue_idx')],
+            },
+        ),
+    ]
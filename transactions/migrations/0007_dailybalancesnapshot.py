@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_remove_account_email_verification_token_and_more'),
+        ('transactions', '0006_statementjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Ledger day')),
+                ('opening_balance', models.DecimalField(decimal_places=2, help_text='Balance before the first transaction of the day', max_digits=12)),
+                ('closing_balance', models.DecimalField(decimal_places=2, help_text='Balance after the last transaction of the day', max_digits=12)),
+                ('total_credits', models.DecimalField(decimal_places=2, default=0, help_text='Sum of credits posted on the day', max_digits=14)),
+                ('total_debits', models.DecimalField(decimal_places=2, default=0, help_text='Sum of debits posted on the day', max_digits=14)),
+                ('transaction_count', models.IntegerField(default=0, help_text='Number of ledger rows posted on the day')),
+                ('account', models.ForeignKey(help_text='Account this snapshot belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='banking.account')),
+            ],
+            options={
+                'verbose_name': 'Daily Balance Snapshot',
+                'verbose_name_plural': 'Daily Balance Snapshots',
+                'ordering': ['account', '-date'],
+                'constraints': [models.UniqueConstraint(fields=('account', 'date'), name='unique_daily_balance_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_remove_account_email_verification_token_and_more'),
+        ('transactions', '0007_dailybalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Idempotency key sent by the client', max_length=64)),
+                ('endpoint', models.CharField(help_text='View that processed the request', max_length=50)),
+                ('result_message', models.TextField(blank=True, help_text='Success message shown for the original request')),
+                ('redirect_url', models.CharField(blank=True, help_text='Where the original request redirected to', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='When the key was first used')),
+                ('account', models.ForeignKey(help_text='Account that made the request', on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='banking.account')),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+                'constraints': [models.UniqueConstraint(fields=('account', 'key'), name='unique_idempotency_key_per_account')],
+            },
+        ),
+    ]
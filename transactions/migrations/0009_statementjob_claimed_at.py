@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statementjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker claimed the job for rendering', null=True),
+        ),
+    ]
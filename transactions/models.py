@@ -2,6 +2,34 @@ from django.db import models
 from banking.models import Account
 import uuid
 
+class TransactionQuerySet(models.QuerySet):
+    # Columns rendered by the history, statement, PDF and dashboard views
+    LEDGER_FIELDS = (
+        'id',
+        'transaction_id',
+        'amount',
+        'transaction_type',
+        'status',
+        'description',
+        'balance_after',
+        'timestamp',
+        'account_id',
+        'from_account__id',
+        'from_account__account_holder_name',
+        'to_account__id',
+        'to_account__account_holder_name',
+    )
+    
+    def for_ledger(self, account):
+        """
+        An account's ledger with counterparty names joined in, so rendering
+        rows never lazily fetches the related Account per transaction.
+        """
+        return self.filter(account=account).select_related(
+            'from_account', 'to_account'
+        ).only(*self.LEDGER_FIELDS)
+
+
 class Transaction(models.Model):
     """
     Transaction model for tracking all money movements
@@ -80,6 +108,8 @@ class Transaction(models.Model):
         help_text="Transaction timestamp"
     )
     
+    objects = TransactionQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.transaction_type} - {self.amount} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
     
@@ -87,3 +117,185 @@ class Transaction(models.Model):
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
         ordering = ['-timestamp']
+        indexes = [
+            # Backs keyset pagination of an account's ledger (newest first)
+            models.Index(fields=['account', '-timestamp', '-id'], name='txn_ledger_keyset_idx'),
+        ]
+
+
+class StatementJob(models.Model):
+    """
+    Queued PDF statement render, cached by account, period and ledger position.
+    A job stays valid until a newer ledger row is posted to the account.
+    """
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Processing', 'Processing'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+    
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='statement_jobs',
+        help_text="Account the statement is generated for"
+    )
+    start_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Statement period start (null for all time)"
+    )
+    end_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Statement period end (null for all time)"
+    )
+    last_transaction_id = models.BigIntegerField(
+        default=0,
+        help_text="Latest ledger row of the account when the job was queued"
+    )
+    cache_key = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="Unique key of (account, start_date, end_date, last_transaction_id)"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='Pending',
+        help_text="Job status"
+    )
+    file = models.FileField(
+        upload_to='statements/',
+        blank=True,
+        help_text="Rendered statement PDF"
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Error message if rendering failed"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="When the job was queued"
+    )
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a worker claimed the job for rendering"
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When rendering finished"
+    )
+    
+    def __str__(self):
+        return f"Statement {self.account.account_number} ({self.start_date} - {self.end_date}) - {self.status}"
+    
+    class Meta:
+        verbose_name = 'Statement Job'
+        verbose_name_plural = 'Statement Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='stmt_job_queue_idx'),
+        ]
+
+
+class DailyBalanceSnapshot(models.Model):
+    """
+    Per-account, per-day balance rollup of the ledger.
+    Maintained incrementally when ledger rows are posted and rebuildable
+    with the rebuild_balance_snapshots management command.
+    """
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='balance_snapshots',
+        help_text="Account this snapshot belongs to"
+    )
+    date = models.DateField(
+        help_text="Ledger day"
+    )
+    opening_balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Balance before the first transaction of the day"
+    )
+    closing_balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Balance after the last transaction of the day"
+    )
+    total_credits = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Sum of credits posted on the day"
+    )
+    total_debits = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Sum of debits posted on the day"
+    )
+    transaction_count = models.IntegerField(
+        default=0,
+        help_text="Number of ledger rows posted on the day"
+    )
+    
+    def __str__(self):
+        return f"{self.account.account_number} - {self.date} - {self.closing_balance}"
+    
+    class Meta:
+        verbose_name = 'Daily Balance Snapshot'
+        verbose_name_plural = 'Daily Balance Snapshots'
+        ordering = ['account', '-date']
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date'], name='unique_daily_balance_snapshot'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Client-supplied key recording that a money-moving request has been processed.
+    A replay with the same key gets the stored result instead of a new posting.
+    """
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        help_text="Account that made the request"
+    )
+    key = models.CharField(
+        max_length=64,
+        help_text="Idempotency key sent by the client"
+    )
+    endpoint = models.CharField(
+        max_length=50,
+        help_text="View that processed the request"
+    )
+    result_message = models.TextField(
+        blank=True,
+        help_text="Success message shown for the original request"
+    )
+    redirect_url = models.CharField(
+        max_length=200,
+        blank=True,
+        help_text="Where the original request redirected to"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="When the key was first used"
+    )
+    
+    def __str__(self):
+        return f"{self.endpoint} - {self.key}"
+    
+    class Meta:
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'key'], name='unique_idempotency_key_per_account'),
+        ]
@@ -0,0 +1,96 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated ledger.
+    Cursors point at the first/last row of the page and are safe to put in a URL.
+    """
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(txn):
+    """Encode a transaction's (timestamp, id) position as an opaque URL token"""
+    raw = f'{txn.timestamp.isoformat()}|{txn.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (timestamp, id); returns None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_ledger(queryset, after=None, before=None, per_page=25):
+    """
+    Keyset pagination over a ledger ordered newest first by (timestamp, id).
+    Each page is a single index range scan, so latency does not depend on depth.
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key:
+        timestamp, pk = before_key
+        rows = list(
+            queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+            .order_by('timestamp', 'id')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page]
+        rows.reverse()
+        # Older rows exist if the cursor row, or anything before it, still matches the filters
+        has_next = queryset.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lte=pk)
+        ).exists()
+        return KeysetPage(rows, has_next=has_next, has_previous=has_previous)
+
+    if after_key:
+        timestamp, pk = after_key
+        queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    rows = list(queryset.order_by('-timestamp', '-id')[:per_page + 1])
+    has_next = len(rows) > per_page
+    return KeysetPage(rows[:per_page], has_next=has_next, has_previous=after_key is not None)
+
+
+def bounded_count(queryset, cap=1000):
+    """
+    Count rows up to `cap` without a full COUNT(*) over the ledger.
+    Returns (count, capped) where capped means there are more than `cap` rows.
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
@@ -0,0 +1,384 @@
+import tempfile
+from datetime import datetime, timedelta
+
+from django.core.files import File
+from django.db import DatabaseError, transaction as db_transaction
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from .models import Transaction, StatementJob
+from .ledger import ledger_summary
+
+# Rows fetched from the database per round trip while rendering
+STATEMENT_CHUNK_SIZE = 500
+
+# Transaction rows per table flowable (roughly one A4 page)
+ROWS_PER_TABLE = 20
+
+# Rendered statements larger than this are spooled to disk instead of memory
+STATEMENT_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+# A job still Processing this long after it was claimed is assumed to have lost its worker
+STATEMENT_CLAIM_TIMEOUT = timedelta(minutes=15)
+
+TRANSACTION_COL_WIDTHS = [1.2*inch, 2.2*inch, 1*inch, 1*inch, 1.1*inch]
+
+TRANSACTION_TABLE_STYLE = TableStyle([
+    # Header styling
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0F766E')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('TOPPADDING', (0, 0), (-1, 0), 10),
+
+    # Body styling
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (0, 1), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 8),
+
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+
+    # Alternating row colors
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9FAFB')]),
+])
+
+TRANSACTION_TABLE_HEADER = ['Date', 'Description', 'Debit', 'Credit', 'Balance']
+
+
+class LazyFlowables(list):
+    """
+    Flowable list that pulls from a generator as ReportLab consumes it.
+    SimpleDocTemplate.build() pops flowables off the front of the list, so
+    only a small lookahead window is ever held in memory.
+    """
+    def __init__(self, source, lookahead=4):
+        super().__init__()
+        self._source = iter(source)
+        self._lookahead = lookahead
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+def statement_queryset(account, start_date=None, end_date=None):
+    """Ledger rows for a statement period, oldest first"""
+    transactions = Transaction.objects.for_ledger(account).order_by('timestamp', 'id')
+    if start_date:
+        transactions = transactions.filter(timestamp__date__gte=start_date)
+    if end_date:
+        transactions = transactions.filter(timestamp__date__lte=end_date)
+    return transactions
+
+
+def statement_period_text(start_date=None, end_date=None):
+    if start_date and end_date:
+        return f"{start_date.strftime('%d %b, %Y')} to {end_date.strftime('%d %b, %Y')}"
+    elif start_date:
+        return f"From {start_date.strftime('%d %b, %Y')}"
+    elif end_date:
+        return f"Till {end_date.strftime('%d %b, %Y')}"
+    return 'All Time'
+
+
+def _transaction_row(txn, account):
+    date_str = txn.timestamp.strftime('%d %b, %Y\n%I:%M %p')
+
+    # Determine description
+    if txn.transaction_type == 'Deposit':
+        desc = 'Money Added'
+    elif txn.to_account_id == account.id:
+        desc = f'From {txn.from_account.account_holder_name}' if txn.from_account else 'Credit'
+    else:
+        desc = f'To {txn.to_account.account_holder_name}' if txn.to_account else 'Debit'
+
+    if txn.description:
+        desc += f'\n{txn.description[:30]}...' if len(txn.description) > 30 else f'\n{txn.description}'
+
+    # Determine debit/credit
+    if txn.to_account_id != account.id and txn.transaction_type != 'Deposit':
+        debit = f'₹{float(txn.amount):.2f}'
+        credit = '-'
+    else:
+        debit = '-'
+        credit = f'₹{float(txn.amount):.2f}'
+
+    balance = f'₹{float(txn.balance_after):.2f}' if txn.balance_after else '-'
+
+    return [date_str, desc, debit, credit, balance]
+
+
+def _transaction_tables(transactions, account):
+    """Yield one small table per page worth of rows, reading the ledger in chunks"""
+    rows = [TRANSACTION_TABLE_HEADER]
+    for txn in transactions.iterator(chunk_size=STATEMENT_CHUNK_SIZE):
+        rows.append(_transaction_row(txn, account))
+        if len(rows) > ROWS_PER_TABLE:
+            yield _transaction_table(rows)
+            rows = [TRANSACTION_TABLE_HEADER]
+    if len(rows) > 1:
+        yield _transaction_table(rows)
+
+
+def _transaction_table(rows):
+    table = Table(rows, colWidths=TRANSACTION_COL_WIDTHS, repeatRows=1)
+    table.setStyle(TRANSACTION_TABLE_STYLE)
+    return table
+
+
+def _statement_flowables(account, transactions, start_date, end_date):
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#0F766E'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#0F766E'),
+        spaceAfter=12,
+        fontName='Helvetica-Bold'
+    )
+
+    normal_style = styles['Normal']
+
+    # Add bank logo/name
+    yield Paragraph('<b>ASTRALFIN</b> Digi-Banking', title_style)
+    yield Spacer(1, 12)
+
+    # Add statement title
+    yield Paragraph('Account Statement', heading_style)
+    yield Spacer(1, 20)
+
+    # Account Information
+    account_info_data = [
+        ['Account Holder:', account.account_holder_name],
+        ['Account Number:', account.account_number],
+        ['IFSC Code:', account.ifsc_code],
+        ['Customer ID:', account.customer_id],
+        ['Statement Date:', datetime.now().strftime('%d %B, %Y')],
+        ['Period:', statement_period_text(start_date, end_date)],
+    ]
+
+    account_info_table = Table(account_info_data, colWidths=[2*inch, 4*inch])
+    account_info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E0F2F1')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+
+    yield account_info_table
+    yield Spacer(1, 20)
+
+    # Summary Section
+    yield Paragraph('Summary', heading_style)
+    yield Spacer(1, 10)
+
+    summary = ledger_summary(account, start_date, end_date)
+    summary_data = [
+        ['Opening Balance', f'₹{summary["opening_balance"]:.2f}'],
+        ['Total Credits', f'₹{summary["total_credits"]:.2f}'],
+        ['Total Debits', f'₹{summary["total_debits"]:.2f}'],
+        ['Closing Balance', f'₹{summary["closing_balance"]:.2f}'],
+        ['Current Balance', f'₹{account.balance:.2f}'],
+        ['Total Transactions', str(summary['transaction_count'])],
+    ]
+
+    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F0FDFA')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+
+    yield summary_table
+    yield Spacer(1, 20)
+
+    # Transaction Details
+    if summary['transaction_count']:
+        yield Paragraph('Transaction Details', heading_style)
+        yield Spacer(1, 10)
+        yield from _transaction_tables(transactions, account)
+    else:
+        yield Paragraph('<i>No transactions found for the selected period.</i>', normal_style)
+
+    yield Spacer(1, 30)
+
+    # Footer
+    yield Paragraph(
+        '<i>This is a computer-generated statement and does not require a signature.<br/>'
+        'For any queries, please contact ASTRALFIN support.</i>',
+        ParagraphStyle('Footer', parent=normal_style, fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
+    )
+
+
+def render_statement_pdf(account, output, start_date=None, end_date=None):
+    """
+    Render an account statement PDF into the file-like `output`.
+    Ledger rows are streamed from the database in chunks and laid out as
+    per-page tables, so memory stays flat in the number of transactions.
+    """
+    transactions = statement_queryset(account, start_date, end_date)
+
+    doc = SimpleDocTemplate(output, pagesize=A4,
+                            rightMargin=30, leftMargin=30,
+                            topMargin=30, bottomMargin=30,
+                            pageCompression=1)
+
+    doc.build(LazyFlowables(_statement_flowables(account, transactions, start_date, end_date)))
+    return output
+
+
+def latest_ledger_id(account):
+    """Id of the newest ledger row of an account (0 if none), served by the ledger index"""
+    latest = Transaction.objects.filter(account=account).order_by('-timestamp', '-id').values_list('id', flat=True).first()
+    return latest or 0
+
+
+def statement_cache_key(account, start_date, end_date, last_transaction_id):
+    start = start_date.isoformat() if start_date else '-'
+    end = end_date.isoformat() if end_date else '-'
+    return f'{account.id}:{start}:{end}:{last_transaction_id}'
+
+
+def request_statement(account, start_date=None, end_date=None):
+    """
+    Return the statement job for this account and period, queueing a new one
+    if none exists for the current ledger position. Failed jobs, jobs whose
+    file has gone missing and jobs whose worker died while rendering them are
+    re-queued.
+    """
+    last_transaction_id = latest_ledger_id(account)
+    job, created = StatementJob.objects.get_or_create(
+        cache_key=statement_cache_key(account, start_date, end_date, last_transaction_id),
+        defaults={
+            'account': account,
+            'start_date': start_date,
+            'end_date': end_date,
+            'last_transaction_id': last_transaction_id,
+        }
+    )
+    file_missing = job.status == 'Completed' and not (job.file and job.file.storage.exists(job.file.name))
+    abandoned = job.status == 'Processing' and (
+        job.claimed_at is None or job.claimed_at < timezone.now() - STATEMENT_CLAIM_TIMEOUT
+    )
+    if job.status == 'Failed' or file_missing or abandoned:
+        # Matching on status and claimed_at leaves a job alone if a worker claimed it meanwhile
+        StatementJob.objects.filter(id=job.id, status=job.status, claimed_at=job.claimed_at).update(
+            status='Pending', error='', claimed_at=None
+        )
+        job.status = 'Pending'
+        job.claimed_at = None
+    return job
+
+
+def claim_statement_jobs(limit=10):
+    """
+    Claim up to `limit` pending jobs for this worker.
+    Rows locked by another worker are skipped, so several workers can share the queue.
+    """
+    with db_transaction.atomic():
+        job_ids = list(
+            StatementJob.objects.select_for_update(skip_locked=True)
+            .filter(status='Pending')
+            .order_by('created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        StatementJob.objects.filter(id__in=job_ids).update(status='Processing', claimed_at=timezone.now())
+    return StatementJob.objects.filter(id__in=job_ids).select_related('account').order_by('created_at')
+
+
+def _save_job(job, fields):
+    """
+    Save the result of a job; returns False if its row no longer exists
+    (e.g. the account was deleted while the job was rendering)
+    """
+    try:
+        job.save(update_fields=fields)
+    except DatabaseError:
+        return False
+    return True
+
+
+def process_statement_job(job):
+    """Render a claimed job to its file and drop superseded renders of the same period"""
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=STATEMENT_SPOOL_MAX_SIZE) as output:
+            render_statement_pdf(job.account, output, job.start_date, job.end_date)
+            output.seek(0)
+            job.file.save(f'statement_{job.account.account_number}_{job.id}.pdf', File(output), save=False)
+    except Exception as exc:
+        job.status = 'Failed'
+        job.error = str(exc)
+        _save_job(job, ['status', 'error'])
+        return job
+
+    job.status = 'Completed'
+    job.completed_at = timezone.now()
+    if not _save_job(job, ['file', 'status', 'completed_at']):
+        # Nothing points at the rendered file any more
+        job.file.delete(save=False)
+        job.status = 'Failed'
+        job.error = 'Job was deleted while rendering'
+        return job
+
+    # Older finished renders of the same period are stale now that a newer one
+    # exists; jobs still queued or rendering are left to finish
+    stale_jobs = StatementJob.objects.filter(
+        account=job.account,
+        start_date=job.start_date,
+        end_date=job.end_date,
+        last_transaction_id__lt=job.last_transaction_id,
+        status__in=('Completed', 'Failed'),
+    )
+    for stale_job in stale_jobs:
+        if stale_job.file:
+            stale_job.file.delete(save=False)
+    stale_jobs.delete()
+    return job
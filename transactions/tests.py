@@ -1,3 +1,428 @@
-from django.test import TestCase
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from banking.models import Account
+from .ledger import (
+    balance_before, balance_history, deposit, ledger_summary, rebuild_daily_balances, transfer,
+    update_daily_balances, withdraw, LedgerError,
+)
+from .models import Transaction, IdempotencyKey, StatementJob, DailyBalanceSnapshot
+from .pagination import paginate_ledger, encode_cursor
+from .statements import (
+    render_statement_pdf, request_statement, claim_statement_jobs, process_statement_job, STATEMENT_CLAIM_TIMEOUT,
+)
+
+User = get_user_model()
+
+
+class LedgerQueryCountTests(TestCase):
+    """
+    Ledger pages must issue the same number of queries however many rows they render
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pass12345')
+        self.account = Account.objects.create(
+            user=self.user, account_holder_name='Alice', phone_number='9000000001'
+        )
+        other_user = User.objects.create_user(username='bob', password='pass12345')
+        self.other_account = Account.objects.create(
+            user=other_user, account_holder_name='Bob', phone_number='9000000002'
+        )
+        self.client.force_login(self.user)
+
+    def _add_transfers(self, count):
+        """Add `count` incoming and `count` outgoing transfers to the ledger"""
+        rows = []
+        for i in range(count):
+            rows.append(Transaction(
+                from_account=self.other_account, to_account=self.account, amount=10,
+                transaction_type='Transfer', description=f'In {i}', balance_after=10,
+                account=self.account,
+            ))
+            rows.append(Transaction(
+                from_account=self.account, to_account=self.other_account, amount=5,
+                transaction_type='Transfer', description=f'Out {i}', balance_after=5,
+                account=self.account,
+            ))
+        Transaction.objects.bulk_create(rows)
+
+    def _count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def _assert_constant_queries(self, func):
+        self._add_transfers(3)
+        baseline = self._count_queries(func)
+        self._add_transfers(30)
+        self.assertEqual(self._count_queries(func), baseline)
+
+    def test_transaction_history_queries_constant(self):
+        url = reverse('transactions:transaction_history')
+        self._assert_constant_queries(lambda: self.client.get(url))
+
+    def test_statement_queries_constant(self):
+        url = reverse('transactions:statement')
+        self._assert_constant_queries(lambda: self.client.get(url))
+
+    def test_dashboard_queries_constant(self):
+        url = reverse('core:dashboard')
+        self._assert_constant_queries(lambda: self.client.get(url))
+
+    def test_statement_pdf_queries_constant(self):
+        self._assert_constant_queries(lambda: render_statement_pdf(self.account, BytesIO()))
+
+
+def _create_account(username, phone_number, balance=0):
+    user = User.objects.create_user(username=username, password='pass12345')
+    return Account.objects.create(
+        user=user, account_holder_name=username.title(), phone_number=phone_number, balance=balance
+    )
+
+
+class TransferServiceTests(TestCase):
+    def setUp(self):
+        self.sender = _create_account('alice', '9000000001', balance=Decimal('100.00'))
+        self.recipient = _create_account('bob', '9000000002')
+
+    def test_transfer_moves_balance_and_posts_both_rows(self):
+        sender_entry, recipient_entry = transfer(self.sender, self.recipient, Decimal('30.00'))
+
+        self.sender.refresh_from_db()
+        self.recipient.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('70.00'))
+        self.assertEqual(self.recipient.balance, Decimal('30.00'))
+        self.assertEqual(sender_entry.account_id, self.sender.id)
+        self.assertEqual(sender_entry.balance_after, Decimal('70.00'))
+        self.assertEqual(recipient_entry.account_id, self.recipient.id)
+        self.assertEqual(recipient_entry.balance_after, Decimal('30.00'))
+
+    def test_insufficient_balance_is_rejected(self):
+        with self.assertRaises(LedgerError):
+            transfer(self.sender, self.recipient, Decimal('100.01'))
+
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_transfer_to_self_is_rejected(self):
+        with self.assertRaises(LedgerError):
+            transfer(self.sender, self.sender, Decimal('1.00'))
+
+
+class IdempotencyKeyTests(TestCase):
+    """
+    Replaying a request with the same idempotency key must not post it again
+    """
+    def setUp(self):
+        self.sender = _create_account('alice', '9000000001', balance=Decimal('100.00'))
+        self.recipient = _create_account('bob', '9000000002')
+        self.client.force_login(self.sender.user)
+
+    def test_replayed_deposit_posts_once(self):
+        url = reverse('transactions:add_money')
+        data = {'amount': '25.00', 'description': 'Top up', 'idempotency_key': 'deposit-1'}
+        first = self.client.post(url, data)
+        second = self.client.post(url, data)
+
+        self.assertEqual(second.url, first.url)
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('125.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_replayed_transfer_posts_once(self):
+        url = reverse('transactions:transfer_money')
+        data = {
+            'transfer_method': 'account',
+            'account_number': self.recipient.account_number,
+            'ifsc_code': self.recipient.ifsc_code,
+            'amount': '30.00',
+            'idempotency_key': 'transfer-1',
+        }
+        self.client.post(url, data)
+        self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='transfer-1')
+
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('70.00'))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_key_reused_on_another_endpoint_is_rejected(self):
+        self.client.post(
+            reverse('transactions:add_money'), {'amount': '25.00', 'idempotency_key': 'shared-1'}
+        )
+        response = self.client.post(reverse('transactions:transfer_money'), {
+            'transfer_method': 'account',
+            'account_number': self.recipient.account_number,
+            'ifsc_code': self.recipient.ifsc_code,
+            'amount': '30.00',
+            'idempotency_key': 'shared-1',
+        })
+
+        self.assertEqual(response.status_code, 422)
+        self.sender.refresh_from_db()
+        self.assertEqual(self.sender.balance, Decimal('125.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_posting_releases_key(self):
+        url = reverse('transactions:transfer_money')
+        data = {
+            'transfer_method': 'account',
+            'account_number': self.recipient.account_number,
+            'ifsc_code': self.recipient.ifsc_code,
+            'amount': '500.00',
+            'idempotency_key': 'transfer-2',
+        }
+        self.client.post(url, data)
+
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertFalse(Transaction.objects.exists())
+
+
+class LedgerSummaryTests(TestCase):
+    """
+    Ledger summaries total a date range and carry the balance in from before it
+    """
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001')
+        self.other = _create_account('bob', '9000000002', balance=Decimal('100.00'))
+        self.today = timezone.localdate()
+        # (days ago, posting): deposit 100, withdraw 30, receive 20, withdraw 10
+        postings = [
+            (3, lambda: deposit(self.account, Decimal('100.00'), 'Salary')),
+            (2, lambda: withdraw(self.account, Decimal('30.00'), 'Rent')),
+            (1, lambda: transfer(self.other, self.account, Decimal('20.00'))[1]),
+            (0, lambda: withdraw(self.account, Decimal('10.00'), 'Coffee')),
+        ]
+        for days_ago, post in postings:
+            entry = post()
+            Transaction.objects.filter(pk=entry.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+        rebuild_daily_balances(self.account)
+
+    def test_summary_of_a_date_range(self):
+        summary = ledger_summary(
+            self.account, self.today - timedelta(days=2), self.today - timedelta(days=1)
+        )
+
+        self.assertEqual(summary['total_credits'], Decimal('20.00'))
+        self.assertEqual(summary['total_debits'], Decimal('30.00'))
+        self.assertEqual((summary['credit_count'], summary['debit_count'], summary['transaction_count']), (1, 1, 2))
+        self.assertEqual(summary['opening_balance'], Decimal('100.00'))
+        self.assertEqual(summary['closing_balance'], Decimal('90.00'))
+
+    def test_summary_of_whole_ledger(self):
+        summary = ledger_summary(self.account)
+
+        self.assertEqual(summary['transaction_count'], 4)
+        self.assertEqual(summary['opening_balance'], 0)
+        self.assertEqual(summary['closing_balance'], Decimal('80.00'))
+
+
+class DailyBalanceSnapshotTests(TestCase):
+    """
+    Snapshots kept up by postings match a rebuild from the ledger
+    """
+    SNAPSHOT_FIELDS = (
+        'date', 'opening_balance', 'closing_balance', 'total_credits', 'total_debits', 'transaction_count'
+    )
+
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001')
+        self.today = timezone.localdate()
+
+    def _post_on(self, days_ago, amount, credit=True, balance_after=None):
+        """Post a ledger row dated `days_ago` days back and fold it into the snapshots"""
+        entry = Transaction.objects.create(
+            from_account=None if credit else self.account, to_account=self.account if credit else None,
+            amount=amount, transaction_type='Deposit' if credit else 'Withdrawal', description='Test',
+            balance_after=balance_after, account=self.account,
+        )
+        Transaction.objects.filter(pk=entry.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+        entry.refresh_from_db()
+        update_daily_balances([entry])
+
+    def _snapshots(self):
+        return list(DailyBalanceSnapshot.objects.filter(account=self.account).order_by('date').values_list(
+            *self.SNAPSHOT_FIELDS
+        ))
+
+    def test_incremental_snapshots_match_rebuild(self):
+        self._post_on(5, Decimal('100.00'), balance_after=Decimal('100.00'))
+        self._post_on(3, Decimal('40.00'), credit=False, balance_after=Decimal('60.00'))
+        self._post_on(3, Decimal('15.00'), balance_after=Decimal('75.00'))
+        # A legacy row without balance_after is carried forward from the snapshot
+        self._post_on(1, Decimal('5.00'), credit=False)
+        incremental = self._snapshots()
+
+        rebuild_daily_balances(self.account)
+
+        self.assertEqual(len(incremental), 3)
+        self.assertEqual(self._snapshots(), incremental)
+        self.assertEqual(incremental[-1][1:], (Decimal('75.00'), Decimal('70.00'), 0, Decimal('5.00'), 1))
+
+    def test_balance_before_falls_back_to_ledger(self):
+        self._post_on(4, Decimal('100.00'), balance_after=Decimal('100.00'))
+        self._post_on(2, Decimal('30.00'), credit=False, balance_after=Decimal('70.00'))
+        DailyBalanceSnapshot.objects.all().delete()
+
+        self.assertEqual(balance_before(self.account, self.today - timedelta(days=3)), Decimal('100.00'))
+        self.assertEqual(balance_before(self.account, self.today), Decimal('70.00'))
+        self.assertEqual(balance_before(self.account, self.today - timedelta(days=10)), 0)
+
+    def test_balance_history_thinning_keeps_last_day(self):
+        DailyBalanceSnapshot.objects.bulk_create([
+            DailyBalanceSnapshot(
+                account=self.account, date=self.today - timedelta(days=days_ago),
+                opening_balance=0, closing_balance=Decimal(days_ago), total_credits=0, total_debits=0,
+                transaction_count=1,
+            )
+            for days_ago in range(10)
+        ])
+
+        points = balance_history(self.account, max_points=3)
+
+        self.assertLessEqual(len(points), 3)
+        self.assertEqual(points[-1], (self.today, Decimal('0.00')))
+        self.assertEqual(points, sorted(points))
+        self.assertEqual(len(balance_history(self.account)), 10)
+
+
+class LedgerPaginationTests(TestCase):
+    """
+    Keyset pages only offer a next or previous page when one exists
+    """
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001')
+        Transaction.objects.bulk_create([
+            Transaction(
+                from_account=None, to_account=self.account, amount=10, transaction_type=transaction_type,
+                description=f'Row {i}', balance_after=10, account=self.account,
+            )
+            for i, transaction_type in enumerate(['Withdrawal', 'Deposit', 'Deposit', 'Deposit'])
+        ])
+        self.ledger = Transaction.objects.filter(account=self.account)
+        self.oldest = self.ledger.order_by('timestamp', 'id').first()
+
+    def test_previous_page_has_next_when_older_rows_exist(self):
+        page = paginate_ledger(self.ledger, before=encode_cursor(self.oldest), per_page=2)
+
+        self.assertEqual(len(page), 2)
+        self.assertTrue(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_previous_page_has_no_next_when_cursor_row_is_filtered_out(self):
+        deposits = self.ledger.filter(transaction_type='Deposit')
+
+        page = paginate_ledger(deposits, before=encode_cursor(self.oldest), per_page=3)
+
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_previous)
+        self.assertFalse(page.has_next)
+        self.assertIsNone(page.next_cursor)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class StatementJobTests(TestCase):
+    """
+    Statement jobs survive dead workers and never lose or orphan a render
+    """
+    def setUp(self):
+        self.account = _create_account('alice', '9000000001')
+
+    def test_abandoned_job_is_requeued(self):
+        job = request_statement(self.account)
+        claim_statement_jobs()
+        self.assertEqual(request_statement(self.account).status, 'Processing')
+
+        StatementJob.objects.filter(pk=job.pk).update(
+            claimed_at=timezone.now() - STATEMENT_CLAIM_TIMEOUT - timedelta(minutes=1)
+        )
+
+        self.assertEqual(request_statement(self.account).status, 'Pending')
+        self.assertEqual([claimed.pk for claimed in claim_statement_jobs()], [job.pk])
+
+    def test_newer_render_keeps_jobs_still_rendering(self):
+        older = request_statement(self.account)
+        StatementJob.objects.filter(pk=older.pk).update(status='Processing', claimed_at=timezone.now())
+        newer = StatementJob.objects.create(
+            account=self.account, cache_key='newer', last_transaction_id=older.last_transaction_id + 1,
+            status='Processing', claimed_at=timezone.now(),
+        )
+
+        process_statement_job(newer)
+
+        self.assertTrue(StatementJob.objects.filter(pk=older.pk).exists())
+
+    def test_job_deleted_while_rendering_removes_its_file(self):
+        request_statement(self.account)
+        job = list(claim_statement_jobs())[0]
+        StatementJob.objects.filter(pk=job.pk).delete()
+
+        job = process_statement_job(job)
+
+        self.assertEqual(job.status, 'Failed')
+        directories, files = job.file.storage.listdir('statements')
+        self.assertFalse([name for name in files if name.endswith(f'_{job.id}.pdf')])
+
+
+@unittest.skipUnless(connection.features.has_select_for_update, 'Requires row-level locking')
+class TransferConcurrencyTests(TransactionTestCase):
+    """
+    Parallel transfers in both directions must neither lose updates nor deadlock
+    """
+    THREADS = 8
+    TRANSFERS_PER_THREAD = 25
+
+    def setUp(self):
+        self.alice = _create_account('alice', '9000000001', balance=Decimal('1000.00'))
+        self.bob = _create_account('bob', '9000000002', balance=Decimal('1000.00'))
+
+    def _run_transfers(self, pairs):
+        errors = []
+
+        def worker(sender_id, recipient_id):
+            try:
+                sender = Account.objects.get(pk=sender_id)
+                recipient = Account.objects.get(pk=recipient_id)
+                for _ in range(self.TRANSFERS_PER_THREAD):
+                    transfer(sender, recipient, Decimal('1.00'))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=pair) for pair in pairs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_one_way_transfers_lose_no_updates(self):
+        self._run_transfers([(self.alice.id, self.bob.id)] * self.THREADS)
+
+        total = self.THREADS * self.TRANSFERS_PER_THREAD
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal('1000.00') - total)
+        self.assertEqual(self.bob.balance, Decimal('1000.00') + total)
+        self.assertEqual(Transaction.objects.count(), total * 2)
+
+    def test_parallel_opposite_transfers_do_not_deadlock(self):
+        pairs = [(self.alice.id, self.bob.id), (self.bob.id, self.alice.id)] * (self.THREADS // 2)
+        self._run_transfers(pairs)
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal('1000.00'))
+        self.assertEqual(self.bob.balance, Decimal('1000.00'))
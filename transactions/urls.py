@@ -9,5 +9,6 @@ urlpatterns = [
     path('history/', views.transaction_history, name='transaction_history'),
     path('statement/', views.statement, name='statement'),
     path('statement/download-pdf/', views.generate_statement_pdf, name='download_statement_pdf'),
+    path('balance-history/', views.balance_history, name='balance_history'),
 ]
 
@@ -1,17 +1,25 @@
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator
 from decimal import Decimal
 from .models import Transaction
+from .pagination import paginate_ledger, bounded_count
+from .idempotency import (
+    new_idempotency_key, get_idempotency_key, claim_idempotency_key,
+    complete_idempotency_key, replay_idempotent_response,
+)
+from .ledger import ledger_summary, balance_history as get_balance_history, deposit, transfer, LedgerError
 from .forms import AddMoneyForm, TransferByMobileForm, TransferByAccountForm, StatementFilterForm
 from banking.models import Account
 
 User = get_user_model()
 
+TRANSACTIONS_PER_PAGE = 25
+
 @login_required
 def add_money(request):
     # Check if user has an account
@@ -25,29 +33,31 @@ def add_money(request):
             amount = form.cleaned_data['amount']
             description = form.cleaned_data.get('description', 'Self deposit')
             
-            # Create transaction and update balance
+            idempotency_key = get_idempotency_key(request)
+            result_message = f'₹{amount} has been added to your account successfully!'
+            
             with transaction.atomic():
-                user_account = request.user.account
-                user_account.balance += amount
-                user_account.save()
+                # A retried or double-submitted request replays the original result
+                if idempotency_key:
+                    record, created = claim_idempotency_key(request.user.account, idempotency_key, 'add_money')
+                    if not created:
+                        return replay_idempotent_response(request, record, 'add_money')
                 
-                Transaction.objects.create(
-                    from_account=None,  # No source for deposits
-                    to_account=user_account,
-                    amount=amount,
-                    transaction_type='Deposit',
-                    status='Success',
-                    description=description or 'Self deposit',
-                    balance_after=user_account.balance,
-                    account=user_account
-                )
+                # Credit the account and post the ledger row
+                deposit(request.user.account, amount, description or 'Self deposit')
+                
+                if idempotency_key:
+                    complete_idempotency_key(record, result_message, reverse('banking:view_balance'))
             
-            messages.success(request, f'₹{amount} has been added to your account successfully!')
+            messages.success(request, result_message)
             return redirect('banking:view_balance')
     else:
         form = AddMoneyForm()
     
-    return render(request, 'transactions/add_money.html', {'form': form})
+    return render(request, 'transactions/add_money.html', {
+        'form': form,
+        'idempotency_key': new_idempotency_key(),
+    })
 
 
 @login_required
@@ -62,6 +72,7 @@ def transfer_money(request):
     
     if request.method == 'POST':
         transfer_method = request.POST.get('transfer_method')
+        recipient_account = None
         
         if transfer_method == 'mobile':
             mobile_form = TransferByMobileForm(request.POST)
@@ -77,60 +88,9 @@ def transfer_money(request):
                     messages.error(request, 'No account found with this phone number.')
                     return render(request, 'transactions/transfer_money.html', {
                         'mobile_form': mobile_form,
-                        'account_form': account_form
-                    })
-                
-                # Check if user is trying to transfer to themselves
-                if recipient_account == request.user.account:
-                    messages.error(request, 'You cannot transfer money to yourself.')
-                    return render(request, 'transactions/transfer_money.html', {
-                        'mobile_form': mobile_form,
-                        'account_form': account_form
-                    })
-                
-                # Check if user has sufficient balance
-                if request.user.account.balance < amount:
-                    messages.error(request, 'Insufficient balance.')
-                    return render(request, 'transactions/transfer_money.html', {
-                        'mobile_form': mobile_form,
-                        'account_form': account_form
+                        'account_form': account_form,
+                        'idempotency_key': new_idempotency_key(),
                     })
-                
-                # Process transfer
-                with transaction.atomic():
-                    sender_account = request.user.account
-                    sender_account.balance -= amount
-                    sender_account.save()
-                    
-                    recipient_account.balance += amount
-                    recipient_account.save()
-                    
-                    # Create transaction record for sender (outgoing)
-                    Transaction.objects.create(
-                        from_account=sender_account,
-                        to_account=recipient_account,
-                        amount=amount,
-                        transaction_type='Transfer',
-                        status='Success',
-                        description=description or f'Transfer to {recipient_account.account_holder_name}',
-                        balance_after=sender_account.balance,
-                        account=sender_account
-                    )
-                    
-                    # Create transaction record for recipient (incoming)
-                    Transaction.objects.create(
-                        from_account=sender_account,
-                        to_account=recipient_account,
-                        amount=amount,
-                        transaction_type='Transfer',
-                        status='Success',
-                        description=description or f'Transfer from {sender_account.account_holder_name}',
-                        balance_after=recipient_account.balance,
-                        account=recipient_account
-                    )
-                
-                messages.success(request, f'₹{amount} transferred successfully to {recipient_account.account_holder_name}!')
-                return redirect('transactions:transaction_history')
         
         elif transfer_method == 'account':
             account_form = TransferByAccountForm(request.POST)
@@ -145,62 +105,40 @@ def transfer_money(request):
                     account_number=account_number,
                     ifsc_code=ifsc_code
                 )
+        
+        if recipient_account is not None:
+            idempotency_key = get_idempotency_key(request)
+            result_message = f'₹{amount} transferred successfully to {recipient_account.account_holder_name}!'
+            
+            with transaction.atomic():
+                # A retried or double-submitted request replays the original result
+                if idempotency_key:
+                    record, created = claim_idempotency_key(request.user.account, idempotency_key, 'transfer_money')
+                    if not created:
+                        return replay_idempotent_response(request, record, 'transfer_money')
                 
-                # Check if user is trying to transfer to themselves
-                if recipient_account == request.user.account:
-                    messages.error(request, 'You cannot transfer money to yourself.')
-                    return render(request, 'transactions/transfer_money.html', {
-                        'mobile_form': mobile_form,
-                        'account_form': account_form
-                    })
-                
-                # Check if user has sufficient balance
-                if request.user.account.balance < amount:
-                    messages.error(request, 'Insufficient balance.')
+                # Balance check and both postings happen under row locks
+                try:
+                    transfer(request.user.account, recipient_account, amount, description)
+                except LedgerError as e:
+                    transaction.set_rollback(True)
+                    messages.error(request, str(e))
                     return render(request, 'transactions/transfer_money.html', {
                         'mobile_form': mobile_form,
-                        'account_form': account_form
+                        'account_form': account_form,
+                        'idempotency_key': new_idempotency_key(),
                     })
                 
-                # Process transfer
-                with transaction.atomic():
-                    sender_account = request.user.account
-                    sender_account.balance -= amount
-                    sender_account.save()
-                    
-                    recipient_account.balance += amount
-                    recipient_account.save()
-                    
-                    # Create transaction record for sender (outgoing)
-                    Transaction.objects.create(
-                        from_account=sender_account,
-                        to_account=recipient_account,
-                        amount=amount,
-                        transaction_type='Transfer',
-                        status='Success',
-                        description=description or f'Transfer to {recipient_account.account_holder_name}',
-                        balance_after=sender_account.balance,
-                        account=sender_account
-                    )
-                    
-                    # Create transaction record for recipient (incoming)
-                    Transaction.objects.create(
-                        from_account=sender_account,
-                        to_account=recipient_account,
-                        amount=amount,
-                        transaction_type='Transfer',
-                        status='Success',
-                        description=description or f'Transfer from {sender_account.account_holder_name}',
-                        balance_after=recipient_account.balance,
-                        account=recipient_account
-                    )
-                
-                messages.success(request, f'₹{amount} transferred successfully to {recipient_account.account_holder_name}!')
-                return redirect('transactions:transaction_history')
+                if idempotency_key:
+                    complete_idempotency_key(record, result_message, reverse('transactions:transaction_history'))
+            
+            messages.success(request, result_message)
+            return redirect('transactions:transaction_history')
     
     return render(request, 'transactions/transfer_money.html', {
         'mobile_form': mobile_form,
-        'account_form': account_form
+        'account_form': account_form,
+        'idempotency_key': new_idempotency_key(),
     })
 
 
@@ -214,9 +152,7 @@ def transaction_history(request):
     user_account = request.user.account
     
     # Get all transactions for this account's ledger
-    transactions = Transaction.objects.filter(
-        account=user_account
-    ).order_by('-timestamp')
+    transactions = Transaction.objects.for_ledger(user_account).order_by('-timestamp')
     
     # Apply search and filters
     from .forms import TransactionSearchForm
@@ -242,8 +178,26 @@ def transaction_history(request):
         if max_amount is not None:
             transactions = transactions.filter(amount__lte=max_amount)
     
+    # Keyset pagination keeps every page a bounded index scan, however deep
+    page = paginate_ledger(
+        transactions,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=TRANSACTIONS_PER_PAGE,
+    )
+    total_count, total_capped = bounded_count(transactions)
+    
+    # Preserve search filters in the next/previous links
+    filter_params = request.GET.copy()
+    filter_params.pop('after', None)
+    filter_params.pop('before', None)
+    
     return render(request, 'transactions/transaction_history.html', {
-        'transactions': transactions,
+        'transactions': page,
+        'page': page,
+        'total_count': total_count,
+        'total_capped': total_capped,
+        'filter_query': filter_params.urlencode(),
         'search_form': search_form,
     })
 
@@ -259,9 +213,7 @@ def statement(request):
     form = StatementFilterForm(request.GET or None)
     
     # Get all transactions for this account's ledger
-    transactions = Transaction.objects.filter(
-        account=user_account
-    ).order_by('-timestamp')
+    transactions = Transaction.objects.for_ledger(user_account).order_by('-timestamp')
     
     start_date = None
     end_date = None
@@ -276,30 +228,48 @@ def statement(request):
         if end_date:
             transactions = transactions.filter(timestamp__date__lte=end_date)
     
-    # Calculate totals
-    total_credits = sum([float(t.amount) for t in transactions if t.to_account == user_account])
-    total_debits = sum([float(t.amount) for t in transactions if t.from_account == user_account])
+    # Calculate totals in the database
+    summary = ledger_summary(user_account, start_date, end_date)
     
     return render(request, 'transactions/statement.html', {
         'transactions': transactions,
         'form': form,
         'start_date': start_date,
         'end_date': end_date,
-        'total_credits': total_credits,
-        'total_debits': total_debits,
+        'summary': summary,
+        'total_credits': summary['total_credits'],
+        'total_debits': summary['total_debits'],
+    })
+
+
+@login_required
+def balance_history(request):
+    from django.http import JsonResponse
+    
+    # Check if user has an account
+    if not hasattr(request.user, 'account'):
+        return JsonResponse({'error': 'You need to create a bank account first.'}, status=400)
+    
+    form = StatementFilterForm(request.GET or None)
+    start_date = None
+    end_date = None
+    if form.is_valid():
+        start_date = form.cleaned_data.get('start_date')
+        end_date = form.cleaned_data.get('end_date')
+    
+    # Served from daily snapshots, not the ledger
+    points = get_balance_history(request.user.account, start_date, end_date)
+    
+    return JsonResponse({
+        'points': [{'date': day.isoformat(), 'balance': str(balance)} for day, balance in points],
     })
 
 
 @login_required
 def generate_statement_pdf(request):
-    from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
+    from django.http import FileResponse
     from datetime import datetime
+    from .statements import request_statement
     
     # Check if user has an account
     if not hasattr(request.user, 'account'):
@@ -312,219 +282,19 @@ def generate_statement_pdf(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     
-    # Get all transactions for this account's ledger
-    transactions = Transaction.objects.filter(
-        account=user_account
-    ).order_by('timestamp')
-    
-    # Apply date filters if provided
-    if start_date:
-        from datetime import datetime
-        start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-        transactions = transactions.filter(timestamp__date__gte=start_date_obj)
-    if end_date:
-        end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-        transactions = transactions.filter(timestamp__date__lte=end_date_obj)
-    
-    # Calculate totals
-    total_credits = sum([float(t.amount) for t in transactions if t.to_account == user_account])
-    total_debits = sum([float(t.amount) for t in transactions if t.from_account == user_account])
-    
-    # Create the HttpResponse object with PDF headers
-    response = HttpResponse(content_type='application/pdf')
-    filename = f'statement_{user_account.account_number}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Create the PDF object
-    doc = SimpleDocTemplate(response, pagesize=A4,
-                            rightMargin=30, leftMargin=30,
-                            topMargin=30, bottomMargin=30)
-    
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#0F766E'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#0F766E'),
-        spaceAfter=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    normal_style = styles['Normal']
-    
-    # Add bank logo/name
-    bank_name = Paragraph('<b>ASTRALFIN</b> Digi-Banking', title_style)
-    elements.append(bank_name)
-    elements.append(Spacer(1, 12))
-    
-    # Add statement title
-    statement_title = Paragraph('Account Statement', heading_style)
-    elements.append(statement_title)
-    elements.append(Spacer(1, 20))
-    
-    # Account Information
-    account_info_data = [
-        ['Account Holder:', user_account.account_holder_name],
-        ['Account Number:', user_account.account_number],
-        ['IFSC Code:', user_account.ifsc_code],
-        ['Customer ID:', user_account.customer_id],
-        ['Statement Date:', datetime.now().strftime('%d %B, %Y')],
-    ]
-    
-    if start_date and end_date:
-        period_text = f"{start_date_obj.strftime('%d %b, %Y')} to {end_date_obj.strftime('%d %b, %Y')}"
-    elif start_date:
-        period_text = f"From {start_date_obj.strftime('%d %b, %Y')}"
-    elif end_date:
-        period_text = f"Till {end_date_obj.strftime('%d %b, %Y')}"
-    else:
-        period_text = 'All Time'
-    
-    account_info_data.append(['Period:', period_text])
-    
-    account_info_table = Table(account_info_data, colWidths=[2*inch, 4*inch])
-    account_info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E0F2F1')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    
-    elements.append(account_info_table)
-    elements.append(Spacer(1, 20))
+    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
     
-    # Summary Section
-    summary_heading = Paragraph('Summary', heading_style)
-    elements.append(summary_heading)
-    elements.append(Spacer(1, 10))
-    
-    summary_data = [
-        ['Total Credits', f'₹{total_credits:.2f}'],
-        ['Total Debits', f'₹{total_debits:.2f}'],
-        ['Current Balance', f'₹{float(user_account.balance):.2f}'],
-        ['Total Transactions', str(transactions.count())],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F0FDFA')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 20))
-    
-    # Transaction Details
-    if transactions.exists():
-        transaction_heading = Paragraph('Transaction Details', heading_style)
-        elements.append(transaction_heading)
-        elements.append(Spacer(1, 10))
-        
-        # Transaction table header
-        transaction_data = [
-            ['Date', 'Description', 'Debit', 'Credit', 'Balance']
-        ]
-        
-        # Add transaction rows
-        for txn in transactions:
-            date_str = txn.timestamp.strftime('%d %b, %Y\n%I:%M %p')
-            
-            # Determine description
-            if txn.transaction_type == 'Deposit':
-                desc = 'Money Added'
-            elif txn.to_account == user_account:
-                desc = f'From {txn.from_account.account_holder_name}' if txn.from_account else 'Credit'
-            else:
-                desc = f'To {txn.to_account.account_holder_name}' if txn.to_account else 'Debit'
-            
-            if txn.description:
-                desc += f'\n{txn.description[:30]}...' if len(txn.description) > 30 else f'\n{txn.description}'
-            
-            # Determine debit/credit
-            if txn.to_account != user_account and txn.transaction_type != 'Deposit':
-                debit = f'₹{float(txn.amount):.2f}'
-                credit = '-'
-            else:
-                debit = '-'
-                credit = f'₹{float(txn.amount):.2f}'
-            
-            balance = f'₹{float(txn.balance_after):.2f}' if txn.balance_after else '-'
-            
-            transaction_data.append([date_str, desc, debit, credit, balance])
-        
-        # Create transaction table
-        transaction_table = Table(transaction_data, 
-                                 colWidths=[1.2*inch, 2.2*inch, 1*inch, 1*inch, 1.1*inch])
-        
-        transaction_table.setStyle(TableStyle([
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0F766E')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            
-            # Body styling
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, 1), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            
-            # Alternating row colors
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9FAFB')]),
-        ]))
-        
-        elements.append(transaction_table)
-    else:
-        no_txn_text = Paragraph('<i>No transactions found for the selected period.</i>', normal_style)
-        elements.append(no_txn_text)
-    
-    elements.append(Spacer(1, 30))
-    
-    # Footer
-    footer_text = Paragraph(
-        '<i>This is a computer-generated statement and does not require a signature.<br/>'
-        'For any queries, please contact ASTRALFIN support.</i>',
-        ParagraphStyle('Footer', parent=normal_style, fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
-    )
-    elements.append(footer_text)
+    # Statements are rendered by the process_statement_jobs worker; serve the
+    # cached file while no newer ledger rows have been posted
+    job = request_statement(user_account, start_date_obj, end_date_obj)
     
-    # Build PDF
-    doc.build(elements)
+    if job.status == 'Completed' and job.file:
+        filename = f'statement_{user_account.account_number}_{job.completed_at.strftime("%Y%m%d_%H%M%S")}.pdf'
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename, content_type='application/pdf')
     
-    return response
+    messages.info(request, 'Your PDF statement is being prepared. Please click Download PDF again in a moment.')
+    statement_url = reverse('transactions:statement')
+    if request.GET:
+        statement_url += f'?{request.GET.urlencode()}'
+    return redirect(statement_url)